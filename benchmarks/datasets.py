@@ -0,0 +1,53 @@
+"""Générateurs de datasets synthétiques pour les benchmarks."""
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ['France', 'Germany', 'Spain', 'Italy', 'Portugal', 'Belgium', 'Netherlands', 'Poland']
+
+
+def make_dataset(rows: int, columns: int = 8, mix: str = 'mixed', null_ratio: float = 0.0, seed: int = 0) -> pd.DataFrame:
+    """
+    Construit un DataFrame de `rows` lignes et `columns` colonnes.
+    `mix` : 'numeric' (uniquement des nombres), 'text' (surtout du texte) ou 'mixed'.
+    `null_ratio` : part de valeurs manquantes injectées dans chaque colonne.
+    """
+    rng = np.random.default_rng(seed)
+    if mix == 'numeric':
+        kinds = ['float', 'int']
+    elif mix == 'text':
+        kinds = ['category', 'text', 'date', 'float']
+    else:
+        kinds = ['float', 'int', 'category', 'date', 'text']
+
+    data = {}
+    for i in range(columns):
+        kind = kinds[i % len(kinds)]
+        name = f"{kind}_{i}"
+        if kind == 'float':
+            data[name] = rng.normal(100, 15, rows)
+        elif kind == 'int':
+            data[name] = rng.integers(0, 1000, rows)
+        elif kind == 'category':
+            data[name] = rng.choice(CATEGORIES, rows)
+        elif kind == 'date':
+            start = np.datetime64('2015-01-01')
+            data[name] = (start + rng.integers(0, 3650, rows).astype('timedelta64[D]')).astype(str)
+        else:
+            data[name] = np.char.add('id_', rng.integers(0, rows, rows).astype(str))
+    df = pd.DataFrame(data)
+
+    if null_ratio > 0:
+        for col in df.columns:
+            mask = rng.random(rows) < null_ratio
+            df[col] = df[col].mask(mask)
+    return df
+
+
+def write_dataset(df: pd.DataFrame, path) -> str:
+    """Écrit le dataset au format déduit de l'extension (.csv ou .parquet)."""
+    path = str(path)
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
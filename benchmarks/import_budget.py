@@ -0,0 +1,119 @@
+"""
+Budget de temps d'import des modules du paquet (démarrage à froid).
+
+Chaque module est importé dans un processus neuf avec `python -X importtime` ; le script
+affiche le coût cumulé de l'import et les dépendances les plus lourdes, et vérifie que les
+modules lourds (SDK Anthropic, Plotly, Streamlit) ne sont pas chargés par les modules qui
+doivent les importer paresseusement :
+
+    poetry run python benchmarks/import_budget.py
+    poetry run python benchmarks/import_budget.py --modules datavisapp.api --budget-ms 200 --output imports.json
+
+Le script retourne un code d'erreur si un budget est dépassé ou si un import interdit est détecté.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+
+# Budget (ms) du coût cumulé de l'import, par module. pandas seul coûte déjà plusieurs centaines de ms.
+BUDGETS_MS = {
+    'datavisapp.config': 100,
+    'datavisapp.tracing': 100,
+    'datavisapp.llm_cache': 100,
+    'datavisapp.api': 150,
+    'datavisapp.history': 1000,
+    'datavisapp.router': 1000,
+    'datavisapp.pipeline': 1200,
+    'datavisapp.batch': 1200,
+    # Point d'entrée de l'application : Streamlit et pandas, mais ni le SDK, ni Plotly, ni DuckDB
+    'datavisapp.app4': 2500,
+}
+
+# Modules chargés seulement au premier usage : leur présence à l'import est une régression
+LAZY_MODULES = ('anthropic', 'plotly', 'streamlit', 'duckdb')
+
+# Exceptions : modules lourds que ce module importe directement
+EAGER_ALLOWED = {
+    'datavisapp.app4': ('streamlit',),
+}
+
+
+def measure(module: str) -> dict:
+    """Importe `module` dans un processus neuf et retourne les coûts (µs) relevés par -X importtime."""
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(SRC_DIR), os.environ.get('PYTHONPATH')]))}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        capture_output=True, text=True, env=env, check=True
+    )
+    costs = {}
+    for line in result.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        costs[name.strip()] = int(cumulative)
+    return costs
+
+
+def check(module: str, budget_ms: float, repeat: int, top: int) -> dict:
+    try:
+        runs = [measure(module) for _ in range(repeat)]
+    except subprocess.CalledProcessError as e:
+        # Import impossible (ex. dépendance absente) : échec du budget, avec le message d'erreur
+        error = (e.stderr.strip().splitlines() or ['?'])[-1]
+        return {'module': module, 'import_ms': None, 'budget_ms': budget_ms, 'heaviest': [],
+                'lazy_violations': [], 'error': error, 'ok': False}
+    # Médiane des imports répétés : le premier peut payer le cache disque des .pyc
+    total_ms = statistics.median(run.get(module, 0) for run in runs) / 1000
+    costs = runs[-1]
+    heaviest = sorted(
+        ((name, cost) for name, cost in costs.items() if '.' not in name and name != module.split('.')[0]),
+        key=lambda item: item[1], reverse=True
+    )[:top]
+    lazy = sorted({name.split('.')[0] for name in costs} & set(LAZY_MODULES) - set(EAGER_ALLOWED.get(module, ())))
+    return {
+        'module': module,
+        'import_ms': round(total_ms, 1),
+        'budget_ms': budget_ms,
+        'heaviest': [{'module': name, 'ms': round(cost / 1000, 1)} for name, cost in heaviest],
+        'lazy_violations': lazy,
+        'ok': total_ms <= budget_ms and not lazy,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', default=','.join(BUDGETS_MS), help='modules séparés par des virgules')
+    parser.add_argument('--budget-ms', type=float, help='budget commun, à la place des budgets par module')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=5, help='dépendances les plus lourdes affichées')
+    parser.add_argument('--output', help='fichier JSON de résultats')
+    args = parser.parse_args(argv)
+
+    results = []
+    for module in args.modules.split(','):
+        budget = args.budget_ms if args.budget_ms is not None else BUDGETS_MS.get(module, 1000)
+        results.append(check(module, budget, args.repeat, args.top))
+        result = results[-1]
+        if 'error' in result:
+            print(f"{'ÉCHEC':12} {module:24} import impossible : {result['error']}")
+            continue
+        heaviest = ", ".join(f"{item['module']} {item['ms']:.0f} ms" for item in result['heaviest'])
+        status = 'OK' if result['ok'] else 'DÉPASSEMENT'
+        print(f"{status:12} {module:24} {result['import_ms']:8.1f} ms / {result['budget_ms']:.0f} ms   ({heaviest})")
+        if result['lazy_violations']:
+            print(f"{'':12} {module} charge à l'import : {', '.join(result['lazy_violations'])}", file=sys.stderr)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
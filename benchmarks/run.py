@@ -0,0 +1,207 @@
+"""
+Benchmarks des étapes du pipeline : chargement, nettoyage, profil, rendu Visualizer,
+exécution d'un snippet et chemin LLM (sur un faux client Claude).
+
+Chaque (dataset, étape) s'exécute dans un processus neuf pour que le pic de mémoire
+(RSS) mesuré soit celui de l'étape ; celui des workers de l'exécuteur (worker_peak_rss_mb)
+est mesuré à part. Les résultats sont écrits en JSON et peuvent être comparés à une
+référence sauvegardée :
+
+    poetry run python benchmarks/run.py --rows 1000,100000 --output bench.json
+    poetry run python benchmarks/run.py --rows 1000,100000 --baseline bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+STAGES = ['load', 'clean', 'profile', 'render', 'exec', 'llm']
+
+EXEC_SNIPPET = (
+    "import plotly.express as px\n"
+    "fig = px.histogram(df, x=df.select_dtypes('number').columns[0])"
+)
+
+
+def _stage_load(path):
+    from datavisapp.data_loader import DataLoader
+
+    # Chronomètre lancé après les imports : seul le chargement est mesuré
+    start = time.perf_counter()
+    DataLoader.load_streaming(path)
+    return {'wall_s': time.perf_counter() - start}
+
+
+def _read_full_frame(path):
+    import pandas as pd
+
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+
+
+def _stage_clean(path):
+    from datavisapp.data_processor import DataProcessor
+
+    df = _read_full_frame(path)
+    start = time.perf_counter()
+    DataProcessor(df)
+    return {'wall_s': time.perf_counter() - start}
+
+
+def _cleaned_full_frame(path):
+    from datavisapp.data_processor import DataProcessor
+
+    return DataProcessor(_read_full_frame(path)).df
+
+
+def _stage_profile(path):
+    from datavisapp.profiler import DatasetProfile
+
+    df = _cleaned_full_frame(path)
+    start = time.perf_counter()
+    profile = DatasetProfile(df)
+    profile.digest()
+    profile.correlation()
+    return {'wall_s': time.perf_counter() - start}
+
+
+def _stage_render(path):
+    from datavisapp.visualizer import Visualizer
+
+    df = _cleaned_full_frame(path)
+    numeric = df.select_dtypes('number').columns
+    categories = df.select_dtypes('category').columns
+    start = time.perf_counter()
+    visualizer = Visualizer(df)
+    figures = [visualizer.create_visualization('distribution', {'column': numeric[0]})]
+    if len(numeric) > 1:
+        figures.append(visualizer.create_visualization('correlation', {'x': numeric[0], 'y': numeric[1]}))
+    if len(categories):
+        figures.append(visualizer.create_visualization('comparison', {'x': categories[0], 'y': numeric[0]}))
+    payload = sum(len(fig.to_json()) for fig in figures)
+    return {'wall_s': time.perf_counter() - start, 'figure_bytes': payload}
+
+
+def _stage_exec(path):
+    from datavisapp.executor import SnippetExecutor
+
+    df = _cleaned_full_frame(path)
+    executor = SnippetExecutor(workers=1, timeout=600)
+    try:
+        # Premier rendu : démarrage du worker et partage du dataset, non mesurés
+        executor.render("fig = {'data': [], 'layout': {}}", df, 'bench')
+        start = time.perf_counter()
+        figure_json = executor.render(EXEC_SNIPPET, df, 'bench')
+        return {'wall_s': time.perf_counter() - start, 'figure_bytes': len(figure_json)}
+    finally:
+        executor.shutdown()
+
+
+def _stage_llm(path):
+    from datavisapp.api import ClaudeClient
+    from datavisapp.fakes import FakeAnthropic
+    from datavisapp.profiler import DatasetProfile
+
+    df = _cleaned_full_frame(path)
+    start = time.perf_counter()
+    digest = DatasetProfile(df).digest()
+    client = ClaudeClient(client=FakeAnthropic(responder=lambda system, messages: EXEC_SNIPPET), cache=None)
+    client.generate_interpretation_and_code(f"Interprète : {digest}", f"Code : {digest}")
+    return {'wall_s': time.perf_counter() - start}
+
+
+def _run_stage(stage, path, queue):
+    start = time.perf_counter()
+    metrics = globals()[f"_stage_{stage}"](path)
+    metrics.setdefault('wall_s', time.perf_counter() - start)
+    # ru_maxrss est en Ko sous Linux
+    metrics['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    # Processus enfants terminés (workers de l'exécuteur, arrêtés par shutdown) : le snippet y tourne
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    if children:
+        metrics['worker_peak_rss_mb'] = children
+    queue.put(metrics)
+
+
+def run_stage(stage, path) -> dict:
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_stage, args=(stage, path, queue))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return {'error': f"exit code {process.exitcode}"}
+    return queue.get()
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Retourne les régressions : métriques dépassant la référence de plus de `tolerance`."""
+    reference = {(r['dataset'], r['stage']): r for r in baseline}
+    regressions = []
+    for result in results:
+        previous = reference.get((result['dataset'], result['stage']))
+        if not previous:
+            continue
+        for metric in ('wall_s', 'peak_rss_mb', 'worker_peak_rss_mb', 'figure_bytes'):
+            if metric in result and previous.get(metric):
+                ratio = result[metric] / previous[metric]
+                if ratio > 1 + tolerance:
+                    regressions.append({**{k: result[k] for k in ('dataset', 'stage')},
+                                        'metric': metric, 'baseline': previous[metric],
+                                        'current': result[metric], 'ratio': round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None):
+    from datasets import make_dataset, write_dataset
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,100000', help="tailles séparées par des virgules (jusqu'à 10000000)")
+    parser.add_argument('--columns', type=int, default=8)
+    parser.add_argument('--mix', choices=['numeric', 'text', 'mixed'], default='mixed')
+    parser.add_argument('--null-ratio', type=float, default=0.05)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--output', help='fichier JSON de résultats')
+    parser.add_argument('--baseline', help='résultats de référence à comparer')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='dégradation tolérée (0.2 = +20%%)')
+    args = parser.parse_args(argv)
+
+    stages = args.stages.split(',')
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (int(r) for r in args.rows.split(',')):
+            name = f"{rows}x{args.columns}-{args.mix}-null{args.null_ratio}"
+            path = write_dataset(
+                make_dataset(rows, args.columns, args.mix, args.null_ratio),
+                Path(tmp) / f"{name}.{args.format}"
+            )
+            for stage in stages:
+                metrics = run_stage(stage, path)
+                results.append({'dataset': name, 'rows': rows, 'stage': stage, **metrics})
+                print(json.dumps(results[-1]), flush=True)
+
+    report = {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(), 'time': time.time()},
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text())['results'], args.tolerance)
+        for regression in regressions:
+            print(f"RÉGRESSION {json.dumps(regression)}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
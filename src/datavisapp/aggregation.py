@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+def histogram_counts(values, bins=10, value_range=None):
+    """Histogramme calculé avec NumPy : retourne (centres, largeurs, effectifs)."""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return (edges[:-1] + edges[1:]) / 2, np.diff(edges), counts
+
+
+def group_aggregate(df: pd.DataFrame, by, value, agg='sum') -> pd.DataFrame:
+    """Agrégation group-by : une ligne par catégorie au lieu d'une barre par ligne."""
+    return df.groupby(by, observed=True, sort=False)[value].agg(agg).reset_index()
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets : indices de `threshold` points qui préservent
+    la forme visuelle d'une série (x doit être trié).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    bucket_edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = bucket_edges[i], bucket_edges[i + 1]
+        next_start, next_end = end, bucket_edges[i + 2] if i + 2 < len(bucket_edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def density_sample_indices(x, y, max_points: int) -> np.ndarray:
+    """
+    Sous-échantillonnage par densité : grille d'environ `max_points` cellules et un point
+    conservé par cellule occupée. Les zones denses sont réduites, les points isolés gardés.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) <= max_points:
+        return np.arange(len(x))
+    side = max(int(np.sqrt(max_points)), 1)
+
+    def cell(values):
+        finite = np.isfinite(values)
+        low, high = np.nanmin(values[finite]), np.nanmax(values[finite])
+        span = (high - low) or 1.0
+        return np.clip(((np.nan_to_num(values, nan=low) - low) / span * side).astype(int), 0, side - 1)
+
+    cells = cell(x) * side + cell(y)
+    _, first = np.unique(cells, return_index=True)
+    return np.sort(first)
+
+
+def trendline(x, y, bins: int = 50):
+    """
+    Tendance lissée par moyennes glissantes sur des intervalles de quantiles de x,
+    calculée sur les données réduites. Retourne (x, y) de la courbe.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    mask = np.isfinite(x) & np.isfinite(y)
+    x, y = x[mask], y[mask]
+    if len(x) < 3:
+        return x, y
+    edges = np.unique(np.quantile(x, np.linspace(0, 1, min(bins, len(x)) + 1)))
+    if len(edges) < 2:
+        return x[:1], y[:1]
+    bucket = np.clip(np.searchsorted(edges, x, side='right') - 1, 0, len(edges) - 2)
+    counts = np.bincount(bucket, minlength=len(edges) - 1)
+    keep = counts > 0
+    mean_x = np.bincount(bucket, weights=x, minlength=len(edges) - 1)[keep] / counts[keep]
+    mean_y = np.bincount(bucket, weights=y, minlength=len(edges) - 1)[keep] / counts[keep]
+    # Lissage léger (fenêtre de 3) pour éviter l'effet d'escalier
+    if len(mean_y) >= 3:
+        mean_y = np.convolve(np.pad(mean_y, 1, mode='edge'), np.ones(3) / 3, mode='valid')
+    return mean_x, mean_y
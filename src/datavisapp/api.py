@@ -1,22 +1,365 @@
+import functools
 import json
-from anthropic import Anthropic
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from .config import settings
+from .llm_cache import SingleFlight, response_cache
+from .prompts import Prompt
+from .scheduler import INTERACTIVE, PRIORITY_NAMES, estimate_tokens, get_scheduler
+from .tracing import current_span, propagate, record_usage, tracer
+
+# Texte retourné quand l'API ne renvoie aucun contenu ; jamais mis en cache
+NO_RESPONSE = "Aucune réponse générée."
+
+# Clés de `timings` qui ne sont pas des durées : jetons d'entrée facturés et lus depuis le cache de prompts
+USAGE_KEYS = ('input_tokens', 'cached_input_tokens')
+
+# Usage (jetons) de la dernière requête envoyée par le thread courant
+_last_usage = threading.local()
+
+
+@functools.lru_cache(maxsize=None)
+def shared_anthropic():
+    """
+    Client du SDK partagé par tout le processus : son pool de connexions HTTP (keep-alive)
+    est réutilisé d'une requête à l'autre, sans nouvelle poignée de main TLS.
+    Les nouvelles tentatives sont gérées par ClaudeClient, en accord avec l'ordonnanceur.
+    """
+    # SDK chargé au premier client réel : l'import d'anthropic coûte environ une seconde
+    from anthropic import Anthropic
+
+    return Anthropic(api_key=settings.CLAUDE_API_KEY, base_url=settings.LLM_BASE_URL, max_retries=0)
+
 
 class ClaudeClient:
-    def __init__(self):
-        self.client = Anthropic(api_key=settings.CLAUDE_API_KEY)
+    # Partagé par toutes les instances : les requêtes identiques concurrentes de même priorité
+    # ne font qu'un appel (une requête interactive n'attend pas le créneau d'une requête de fond)
+    _single_flight = SingleFlight()
+
+    def __init__(self, client=None, cache=None, model: str = None, max_concurrency: int = None,
+                 scheduler=None, priority: int = INTERACTIVE):
+        """
+        `client` permet d'injecter un faux client (voir `fakes.FakeAnthropic`) ;
+        `cache` est le cache de réponses (aucun par défaut ; `get_client` utilise le cache persistant `response_cache`) ;
+        `max_concurrency` borne le nombre d'appels simultanés à l'API (mode batch) ;
+        `scheduler` fait respecter les limites de débit (par défaut, l'ordonnanceur partagé pour
+        le client réel, aucun pour un client injecté) ; `priority` est INTERACTIVE ou BACKGROUND.
+        """
+        if client is None:
+            client = shared_anthropic()
+            scheduler = scheduler or get_scheduler()
+        self.client = client
+        self.cache = cache
+        self.model = model or settings.CLAUDE_MODEL
+        self.scheduler = scheduler
+        self.priority = priority
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
     
-    def generate_insights(self, prompt: str, data_summary: dict):
+    def generate_insights(self, prompt, data_summary: dict):
         """
         Envoie le prompt à Claude et retourne la réponse textuelle.
         Ce mécanisme est utilisé pour générer du texte, que ce soit une interprétation ou un snippet de code.
+        `prompt` est un `Prompt` (préfixe système stable + demande) ou un simple texte envoyé comme message.
+        Les réponses sont mises en cache et les requêtes identiques simultanées de même priorité dédupliquées.
+        """
+        prompt = _as_prompt(prompt)
+        with tracer.span('llm.generate', **{'gen_ai.request.model': self.model}) as span:
+            if self.cache is None:
+                return self._create(prompt)
+
+            key = self.cache.make_key(self.model, prompt.system, prompt.user, settings.MAX_TOKENS)
+            cached = self.cache.get(key)
+            span.set_attribute('cache.hit', cached is not None)
+            if cached is not None:
+                return cached
+
+            def call():
+                text = self._create(prompt)
+                if _cacheable(text):
+                    self.cache.put(key, text)
+                return text
+
+            return self._single_flight.do((key, self.priority), call)
+
+    def stream_insights(self, prompt):
+        """
+        Version streaming de `generate_insights` : génère les fragments de texte au fur et
+        à mesure de leur réception. Une réponse déjà en cache est renvoyée en un seul fragment.
+        """
+        prompt = _as_prompt(prompt)
+        # Span non courant : le générateur est suspendu entre deux fragments
+        span = tracer.start('llm.stream', **{'gen_ai.request.model': self.model})
+        error = None
+        try:
+            key = None
+            if self.cache is not None:
+                key = self.cache.make_key(self.model, prompt.system, prompt.user, settings.MAX_TOKENS)
+                cached = self.cache.get(key)
+                span.set_attribute('cache.hit', cached is not None)
+                if cached is not None:
+                    yield cached
+                    return
+
+            parts = []
+            with self._request_slot(estimate_tokens(*prompt), span) as usage, \
+                    self.client.messages.stream(**self._request(prompt)) as stream:
+                for delta in stream.text_stream:
+                    if not parts:
+                        span.set_attribute('first_token_s', span.duration)
+                    parts.append(delta)
+                    yield delta
+                final_usage = stream.get_final_message().usage
+                record_usage(final_usage, span)
+                usage.tokens = _used_tokens(final_usage)
+                _last_usage.value = final_usage
+
+            # On ne met en cache que les réponses reçues en entier
+            if key is not None and _cacheable("".join(parts)):
+                self.cache.put(key, "".join(parts))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            tracer.finish(span, error)
+
+    def stream_interpretation_and_code(self, interpretation_prompt, code_prompt):
+        """
+        Streame l'interprétation pendant que le code est généré en parallèle.
+        Retourne (générateur de fragments d'interprétation, future du code, timings) ;
+        timings est complété au fil du stream (premier fragment, fin de chaque appel).
+        """
+        start = time.perf_counter()
+        timings = {'mode': 'streaming'}
+
+        def timed_code():
+            _last_usage.value = None
+            text = self.generate_insights(code_prompt, data_summary={})
+            timings['code'] = time.perf_counter() - start
+            _add_usage(timings, _last_usage.value)
+            return text
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        code_future = executor.submit(propagate(timed_code))
+        executor.shutdown(wait=False)
+
+        def deltas():
+            _last_usage.value = None
+            for delta in self.stream_insights(interpretation_prompt):
+                timings.setdefault('first_token', time.perf_counter() - start)
+                yield delta
+            timings['interpretation'] = time.perf_counter() - start
+            _add_usage(timings, _last_usage.value)
+
+        return deltas(), code_future, timings
+
+    def generate_many(self, prompts: list) -> list:
+        """Envoie plusieurs prompts indépendants en parallèle et retourne les réponses dans l'ordre."""
+        if len(prompts) <= 1:
+            return [self.generate_insights(p, data_summary={}) for p in prompts]
+        with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+            return list(executor.map(propagate(lambda p: self.generate_insights(p, data_summary={})), prompts))
+
+    def generate_interpretation_and_code(self, interpretation_prompt, code_prompt, combined: bool = None):
+        """
+        Génère l'interprétation et le code d'une visualisation.
+        - mode parallèle (par défaut) : les deux requêtes partent en même temps ;
+        - mode combiné : une seule requête qui renvoie un JSON {"interpretation", "code"} ;
+          si ce JSON est illisible, les deux requêtes séparées suivent (mode 'combined_fallback').
+        Retourne (interprétation, code, timings) ; timings contient la durée de chaque appel
+        et les jetons d'entrée envoyés (voir USAGE_KEYS ; 0 si les réponses viennent du cache).
+        """
+        if combined is None:
+            combined = settings.COMBINED_REQUEST
+        start = time.perf_counter()
+
+        if combined:
+            _last_usage.value = None
+            response = self.generate_insights(_combined_prompt(interpretation_prompt, code_prompt), data_summary={})
+            parsed = _parse_combined(response)
+            elapsed = time.perf_counter() - start
+            timings = {'mode': 'combined', 'combined': elapsed}
+            _add_usage(timings, _last_usage.value)
+            if parsed is not None:
+                timings['total'] = elapsed
+                return parsed['interpretation'], parsed['code'], timings
+            # Réponse combinée illisible : les deux requêtes séparées suivent (appel combiné compris dans les jetons)
+            timings['mode'] = 'combined_fallback'
+        else:
+            timings = {'mode': 'parallel'}
+
+        def timed(prompt):
+            # Chaque thread renvoie sa durée et son usage : le cumul se fait ici, dans un seul thread
+            call_start = time.perf_counter()
+            _last_usage.value = None
+            text = self.generate_insights(prompt, data_summary={})
+            return text, time.perf_counter() - call_start, _last_usage.value
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {
+                'interpretation': executor.submit(propagate(timed), interpretation_prompt),
+                'code': executor.submit(propagate(timed), code_prompt),
+            }
+            texts = {}
+            for name, future in futures.items():
+                texts[name], timings[name], usage = future.result()
+                _add_usage(timings, usage)
+        interpretation, code = texts['interpretation'], texts['code']
+        timings['total'] = time.perf_counter() - start
+        return interpretation, code, timings
+
+    def _request(self, prompt: Prompt) -> dict:
+        """
+        Paramètres de l'appel : la demande n'est envoyée qu'une fois (message utilisateur) ;
+        le préfixe système stable est marqué pour le cache de prompts du fournisseur.
         """
-        response = self.client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=settings.MAX_TOKENS,
-            system=prompt,
-            messages=[{"role": "user", "content": prompt}]
+        request = {
+            'model': self.model,
+            'max_tokens': settings.MAX_TOKENS,
+            'messages': [{"role": "user", "content": prompt.user}],
+        }
+        if prompt.system:
+            if settings.LLM_PROMPT_CACHING:
+                request['system'] = [{"type": "text", "text": prompt.system, "cache_control": {"type": "ephemeral"}}]
+            else:
+                request['system'] = prompt.system
+        return request
+
+    def _create(self, prompt: Prompt) -> str:
+        response = self._with_retry(
+            lambda: self.client.messages.create(**self._request(prompt)), estimate_tokens(*prompt)
         )
+        _last_usage.value = getattr(response, 'usage', None)
+        record_usage(_last_usage.value)
         if response and response.content:
             return response.content[0].text
-        return "Aucune réponse générée."
+        return NO_RESPONSE
+
+    @contextmanager
+    def _request_slot(self, estimated_tokens: int, span=None):
+        """
+        Créneau pour une requête : borne de concurrence, puis tour dans l'ordonnanceur.
+        L'objet produit reçoit l'usage réel (`usage.tokens`) pour corriger l'estimation.
+        """
+        with ExitStack() as stack:
+            if self._slots is not None:
+                stack.enter_context(self._slots)
+            if self.scheduler is None:
+                yield _NoSlot()
+                return
+            usage = stack.enter_context(self.scheduler.slot(estimated_tokens, self.priority))
+            span = span or current_span()
+            if span is not None:
+                span.set_attribute('scheduler.wait_s', usage.waited)
+                span.set_attribute('scheduler.priority', PRIORITY_NAMES.get(self.priority))
+            yield usage
+
+    def _with_retry(self, call, estimated_tokens: int):
+        """
+        Exécute `call` en réessayant avec un délai exponentiel (et aléatoire) sur les erreurs
+        transitoires : limite de débit (429), surcharge (529), erreurs serveur et réseau.
+        Une réponse 429 suspend aussi l'ordonnanceur : les autres requêtes attendent avec elle.
+        """
+        from anthropic import APIConnectionError, APIStatusError
+
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            try:
+                with self._request_slot(estimated_tokens) as usage:
+                    response = call()
+                    usage.tokens = _used_tokens(getattr(response, 'usage', None))
+                    return response
+            except (APIConnectionError, APIStatusError) as e:
+                if attempt == settings.LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                delay = _retry_delay(e, attempt)
+                if self.scheduler is not None and getattr(e, 'status_code', None) == 429:
+                    self.scheduler.pause(delay)
+                time.sleep(delay)
+
+
+class _NoSlot:
+    waited = 0.0
+    tokens = None
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(priority: int = INTERACTIVE) -> ClaudeClient:
+    """Client partagé par toutes les sessions (même pool de connexions, même ordonnanceur, même cache)."""
+    return ClaudeClient(cache=response_cache, priority=priority)
+
+
+def _cacheable(text: str) -> bool:
+    """Une réponse vide ou le texte de repli ne sont pas mis en cache : la prochaine demande réessaie."""
+    return bool(text and text.strip()) and text != NO_RESPONSE
+
+
+def _as_prompt(prompt) -> Prompt:
+    return prompt if isinstance(prompt, Prompt) else Prompt("", prompt)
+
+
+def _add_usage(timings: dict, usage):
+    """
+    Cumule les jetons d'entrée d'un appel dans `timings` : total envoyé (y compris le préfixe
+    lu ou écrit dans le cache de prompts) et part lue depuis ce cache. Une réponse du cache local n'en consomme pas.
+    """
+    cached = getattr(usage, 'cache_read_input_tokens', 0) or 0
+    sent = (getattr(usage, 'input_tokens', 0) or 0) + cached + (getattr(usage, 'cache_creation_input_tokens', 0) or 0)
+    timings['input_tokens'] = timings.get('input_tokens', 0) + sent
+    timings['cached_input_tokens'] = timings.get('cached_input_tokens', 0) + cached
+
+
+def _used_tokens(usage):
+    if usage is None:
+        return None
+    return (getattr(usage, 'input_tokens', 0) or 0) + (getattr(usage, 'output_tokens', 0) or 0)
+
+
+def _is_retryable(error) -> bool:
+    from anthropic import APIConnectionError
+
+    if isinstance(error, APIConnectionError):
+        return True
+    return getattr(error, 'status_code', None) in (408, 409, 429, 500, 502, 503, 504, 529)
+
+
+def _retry_delay(error, attempt: int) -> float:
+    """Délai avant la prochaine tentative ; l'en-tête retry-after de l'API est respecté."""
+    delay = min(settings.LLM_RETRY_BASE_DELAY * 2 ** attempt, 60.0) * (0.5 + random.random() / 2)
+    response = getattr(error, 'response', None)
+    try:
+        retry_after = float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        retry_after = 0.0
+    return max(delay, retry_after)
+
+
+def _combined_prompt(interpretation_prompt, code_prompt) -> Prompt:
+    """Une seule requête pour les deux demandes ; le préfixe système (commun aux deux) n'est envoyé qu'une fois."""
+    interpretation_prompt, code_prompt = _as_prompt(interpretation_prompt), _as_prompt(code_prompt)
+    code_request = code_prompt.user
+    if code_prompt.system != interpretation_prompt.system:
+        code_request = f"{code_prompt.system}\n{code_request}"
+    return Prompt(interpretation_prompt.system, f"""Réponds aux deux demandes suivantes dans un unique objet JSON de la forme
+{{"interpretation": "<texte>", "code": "<code Python>"}}, sans aucun texte autour.
+
+Demande 1 (interpretation) :
+{interpretation_prompt.user}
+
+Demande 2 (code) :
+{code_request}""")
+
+
+def _parse_combined(response: str):
+    """Extrait le JSON {"interpretation", "code"} d'une réponse combinée, ou None."""
+    start, end = response.find('{'), response.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        parsed = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(parsed, dict) or not {'interpretation', 'code'} <= parsed.keys():
+        return None
+    return parsed
@@ -1,9 +1,22 @@
+import functools
 import json
+import math
+import time
 import streamlit as st
 import pandas as pd
-from datavisapp.data_loader import DataLoader
-from datavisapp.data_processor import DataProcessor
-from datavisapp.api import ClaudeClient
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from datavisapp.api import USAGE_KEYS, get_client
+from datavisapp.cache import dataset_key, files_digest, frame_registry
+from datavisapp.filters import get_filter_index
+from datavisapp.history import history_store
+from datavisapp.profiler import get_profile
+from datavisapp.executor import MissingFigureError, SnippetError, get_executor
+from datavisapp.pipeline import dataset_params, load_dataset, parse_interpretation, route_locally
+from datavisapp.prefetch import Prefetcher, parse_suggestions
+from datavisapp.prompts import dynamic_prompts, summary_prompt, tables_digest, visualization_prompts
+from datavisapp.router import router_stats
+from datavisapp.scheduler import BACKGROUND, get_scheduler
+from datavisapp.tracing import set_attribute, tracer
 from datavisapp.config import settings
 
 ##############################
@@ -17,6 +30,29 @@ def get_logo_url(custom_theme):
     else:
         return "https://upload.wikimedia.org/wikipedia/commons/thumb/6/65/Crystal_Project_chart_bar.svg/640px-Crystal_Project_chart_bar.svg.png"
 
+##############################
+def _traced(name: str):
+    """
+    Trace une étape de l'application. Les traces terminées pendant le rerun courant sont
+    gardées dans la session pour le panneau de debug.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name) as span:
+                result = fn(*args, **kwargs)
+            if span.parent_id is None:
+                st.session_state.setdefault('current_trace', []).extend(span.trace)
+            return result
+        return wrapper
+    return decorator
+
+##############################
+def _session_id() -> str:
+    """Identifiant de la session Streamlit courante."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
 ##############################
 def main():
     st.set_page_config(
@@ -35,19 +71,27 @@ def main():
         st.session_state.visualization_code = None
     if 'insights' not in st.session_state:
         st.session_state.insights = None
-    if 'history' not in st.session_state:
-        st.session_state.history = []  # Historique des requêtes
+    if 'last_request' not in st.session_state:
+        st.session_state.last_request = None  # Dernière question générée (évite de la relancer à chaque rerun)
     if 'viz_type' not in st.session_state:
         st.session_state.viz_type = "Histogramme"  # Type de visuel par défaut
     if 'theme_choice' not in st.session_state:
         st.session_state.theme_choice = "Standard"  # Thème par défaut
     if 'dynamic_visualization_code' not in st.session_state:
         st.session_state.dynamic_visualization_code = None
+    if 'prefetcher' not in st.session_state:
+        st.session_state.prefetcher = None  # Visualisations suggérées générées en tâche de fond
+    if 'last_trace' not in st.session_state:
+        st.session_state.last_trace = []
+    st.session_state.current_trace = []
 
     # Barre latérale : Chargement du dataset et choix du type de graphique général
     with st.sidebar:
         st.header("Configuration")
-        uploaded_file = st.file_uploader("Charger un dataset", type=['csv', 'xlsx'])
+        # Plusieurs fichiers, une archive zip ou un classeur à plusieurs feuilles : une table par fichier ou feuille
+        uploaded_files = st.file_uploader(
+            "Charger un dataset", type=['csv', 'xlsx', 'xls', 'parquet', 'zip'], accept_multiple_files=True
+        )
         
         st.subheader("Type de visualisation général")
         st.session_state.viz_type = st.selectbox(
@@ -63,11 +107,41 @@ def main():
             ],
             index=0
         )
-        if uploaded_file:
+        if uploaded_files:
             with st.spinner("Chargement et traitement du dataset..."):
-                process_data(uploaded_file)
-                if st.session_state.processed_data and not st.session_state.dataset_summary:
-                    generate_dataset_summary()
+                process_data(uploaded_files)
+            if router_stats.local + router_stats.llm:
+                st.caption(f"Chemin local (sans LLM) : {router_stats.hit_rate:.0%} des requêtes")
+            if st.session_state.prefetcher and st.session_state.prefetcher.items:
+                prefetch_stats = st.session_state.prefetcher.stats()
+                st.caption(
+                    f"Suggestions préchargées : {prefetch_stats.get('ready', 0)}/{prefetch_stats['suggestions']} prêtes"
+                )
+            api_stats = get_scheduler().stats()
+            if api_stats['queue_depth'] or api_stats['in_flight']:
+                st.caption(
+                    f"API Claude : {api_stats['in_flight']} requêtes en cours, "
+                    f"{api_stats['queue_depth']} en attente (attente moyenne {api_stats['mean_wait_s']:.1f} s)"
+                )
+            load_stats = st.session_state.processed_data.get('load_stats') or {}
+            if load_stats.get('bytes_read') is not None:
+                st.caption(
+                    f"{load_stats['rows_seen']:,} lignes parcourues, "
+                    f"{load_stats['bytes_read'] / 1e6:.1f} Mo lus"
+                )
+            if len(load_stats.get('tables') or []) > 1:
+                with st.expander(f"Lecture de {len(load_stats['tables'])} tables ({load_stats['workers']} processus)"):
+                    st.dataframe(pd.DataFrame([
+                        {"Table": t['table'], "Fichier": t['file'], "Feuille": t['sheet'],
+                         "Lignes": t['rows_seen'], "Secondes": round(t['seconds'], 3)}
+                        for t in load_stats['tables']
+                    ]), hide_index=True)
+            footprint = frame_registry.footprint(_session_id())
+            if footprint['shared_by']:
+                st.caption(
+                    f"Mémoire : dataset de {footprint['dataset_bytes'] / 1e6:.1f} Mo partagé par "
+                    f"{footprint['shared_by']} session(s), soit {footprint['session_bytes'] / 1e6:.1f} Mo par session"
+                )
 
     # Partie principale : Titre, choix du thème personnalisé et saisie de la question générale
     st.title("AI Data Explorer")
@@ -80,17 +154,6 @@ def main():
     
     user_query = st.text_area("Posez votre question pour la visualisation générale :")
     
-    if st.session_state.processed_data and user_query:
-        with st.spinner("Génération de la visualisation..."):
-            generate_visualization(user_query, st.session_state.viz_type)
-            st.session_state.history.append({
-                "query": user_query,
-                "interpretation": st.session_state.insights.get("interpretation"),
-                "visualization_code": st.session_state.visualization_code,
-                "viz_type": st.session_state.viz_type,
-                "theme": st.session_state.theme_choice,
-                "type": "Générale"
-            })
 
     # Organisation de l'interface principale en onglets (ajout du 4ème onglet)
     tabs = st.tabs(["Description du Dataset", "Visualisation Générale", "Visuels Dynamiques", "Historique des Requêtes"])
@@ -103,13 +166,46 @@ def main():
                 "Nom de variable": st.session_state.processed_data['df'].columns
             })
             st.table(variables)
-        if st.session_state.dataset_summary:
+            tables = st.session_state.processed_data.get('tables') or {}
+            if tables:
+                st.write("## Tables chargées")
+                st.caption("Disponibles dans le code généré via tables['nom'].")
+                st.table(pd.DataFrame({
+                    "Table": list(tables),
+                    "Colonnes": [", ".join(map(str, t.columns)) for t in tables.values()]
+                }))
+        if st.session_state.processed_data:
             st.write("## Résumé du dataset")
-            st.markdown(st.session_state.dataset_summary)
+            if st.session_state.dataset_summary:
+                st.markdown(st.session_state.dataset_summary)
+            else:
+                # Le résumé s'affiche au fil de sa génération
+                generate_dataset_summary(stream=True)
+            display_suggestions()
     
     with tabs[1]:
+        processed = st.session_state.processed_data
+        request = (user_query, st.session_state.viz_type, processed['key'] if processed else None)
+        if processed and user_query and request != st.session_state.last_request:
+            with st.spinner("Génération de la visualisation..."):
+                generate_visualization(user_query, st.session_state.viz_type, stream=True)
+                st.session_state.last_request = request
+                save_history_entry("Générale", user_query, st.session_state.visualization_code)
+        elif st.session_state.insights and st.session_state.visualization_code:
+            st.write("### Interprétation")
+            st.markdown(st.session_state.insights.get("interpretation") or "")
         if st.session_state.visualization_code:
             display_dashboard()
+            timings = (st.session_state.insights or {}).get("timings")
+            if timings:
+                st.caption("Temps de génération : " + ", ".join(
+                    f"{name} {value:.2f}s" for name, value in timings.items() if name != "mode" and name not in USAGE_KEYS
+                ) + f" (mode {timings['mode']})")
+                if timings.get("input_tokens") is not None:
+                    st.caption(
+                        f"Jetons d'entrée : {timings['input_tokens']} "
+                        f"dont {timings.get('cached_input_tokens', 0)} lus depuis le cache de prompts"
+                    )
         else:
             st.info("Aucune visualisation générée pour le moment.")
     
@@ -117,14 +213,15 @@ def main():
     with tabs[2]:
         st.write("## Visuels Dynamiques et Interactifs")
         if st.session_state.processed_data:
-            df = st.session_state.processed_data['df']
+            processed = st.session_state.processed_data
+            # Index de filtrage (tri + min/max) calculé une seule fois par dataset
+            filter_index = get_filter_index(processed['key'], processed['df'])
             # Sélection d'une variable numérique pour filtrer (si disponible)
-            numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
+            numeric_cols = filter_index.numeric_columns
             if numeric_cols:
                 variable = st.selectbox("Sélectionnez une variable numérique pour le filtrage :", options=numeric_cols)
-                # Déterminer la plage de valeurs de la variable sélectionnée
-                min_val = float(df[variable].min())
-                max_val = float(df[variable].max())
+                # Plage de valeurs précalculée de la variable sélectionnée
+                min_val, max_val = filter_index.bounds(variable)
                 range_values = st.slider(f"Limitez la plage de la variable '{variable}' :", min_value=min_val, max_value=max_val, value=(min_val, max_val))
             else:
                 variable = None
@@ -135,210 +232,391 @@ def main():
             if dynamic_query and variable and range_values:
                 if st.button("Générer le visuel dynamique"):
                     with st.spinner("Génération du visuel dynamique..."):
-                        generate_dynamic_visualization(dynamic_query, variable, range_values)
+                        generate_dynamic_visualization(dynamic_query, variable, range_values, stream=True)
+            
+            # Le visuel existant est simplement réaffiché sur la vue filtrée quand le curseur bouge
+            if st.session_state.dynamic_visualization_code and variable and range_values:
+                display_dynamic_dashboard(variable, range_values)
         else:
             st.info("Chargez un dataset pour accéder aux visuels dynamiques.")
     
     with tabs[3]:
         st.write("## Historique des Requêtes")
-        if st.session_state.history:
-            for idx, entry in enumerate(st.session_state.history, start=1):
-                with st.expander(f"Requête {idx}: {entry['query']}"):
-                    st.markdown("**Type de visuel :** " + entry.get("viz_type", "Histogramme"))
-                    st.markdown("**Thème appliqué :** " + entry.get("theme", "Standard"))
-                    st.markdown("**Catégorie :** " + entry.get("type", "Générale"))
+        # Historique persistant du dataset courant, affiché page par page
+        total = history_store.count(st.session_state.processed_data['digest']) if st.session_state.processed_data else 0
+        if total:
+            pages = math.ceil(total / settings.HISTORY_PAGE_SIZE)
+            page = st.number_input(f"Page (sur {pages})", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+            for entry in history_store.page(st.session_state.processed_data['digest'], page - 1):
+                with st.expander(f"Requête {entry['id']}: {entry['query']}"):
+                    st.markdown("**Type de visuel :** " + (entry["viz_type"] or "Histogramme"))
+                    st.markdown("**Thème appliqué :** " + (entry["theme"] or "Standard"))
+                    st.markdown("**Catégorie :** " + entry["kind"])
+                    if entry["details"]:
+                        st.markdown("**Filtre :** " + entry["details"])
                     st.markdown("**Interprétation :**")
-                    st.markdown(entry.get("interpretation", ""))
-                    if st.button("Recharger cette visualisation", key=f"reload_{idx}"):
-                        if entry.get("type", "Générale") == "Générale":
-                            st.session_state.visualization_code = entry["visualization_code"]
-                            st.session_state.viz_type = entry.get("viz_type", "Histogramme")
-                            st.session_state.theme_choice = entry.get("theme", "Standard")
-                            logo_url = get_logo_url(st.session_state.theme_choice)
-                            st.image(logo_url, width=200)
-                            display_dashboard()
-                        else:
-                            st.session_state.dynamic_visualization_code = entry["visualization_code"]
-                            st.session_state.viz_type = entry.get("viz_type", "Visuel dynamique")
-                            display_dynamic_dashboard()
+                    st.markdown(entry["interpretation"] or "")
+                    if st.button("Recharger cette visualisation", key=f"reload_{entry['id']}"):
+                        reload_history_entry(entry)
         else:
             st.info("Aucune requête n'a été enregistrée.")
 
+    # Panneau de debug : waterfall des étapes tracées lors de la dernière requête
+    if st.session_state.current_trace:
+        st.session_state.last_trace = st.session_state.current_trace
+    if settings.TRACING_DEBUG_PANEL and st.session_state.last_trace:
+        with st.sidebar.expander("Debug : trace de la dernière requête"):
+            display_trace_waterfall(st.session_state.last_trace)
+
 ##############################
-def process_data(uploaded_file):
-    """Charge et traite le dataset."""
-    df = DataLoader.load_data(uploaded_file)
-    processor = DataProcessor(df)
-    st.session_state.processed_data = {
-        'df': processor.df,
-        'summary': processor.get_summary()
-    }
+@_traced('process_data')
+def process_data(uploaded_files):
+    """
+    Charge et traite le dataset (un ou plusieurs fichiers, archives zip ou classeurs).
+    Le résultat est mis en cache selon le contenu des fichiers et les paramètres de
+    chargement/nettoyage : les reruns Streamlit et les autres sessions qui téléversent
+    les mêmes fichiers ne les reparsent pas.
+    """
+    digest = files_digest(uploaded_files)
+    key = dataset_key(digest, dataset_params())
+    current = st.session_state.processed_data
+    if current and current.get('key') == key:
+        set_attribute('cache.hit', True)
+        frame_registry.attach(_session_id(), key, current['df'])
+        return
+
+    processed = load_dataset(uploaded_files, digest)
+    # Une seule instance du DataFrame pour toutes les sessions qui utilisent ce dataset
+    df = frame_registry.attach(_session_id(), key, processed['df'])
+    processed['df'] = df
+    processed['profile'] = get_profile(key, df)
+    st.session_state.processed_data = processed
+    st.session_state.dataset_summary = None
+    # Les suggestions préchargées concernaient le dataset précédent
+    if st.session_state.prefetcher:
+        st.session_state.prefetcher.cancel()
+        st.session_state.prefetcher = None
 
 ##############################
-def generate_dataset_summary():
+@_traced('generate_dataset_summary')
+def generate_dataset_summary(stream: bool = False):
     """
-    Utilise l'LLM pour générer un bref résumé du dataset à partir des noms de colonnes,
+    Utilise l'LLM pour générer un bref résumé du dataset à partir du profil compact des colonnes,
     en fournissant trois suggestions de visualisations pertinentes.
+    Avec `stream=True`, le texte est affiché au fur et à mesure de sa génération.
+    Les suggestions sont ensuite préchargées en tâche de fond.
     """
-    df = st.session_state.processed_data['df']
-    client = ClaudeClient()
+    processed = st.session_state.processed_data
+    client = get_client()
     
-    prompt = f"""
-    Tu es un expert en data analysis.
-    Voici les noms des colonnes d'un dataset : {list(df.columns)}.
-    Fournis un bref résumé du dataset en décrivant quelles informations pourraient être contenues et ce que ces variables indiquent.
-    Ensuite, suggère trois types de visualisations pertinents à réaliser sur ce dataset, par exemple :
-      1. Un histogramme pour observer la distribution d'une variable quantitative.
-      2. Un scatter plot pour analyser la relation entre deux variables.
-      3. Une heatmap pour visualiser les corrélations entre variables.
-    Ne fournis que le résumé et les suggestions, sans code.
-    """
-    summary_text = client.generate_insights(prompt, data_summary={})
+    prompt = summary_prompt(processed['profile'].digest(), processed.get('source'), tables_digest(processed.get('tables')),
+                            processed.get('source_rows'))
+    if stream:
+        summary_text = st.write_stream(client.stream_insights(prompt))
+    else:
+        summary_text = client.generate_insights(prompt, data_summary={})
     st.session_state.dataset_summary = summary_text
+    if settings.PREFETCH_ENABLED:
+        # Priorité basse : les requêtes de l'utilisateur passent avant le préchargement
+        st.session_state.prefetcher = Prefetcher(processed, get_client(BACKGROUND), get_executor()).start(
+            parse_suggestions(summary_text)
+        )
+
+##############################
+def display_suggestions():
+    """Boutons des visualisations suggérées : un clic affiche la figure préchargée dans l'onglet général."""
+    prefetcher = st.session_state.prefetcher
+    if not prefetcher or not prefetcher.items:
+        return
+    st.write("## Visualisations suggérées")
+    for i, item in enumerate(prefetcher.items):
+        label = item['query'] + (" (prête)" if item['status'] == 'ready' else "")
+        if st.button(label, key=f"suggestion_{i}"):
+            with st.spinner("Génération de la visualisation..."):
+                show_suggestion(item)
+            st.success("Visualisation affichée dans l'onglet « Visualisation Générale ».")
 
 ##############################
-def generate_visualization(query: str, viz_type: str):
+@_traced('show_suggestion')
+def show_suggestion(item: dict):
+    """Affiche une suggestion : résultat préchargé si disponible, sinon génération immédiate."""
+    if not _try_prefetched(item['query'], item=item):
+        # Préchargement déjà attendu : pas de seconde attente dans generate_visualization
+        generate_visualization(item['query'], item['viz_type'], prefetched=False)
+    save_history_entry("Générale", item['query'], st.session_state.visualization_code, viz_type=item['viz_type'])
+
+##############################
+@_traced('generate_visualization')
+def generate_visualization(query: str, viz_type: str, stream: bool = False, prefetched: bool = True):
     """
     Utilise l'LLM pour générer l'interprétation textuelle et le code complet de la visualisation générale.
     Le LLM doit choisir automatiquement la meilleure bibliothèque en fonction de la demande.
     Le code généré doit être complet, précis, sans balises ni commentaires, et prêt à être exécuté.
+    Les questions reconnues par le routeur local sont tracées avec Visualizer, sans appel au LLM.
+    `prefetched=False` saute la recherche d'une suggestion préchargée (déjà faite par l'appelant).
     """
-    df = st.session_state.processed_data['df']
-    client = ClaudeClient()
-    full_query = query.strip()
+    if (prefetched and _try_prefetched(query, stream)) or _try_local_visualization(query, viz_type, stream):
+        return
+    processed = st.session_state.processed_data
+    client = get_client()
+    interpretation_prompt, code_prompt = visualization_prompts(
+        processed['profile'].digest(), query, viz_type, processed.get('source'), tables_digest(processed.get('tables')),
+        processed.get('source_rows')
+    )
+    code_snippet = _generate_interpretation_and_code(client, interpretation_prompt, code_prompt, stream)
     
-    # Génération de l'interprétation textuelle
-    data_summary = st.session_state.dataset_summary or ""
-    interpretation_prompt = f"""
-    Tu es un expert en data visualization en Python.
-    Le dataset est chargé dans la variable 'df' et contient les colonnes : {list(df.columns)}.
-    L'utilisateur a posé la question suivante pour obtenir une visualisation de type "{viz_type}" : "{full_query}".
-    Fournis une courte interprétation textuelle décrivant ce que le graphique devrait montrer.
-    Ne fournis que le texte, sans code.
+    st.session_state.visualization_code = code_snippet
+
+##############################
+def _try_prefetched(query: str, stream: bool = False, item: dict = None) -> bool:
     """
-    interpretation_response = client.generate_insights(interpretation_prompt, data_summary={})
-    
-    # Génération du code de visualisation (le LLM choisira la bibliothèque la plus adaptée)
-    code_prompt = f"""
-    Tu es un expert en data visualization en Python.
-    Le dataset est chargé dans la variable 'df' et contient les colonnes : {list(df.columns)}.
-    L'utilisateur a posé la question suivante pour obtenir une visualisation de type "{viz_type}" : "{full_query}".
-    Génère un snippet de code Python complet qui crée une visualisation pertinente à partir de 'df'.
-    Choisis automatiquement la bibliothèque la plus adaptée.
-    Assure-toi que le code utilise la variable 'df' et affecte le graphique à la variable 'fig'.
-    Ne fournis que le code, sans aucun formatage, commentaires ou explications, et n'utilise pas de formatage de type %d.
+    Réutilise la visualisation préchargée d'une suggestion proche de la question (ou de `item`),
+    en attendant la fin de sa génération au plus [PREFETCH] WAIT_SECONDS si elle est en cours.
+    Retourne False si aucune n'est disponible à temps : la génération directe, prioritaire, prend le relais.
     """
-    code_snippet = client.generate_insights(code_prompt, data_summary={})
-    
-    try:
-        st.session_state.insights = {
-            "interpretation": json.loads(interpretation_response).get("analysis"),
-            "code": code_snippet
-        }
-    except json.JSONDecodeError:
-        st.session_state.insights = {
-            "interpretation": interpretation_response,
-            "code": code_snippet
-        }
-    
-    st.session_state.visualization_code = code_snippet
+    prefetcher = st.session_state.prefetcher
+    if prefetcher is None:
+        return False
+    start = time.perf_counter()
+    item = item or prefetcher.match(query)
+    result = prefetcher.result(item, timeout=settings.PREFETCH_WAIT_SECONDS) if item else None
+    set_attribute('prefetch.hit', result is not None)
+    if result is None:
+        return False
+
+    if stream:
+        st.write("### Interprétation")
+        st.markdown(result['interpretation'])
+    st.session_state.insights = {
+        "interpretation": result['interpretation'],
+        "code": result['code'],
+        "timings": {"mode": "prefetch", "total": time.perf_counter() - start}
+    }
+    st.session_state.visualization_code = result['code']
+    return True
+
+##############################
+def _try_local_visualization(query: str, viz_type: str, stream: bool = False) -> bool:
+    """
+    Tente le chemin rapide : template Visualizer choisi et paramétré localement.
+    Retourne False (repli sur le LLM) si la question n'est pas reconnue ou si le rendu échoue.
+    """
+    start = time.perf_counter()
+    route = route_locally(st.session_state.processed_data, query, viz_type, get_executor())
+    # Seules les questions de l'utilisateur comptent (ni le préchargement, ni le mode batch)
+    router_stats.record(local=route is not None)
+    if route is None:
+        return False
+
+    if stream:
+        st.write("### Interprétation")
+        st.markdown(route['interpretation'])
+    st.session_state.insights = {
+        "interpretation": route['interpretation'],
+        "code": route['code'],
+        "timings": {"mode": "local", "total": time.perf_counter() - start}
+    }
+    st.session_state.visualization_code = route['code']
+    return True
 
 ##############################
-def generate_dynamic_visualization(query: str, variable: str, range_values: tuple):
+@_traced('generate_dynamic_visualization')
+def generate_dynamic_visualization(query: str, variable: str, range_values: tuple, stream: bool = False):
     """
     Génère un visuel dynamique/interactif en filtrant le dataset selon une variable numérique et une plage donnée.
     L'utilisateur fournit une question spécifique pour ce visuel dynamique.
     """
-    df = st.session_state.processed_data['df']
-    client = ClaudeClient()
-    full_query = query.strip()
+    client = get_client()
+    processed = st.session_state.processed_data
+    interpretation_prompt, code_prompt = dynamic_prompts(
+        processed['profile'].digest(), query, variable, range_values, tables_digest(processed.get('tables'))
+    )
+    code_snippet = _generate_interpretation_and_code(client, interpretation_prompt, code_prompt, stream)
     
-    # Génération de l'interprétation textuelle pour le visuel dynamique
-    data_summary = st.session_state.dataset_summary or ""
-    interpretation_prompt = f"""
-    Tu es un expert en data visualization interactif en Python.
-    Le dataset est chargé dans la variable 'df' et contient les colonnes : {list(df.columns)}.
-    L'utilisateur souhaite créer un visuel dynamique de type "Interactif dynamique" pour filtrer les données de la variable "{variable}" entre {range_values[0]} et {range_values[1]}.
-    La question posée est : "{full_query}".
-    Fournis une courte interprétation textuelle décrivant ce que le graphique dynamique devrait montrer.
-    Ne fournis que le texte, sans code.
+    st.session_state.dynamic_visualization_code = code_snippet
+    # Enregistrer cette requête dans l'historique en tant que dynamique
+    save_history_entry(
+        "Dynamique", query, code_snippet,
+        details=f"Filtrage sur '{variable}' entre {range_values[0]} et {range_values[1]}",
+        viz_type="Interactif dynamique",
+        variable=variable, range_values=range_values
+    )
+
+##############################
+def save_history_entry(kind: str, query: str, code: str, details: str = None, viz_type: str = None,
+                       variable: str = None, range_values: tuple = None):
     """
-    interpretation_response = client.generate_insights(interpretation_prompt, data_summary={})
-    
-    # Génération du code du visuel dynamique
-    code_prompt = f"""
-    Tu es un expert en data visualization interactif en Python.
-    Le dataset est chargé dans la variable 'df' et contient les colonnes : {list(df.columns)}.
-    L'utilisateur souhaite créer un visuel dynamique de type "Interactif dynamique" pour filtrer les données de la variable "{variable}" entre {range_values[0]} et {range_values[1]}.
-    La question posée est : "{full_query}".
-    Génère un snippet de code Python complet qui crée une visualisation interactive pertinente à partir de 'df'
-    en filtrant la variable "{variable}" dans la plage [{range_values[0]}, {range_values[1]}].
-    Choisis automatiquement la bibliothèque la plus adaptée.
-    Assure-toi que le code utilise la variable 'df' et affecte le graphique à la variable 'fig'.
-    Ne fournis que le code, sans aucun formatage, commentaires ou explications.
+    Enregistre la requête dans l'historique persistant du dataset, avec la figure JSON
+    (rendue une fois ici, puis réutilisée telle quelle au rechargement).
     """
-    code_snippet = client.generate_insights(code_prompt, data_summary={})
-    
     try:
-        st.session_state.insights = {
-            "interpretation": json.loads(interpretation_response).get("analysis"),
-            "code": code_snippet
-        }
-    except json.JSONDecodeError:
-        st.session_state.insights = {
-            "interpretation": interpretation_response,
-            "code": code_snippet
-        }
-    
-    st.session_state.dynamic_visualization_code = code_snippet
-    # Enregistrer cette requête dans l'historique en tant que dynamique
-    st.session_state.history.append({
-        "query": query,
-        "details": f"Filtrage sur '{variable}' entre {range_values[0]} et {range_values[1]}",
-        "interpretation": st.session_state.insights.get("interpretation"),
-        "visualization_code": st.session_state.dynamic_visualization_code,
-        "viz_type": "Interactif dynamique",
-        "theme": st.session_state.theme_choice,
-        "type": "Dynamique"
-    })
-    display_dynamic_dashboard()
+        figure_json = _figure_json(code, variable, range_values)
+    except SnippetError:
+        figure_json = None
+    history_store.add(
+        st.session_state.processed_data['digest'], kind, query, code,
+        interpretation=(st.session_state.insights or {}).get("interpretation"),
+        details=details,
+        viz_type=viz_type or st.session_state.viz_type,
+        theme=st.session_state.theme_choice,
+        figure_json=figure_json
+    )
+
+##############################
+def reload_history_entry(entry: dict):
+    """Réaffiche une entrée de l'historique à partir de la figure enregistrée, sans réexécuter le code."""
+    if entry["kind"] == "Générale":
+        st.session_state.visualization_code = entry["code"]
+        st.session_state.insights = {"interpretation": entry["interpretation"], "code": entry["code"]}
+        st.session_state.viz_type = entry["viz_type"] or "Histogramme"
+        st.session_state.theme_choice = entry["theme"] or "Standard"
+        st.image(get_logo_url(st.session_state.theme_choice), width=200)
+    else:
+        st.session_state.dynamic_visualization_code = entry["code"]
+        st.session_state.viz_type = entry["viz_type"] or "Visuel dynamique"
+
+    figure_json = history_store.figure(entry["id"])
+    if figure_json is not None:
+        import plotly.io as pio
+
+        st.plotly_chart(pio.from_json(figure_json), use_container_width=True)
+    elif entry["kind"] == "Générale":
+        display_dashboard()
+    else:
+        display_dynamic_dashboard()
+
+##############################
+def _generate_interpretation_and_code(client, interpretation_prompt, code_prompt, stream: bool = False) -> str:
+    """
+    Lance les deux requêtes (interprétation et code) en même temps, ou en une seule requête
+    combinée selon la configuration, et enregistre le résultat dans st.session_state.insights.
+    Avec `stream=True`, l'interprétation est affichée au fil de l'eau pendant que le code est généré.
+    """
+    if stream and not settings.COMBINED_REQUEST:
+        deltas, code_future, timings = client.stream_interpretation_and_code(interpretation_prompt, code_prompt)
+        st.write("### Interprétation")
+        interpretation_response = st.write_stream(deltas)
+        code_snippet = code_future.result()
+        timings['total'] = max(timings.get('interpretation', 0), timings.get('code', 0))
+    else:
+        interpretation_response, code_snippet, timings = client.generate_interpretation_and_code(
+            interpretation_prompt, code_prompt
+        )
+    interpretation = parse_interpretation(interpretation_response)
+    if stream and timings['mode'] != 'streaming':
+        st.write("### Interprétation")
+        st.markdown(interpretation)
+    st.session_state.insights = {
+        "interpretation": interpretation,
+        "code": code_snippet,
+        "timings": timings
+    }
+    return code_snippet
 
 ##############################
+@_traced('display_dashboard')
 def display_dashboard():
     """
     Exécute le code généré pour afficher la visualisation générale.
     Seule la visualisation est affichée, pas le code.
     """
     st.write("## Visualisation générée")
-    local_namespace = {'df': st.session_state.processed_data['df']}
     
     try:
-        exec(st.session_state.visualization_code, {}, local_namespace)
-        if 'fig' in local_namespace:
-            st.plotly_chart(local_namespace['fig'], use_container_width=True)
-        else:
-            st.error("Le code généré n'a pas produit de variable 'fig'.")
-    except Exception as e:
+        st.plotly_chart(_render_figure(st.session_state.visualization_code), use_container_width=True)
+    except MissingFigureError:
+        st.error("Le code généré n'a pas produit de variable 'fig'.")
+    except SnippetError as e:
         st.error(f"Erreur lors de l'exécution du code généré : {e}")
 
 ##############################
-def display_dynamic_dashboard():
+@_traced('display_dynamic_dashboard')
+def display_dynamic_dashboard(variable: str = None, range_values: tuple = None):
     """
     Exécute le code généré pour afficher le visuel dynamique.
     Seul le visuel dynamique est affiché.
+    Si une variable et une plage sont fournies, le code est réexécuté sur la vue filtrée
+    (recherche dichotomique dans l'index), sans nouvel appel au LLM.
     """
     st.write("## Visuel Dynamique généré")
-    local_namespace = {'df': st.session_state.processed_data['df']}
     
     try:
-        exec(st.session_state.dynamic_visualization_code, {}, local_namespace)
-        if 'fig' in local_namespace:
-            st.plotly_chart(local_namespace['fig'], use_container_width=True)
-        else:
-            st.error("Le code généré n'a pas produit de variable 'fig' pour le visuel dynamique.")
-    except Exception as e:
+        st.plotly_chart(
+            _render_figure(st.session_state.dynamic_visualization_code, variable, range_values),
+            use_container_width=True
+        )
+    except MissingFigureError:
+        st.error("Le code généré n'a pas produit de variable 'fig' pour le visuel dynamique.")
+    except SnippetError as e:
         st.error(f"Erreur lors de l'exécution du code généré pour le visuel dynamique : {e}")
 
+##############################
+def _render_figure(code: str, variable: str = None, range_values: tuple = None):
+    """
+    Exécute le snippet dans le pool de workers isolés et retourne la figure Plotly.
+    La figure JSON est mise en cache par (code, dataset, filtre) : un rerun ou un rechargement
+    depuis l'historique ne réexécute pas le code.
+    """
+    # Plotly n'est chargé qu'au premier rendu, pas au démarrage de l'application
+    import plotly.io as pio
+
+    figure_json = _figure_json(code, variable, range_values)
+    with tracer.span('plotly.from_json', figure_bytes=len(figure_json)):
+        return pio.from_json(figure_json)
+
+##############################
+def _figure_json(code: str, variable: str = None, range_values: tuple = None) -> str:
+    """Figure JSON du snippet sur le dataset courant, éventuellement restreint à une plage de `variable`."""
+    processed = st.session_state.processed_data
+    rows, view_key = None, None
+    if variable is not None and range_values is not None:
+        filter_index = get_filter_index(processed['key'], processed['df'])
+        if not filter_index.is_full_range(variable, *range_values):
+            rows = filter_index.range_positions(variable, *range_values)
+            view_key = f"{variable}:{range_values[0]!r}:{range_values[1]!r}"
+    return get_executor().render(
+        code, processed['df'], processed['key'], rows, view_key, processed.get('source'), processed.get('tables')
+    )
+
+##############################
+def display_trace_waterfall(spans: list):
+    """Affiche les spans sous forme de waterfall (décalage et durée de chaque étape)."""
+    import plotly.graph_objects as go
+
+    spans = sorted(spans, key=lambda span: span.start_ns)
+    origin = spans[0].start_ns
+    parents = {span.span_id: span.parent_id for span in spans}
+
+    def depth(span):
+        level, parent = 0, span.parent_id
+        while parent:
+            level, parent = level + 1, parents.get(parent)
+        return level
+
+    fig = go.Figure(go.Bar(
+        y=list(range(len(spans))),
+        x=[span.duration * 1000 for span in spans],
+        base=[(span.start_ns - origin) / 1e6 for span in spans],
+        orientation='h',
+        hovertext=[json.dumps(span.attributes, default=str) for span in spans],
+        marker_color=['crimson' if span.status == 'ERROR' else 'steelblue' for span in spans]
+    ))
+    fig.update_yaxes(
+        tickvals=list(range(len(spans))),
+        ticktext=["  " * depth(span) + span.name for span in spans],
+        autorange='reversed'
+    )
+    fig.update_layout(xaxis_title="ms", height=max(200, 28 * len(spans)), margin=dict(l=10, r=10, t=10, b=10))
+    st.plotly_chart(fig, use_container_width=True)
+
+    input_tokens = sum(span.attributes.get('gen_ai.usage.input_tokens', 0) for span in spans)
+    output_tokens = sum(span.attributes.get('gen_ai.usage.output_tokens', 0) for span in spans)
+    hits = [span.attributes['cache.hit'] for span in spans if 'cache.hit' in span.attributes]
+    st.caption(
+        f"Jetons : {input_tokens} en entrée, {output_tokens} en sortie. "
+        f"Cache : {sum(1 for hit in hits if hit)} succès / {len(hits)} consultations."
+    )
+
 ##############################
 if __name__ == "__main__":
     main()
@@ -0,0 +1,232 @@
+"""
+Mode batch, sans Streamlit : exécute une liste de questions sur un ou plusieurs datasets
+et écrit les figures (JSON et HTML) avec un rapport de temps par tâche.
+
+    python -m datavisapp.batch manifest.json --output dashboards/ --workers 8 --llm-concurrency 4
+
+Le manifest est une liste JSON (ou {"jobs": [...]}) ou un CSV avec les colonnes
+dataset, question, viz_type et, en option, id. Les chemins des datasets sont relatifs au manifest ;
+un dataset peut être une archive zip ou un classeur Excel à plusieurs feuilles (tables nommées).
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from .config import settings
+from .executor import SnippetExecutor
+from .pipeline import generate_visualization, load_dataset
+
+DEFAULT_VIZ_TYPE = "Graphique"
+
+
+##############################
+# Manifest
+
+def load_manifest(path) -> list:
+    """Lit le manifest et retourne la liste des tâches {id, dataset, question, viz_type}."""
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            entries = list(csv.DictReader(f))
+    else:
+        entries = json.loads(path.read_text(encoding='utf-8'))
+        if isinstance(entries, dict):
+            entries = entries.get('jobs', [])
+
+    jobs, seen = [], set()
+    for i, entry in enumerate(entries):
+        if not entry.get('dataset') or not entry.get('question'):
+            raise ValueError(f"Tâche {i} du manifest : 'dataset' et 'question' sont obligatoires")
+        job_id = re.sub(r'[^A-Za-z0-9_.-]+', '_', str(entry.get('id') or f"job-{i:04d}"))
+        if job_id in seen:
+            raise ValueError(f"Identifiant de tâche en double dans le manifest : {job_id}")
+        seen.add(job_id)
+        jobs.append({
+            'id': job_id,
+            'dataset': str((path.parent / entry['dataset']).resolve()),
+            'question': entry['question'],
+            'viz_type': entry.get('viz_type') or DEFAULT_VIZ_TYPE
+        })
+    return jobs
+
+
+##############################
+# Préparation des datasets (processus séparés)
+
+def _prepare_dataset(path: str) -> dict:
+    """Charge, nettoie et profile un dataset dans un processus du pool ; le résultat est picklable."""
+    start = time.perf_counter()
+    dataset = load_dataset(path)
+    schema = dataset['profile'].digest()
+    del dataset['profile']
+    dataset['schema'] = schema
+    dataset['seconds'] = time.perf_counter() - start
+    return dataset
+
+
+##############################
+# Exécution
+
+class BatchRunner:
+    """
+    Exécute les tâches d'un manifest :
+    - chargement et nettoyage de chaque dataset distinct dans un pool de processus ;
+    - génération (routeur local puis LLM), avec au plus `llm_concurrency` appels simultanés à l'API
+      et nouvelles tentatives sur limite de débit ;
+    - exécution des snippets dans le pool de l'exécuteur sandboxé.
+    Les tâches d'un dataset démarrent dès que celui-ci est prêt.
+    """
+
+    def __init__(self, workers: int = None, llm_concurrency: int = None, client=None, executor=None,
+                 formats=('json', 'html')):
+        from .api import ClaudeClient
+        from .llm_cache import response_cache
+        from .scheduler import BACKGROUND
+
+        self.workers = workers or settings.BATCH_WORKERS or os.cpu_count() or 1
+        self.llm_concurrency = llm_concurrency or settings.BATCH_LLM_CONCURRENCY
+        # Priorité basse : les sessions interactives du même processus passent d'abord
+        # Cache persistant pour l'API réelle seulement : un client injecté (faux client) n'y écrit pas
+        self.client = ClaudeClient(client=client, cache=response_cache if client is None else None,
+                                   max_concurrency=self.llm_concurrency, priority=BACKGROUND)
+        self._own_executor = executor is None
+        self.executor = executor or SnippetExecutor(workers=self.workers)
+        self.formats = tuple(formats)
+
+    def run(self, jobs: list, output_dir) -> dict:
+        """Exécute toutes les tâches et écrit les figures et `report.json` dans `output_dir`."""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+
+        context = multiprocessing.get_context('spawn')
+        paths = sorted({job['dataset'] for job in jobs})
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(paths)) or 1, mp_context=context) as loaders:
+            datasets = {path: loaders.submit(_prepare_dataset, path) for path in paths}
+            # Les tâches attendent surtout le LLM ou le pool d'exécution : plus de threads que de processus
+            with ThreadPoolExecutor(max_workers=self.workers + 2 * self.llm_concurrency) as threads:
+                results = list(threads.map(
+                    lambda job: self._run_job(job, datasets[job['dataset']], output_dir), jobs
+                ))
+
+        wall = time.perf_counter() - start
+        report = {
+            'summary': {
+                'jobs': len(results),
+                'succeeded': sum(r['status'] == 'ok' for r in results),
+                'failed': sum(r['status'] != 'ok' for r in results),
+                'local': sum(r.get('mode') == 'local' for r in results),
+                'datasets': len(paths),
+                'workers': self.workers,
+                'llm_concurrency': self.llm_concurrency,
+                'wall_seconds': round(wall, 3),
+                'jobs_per_second': round(len(results) / wall, 3) if wall else None
+            },
+            'jobs': results
+        }
+        (output_dir / 'report.json').write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        return report
+
+    def _run_job(self, job: dict, dataset_future, output_dir: Path) -> dict:
+        result = {**job, 'status': 'ok'}
+        timings = result['timings'] = {}
+        start = step = time.perf_counter()
+
+        def lap(name):
+            nonlocal step
+            now = time.perf_counter()
+            timings[name] = round(now - step, 4)
+            step = now
+
+        try:
+            dataset = dataset_future.result()
+            timings['prepare'] = round(dataset['seconds'], 4)
+            lap('wait_dataset')
+
+            generated = generate_visualization(
+                dataset, job['question'], job['viz_type'], self.client, self.executor, schema=dataset['schema']
+            )
+            result['mode'] = generated['timings'].get('mode')
+            result['interpretation'] = generated['interpretation']
+            result['code'] = generated['code']
+            lap('generate')
+
+            figure_json = self.executor.render(
+                generated['code'], dataset['df'], dataset['key'], source=dataset.get('source'),
+                tables=dataset.get('tables')
+            )
+            lap('exec')
+
+            result['outputs'] = self._write(job['id'], figure_json, output_dir)
+            lap('write')
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = f"{type(e).__name__}: {e}"
+        timings['total'] = round(time.perf_counter() - start, 4)
+        return result
+
+    def _write(self, job_id: str, figure_json: str, output_dir: Path) -> list:
+        outputs = []
+        if 'json' in self.formats:
+            path = output_dir / f"{job_id}.json"
+            path.write_text(figure_json, encoding='utf-8')
+            outputs.append(path.name)
+        if 'html' in self.formats:
+            import plotly.io as pio
+
+            path = output_dir / f"{job_id}.html"
+            pio.write_html(pio.from_json(figure_json), path, include_plotlyjs='cdn', full_html=True)
+            outputs.append(path.name)
+        return outputs
+
+    def close(self):
+        if self._own_executor:
+            self.executor.shutdown()
+
+
+##############################
+# Ligne de commande
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m datavisapp.batch',
+        description="Génère des visualisations sans interface pour chaque tâche d'un manifest."
+    )
+    parser.add_argument('manifest', help="Manifest JSON ou CSV (dataset, question, viz_type, id)")
+    parser.add_argument('--output', '-o', default='batch_output', help="Répertoire des figures et du rapport")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processus pour le chargement et l'exécution (défaut : [BATCH] WORKERS ou nombre de cœurs)")
+    parser.add_argument('--llm-concurrency', type=int, default=None,
+                        help="Appels simultanés maximum à l'API Claude (défaut : [BATCH] LLM_CONCURRENCY)")
+    parser.add_argument('--format', default='json,html', help="Sorties à écrire : json, html ou json,html")
+    args = parser.parse_args(argv)
+
+    jobs = load_manifest(args.manifest)
+    runner = BatchRunner(
+        workers=args.workers,
+        llm_concurrency=args.llm_concurrency,
+        formats=[f.strip() for f in args.format.split(',') if f.strip()]
+    )
+    try:
+        report = runner.run(jobs, args.output)
+    finally:
+        runner.close()
+
+    summary = report['summary']
+    print(f"{summary['succeeded']}/{summary['jobs']} tâches réussies ({summary['local']} sans LLM) "
+          f"en {summary['wall_seconds']} s, soit {summary['jobs_per_second']} tâches/s")
+    for job in report['jobs']:
+        if job['status'] != 'ok':
+            print(f"  {job['id']} : {job['error']}")
+    print(f"Rapport : {Path(args.output) / 'report.json'}")
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+from .config import settings
+from .llm_cache import SingleFlight
+
+
+def file_digest(file) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier (chemin ou objet fichier téléversé)."""
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+    if hasattr(file, 'getbuffer'):
+        # BytesIO / UploadedFile de Streamlit : pas de copie du contenu
+        return hashlib.sha256(file.getbuffer()).hexdigest()
+    file.seek(0)
+    digest = hashlib.file_digest(file, 'sha256').hexdigest()
+    file.seek(0)
+    return digest
+
+
+def files_digest(files) -> str:
+    """Empreinte d'un ou plusieurs fichiers (contenu et nom de chacun, les noms devenant des noms de tables)."""
+    if not isinstance(files, (list, tuple)):
+        return file_digest(files)
+    if len(files) == 1:
+        return file_digest(files[0])
+    parts = [f"{os.path.basename(str(getattr(f, 'name', f)))}:{file_digest(f)}" for f in files]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def table_key(key: str, name: str) -> str:
+    """Clé de cache d'une table nommée d'un dataset à plusieurs tables."""
+    return f"{key}.{name}"
+
+
+def dataset_key(digest: str, params: dict) -> str:
+    """Clé de cache : contenu du fichier + paramètres de chargement et de nettoyage."""
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(f"{digest}:{payload}".encode()).hexdigest()
+
+
+class DatasetCache:
+    """
+    Cache à deux niveaux des datasets traités :
+    - un LRU en mémoire (partagé par toutes les sessions du processus) ;
+    - un niveau disque au format Parquet, avec éviction par taille totale.
+    """
+
+    def __init__(self, directory=None, memory_items: int = None, disk_max_bytes: int = None):
+        self.directory = Path(directory or settings.DATASET_CACHE_DIR)
+        self.memory_items = memory_items if memory_items is not None else settings.DATASET_CACHE_ITEMS
+        self.disk_max_bytes = disk_max_bytes if disk_max_bytes is not None else settings.DATASET_CACHE_MAX_MB * 1024 * 1024
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # Une seule construction par clé : les autres sessions attendent son résultat
+        self._building = SingleFlight()
+        self.hits = {'memory': 0, 'disk': 0, 'miss': 0}
+
+    def get(self, key: str):
+        """Retourne (df, meta) ou None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits['memory'] += 1
+                return self._memory[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.hits['miss'] += 1
+                return None
+            self.hits['disk'] += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, df: pd.DataFrame, meta: dict = None):
+        entry = (df, meta or {})
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, df, entry[1])
+        return entry
+
+    def get_or_create(self, key: str, factory):
+        """
+        Retourne l'entrée en cache ou la construit via `factory() -> (df, meta)`.
+        Deux sessions qui demandent la même clé en même temps ne la construisent qu'une fois.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        def build():
+            # Une construction concurrente a pu se terminer entre-temps
+            with self._lock:
+                entry = self._memory.get(key)
+            return entry if entry is not None else self.put(key, *factory())
+
+        return self._building.do(key, build)
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _paths(self, key):
+        return self.directory / f"{key}.parquet", self.directory / f"{key}.json"
+
+    def _read_disk(self, key):
+        data_path, meta_path = self._paths(key)
+        if not data_path.exists():
+            return None
+        try:
+            df = pd.read_parquet(data_path)
+            meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        except (OSError, ValueError):
+            return None
+        # Marque l'entrée comme récemment utilisée pour l'éviction
+        os.utime(data_path)
+        return df, meta
+
+    def _write_disk(self, key, df, meta):
+        if self.disk_max_bytes <= 0:
+            return
+        data_path, meta_path = self._paths(key)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Fichier temporaire propre à l'écrivain : plusieurs processus peuvent écrire la même clé
+        tmp_path = data_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, data_path)
+            meta_path.write_text(json.dumps(meta, default=str))
+        except (OSError, ValueError, TypeError):
+            # Certains types (objets Python hétérogènes) ne sont pas sérialisables en Parquet :
+            # l'entrée reste alors uniquement en mémoire.
+            tmp_path.unlink(missing_ok=True)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = sorted(self.directory.glob('*.parquet'), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        while files and total > self.disk_max_bytes:
+            oldest = files.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink(missing_ok=True)
+            oldest.with_suffix('.json').unlink(missing_ok=True)
+
+
+class FrameRegistry:
+    """
+    Registre des DataFrames utilisés par les sessions actives.
+    Toutes les sessions qui ont chargé le même dataset (même clé) reçoivent le même objet,
+    même si le cache LRU l'a évincé entre-temps : il n'est jamais dupliqué en mémoire.
+    Les frames partagées ne doivent pas être modifiées en place.
+    """
+
+    def __init__(self, session_ttl: float = None):
+        self.session_ttl = session_ttl if session_ttl is not None else settings.SESSION_TTL_MINUTES * 60
+        self._frames = {}    # clé -> (df, octets)
+        self._sessions = {}  # identifiant de session -> (clé, dernière activité)
+        self._lock = threading.Lock()
+
+    def attach(self, session_id: str, key: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Associe la session au dataset et retourne l'instance partagée."""
+        with self._lock:
+            self._sessions[session_id] = (key, time.monotonic())
+            if key not in self._frames:
+                self._frames[key] = (df, frame_nbytes(df))
+            self._prune()
+            return self._frames[key][0]
+
+    def detach(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._prune()
+
+    def footprint(self, session_id: str) -> dict:
+        """Mémoire du dataset de la session, nombre de sessions qui le partagent et part par session."""
+        with self._lock:
+            key, _ = self._sessions.get(session_id, (None, None))
+            if key not in self._frames:
+                return {'dataset_bytes': 0, 'shared_by': 0, 'session_bytes': 0}
+            shared_by = sum(1 for k, _ in self._sessions.values() if k == key)
+            nbytes = self._frames[key][1]
+            return {'dataset_bytes': nbytes, 'shared_by': shared_by, 'session_bytes': nbytes // shared_by}
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(nbytes for _, nbytes in self._frames.values())
+
+    def _prune(self):
+        now = time.monotonic()
+        for session_id, (_, seen) in list(self._sessions.items()):
+            if now - seen > self.session_ttl:
+                del self._sessions[session_id]
+        used = {key for key, _ in self._sessions.values()}
+        for key in list(self._frames):
+            if key not in used:
+                del self._frames[key]
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Taille mémoire réelle du DataFrame (texte compris)."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+dataset_cache = DatasetCache()
+frame_registry = FrameRegistry()
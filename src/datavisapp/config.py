@@ -1,33 +1,134 @@
-from pathlib import Path
 import configparser
+import functools
 import os
-from dotenv import load_dotenv
+from pathlib import Path
 
 # Chemin ABSOLU du projet (à adapter si besoin)
 BASE_DIR = Path(__file__).parent.parent.parent
-env_path = BASE_DIR / '.env'
-load_dotenv(env_path)
+CONFIG_PATH = BASE_DIR / 'settings.toml'
+ENV_PATH = BASE_DIR / '.env'
 
-# Charger la configuration depuis un fichier settings.toml
-config = configparser.ConfigParser()
-config_path = BASE_DIR / 'settings.toml'
-config.read(config_path)
+# Sections lues par Settings : une section absente de settings.toml prend les valeurs par défaut
+SECTIONS = ('DATA', 'CLEANING', 'PROFILE', 'CACHE', 'EXEC', 'ENGINE', 'HISTORY', 'BATCH', 'PREFETCH',
+            'TRACING', 'VIZ', 'LLM')
 
-print(f"Chemin config : {config_path}")
-print(f"Sections config : {config.sections()}")
 
 class Settings:
-    # Data Processing
-    MAX_ROWS = int(config['DATA'].get('MAX_ROWS', '10000'))
-    SAMPLE_SIZE = int(config['DATA'].get('SAMPLE_SIZE', '1000'))
-    
-    # Visualization
-    DEFAULT_THEME = config['VIZ'].get('DEFAULT_THEME', 'plotly_white')
-    COLOR_SCHEME = config['VIZ'].get('COLOR_SCHEME', 'Viridis')
-    
-    # LLM
-    CLAUDE_API_KEY = os.getenv('CLAUDE_API_KEY')
-    MAX_TOKENS = int(config['LLM'].get('MAX_TOKENS', '1000'))
-    TEMPERATURE = float(config['LLM'].get('TEMPERATURE', '0.7'))
-
-settings = Settings()
+    """Configuration lue dans settings.toml et dans les variables d'environnement (.env)."""
+
+    def __init__(self, config: configparser.ConfigParser):
+        # Un settings.toml plus ancien n'a pas toutes les sections : les valeurs par défaut s'appliquent
+        for section in SECTIONS:
+            if not config.has_section(section):
+                config.add_section(section)
+
+        # Data Processing
+        self.MAX_ROWS = int(config['DATA'].get('MAX_ROWS', '10000'))
+        self.SAMPLE_SIZE = int(config['DATA'].get('SAMPLE_SIZE', '1000'))
+        self.STREAMING_LOAD = config['DATA'].getboolean('STREAMING_LOAD', True)
+        self.CHUNK_SIZE = int(config['DATA'].get('CHUNK_SIZE', '50000'))
+        self.STREAMING_MAX_ROWS = int(config['DATA'].get('STREAMING_MAX_ROWS', '0'))
+        self.COMPACT_FRAMES = config['DATA'].getboolean('COMPACT', True)
+        self.CSV_ENGINE = config['DATA'].get('CSV_ENGINE', 'pyarrow')
+        self.LOAD_WORKERS = int(config['DATA'].get('LOAD_WORKERS', '0'))
+        self.CONCAT_TABLES = config['DATA'].getboolean('CONCAT_TABLES', True)
+
+        # Cleaning
+        self.INFER_SAMPLE_SIZE = int(config['CLEANING'].get('INFER_SAMPLE_SIZE', '200'))
+        self.INFER_PARSE_RATIO = float(config['CLEANING'].get('INFER_PARSE_RATIO', '0.9'))
+        self.CATEGORY_MAX_RATIO = float(config['CLEANING'].get('CATEGORY_MAX_RATIO', '0.5'))
+        self.CATEGORY_MAX_UNIQUE = int(config['CLEANING'].get('CATEGORY_MAX_UNIQUE', '50'))
+
+        # Profiling
+        self.PROFILE_SAMPLE_SIZE = int(config['PROFILE'].get('SAMPLE_SIZE', '2048'))
+        self.PROFILE_TOP_CAPACITY = int(config['PROFILE'].get('TOP_CAPACITY', '1000'))
+        self.PROFILE_DIGEST_COLUMNS = int(config['PROFILE'].get('DIGEST_COLUMNS', '40'))
+        self.CORRELATION_MIN_PERIODS = int(config['PROFILE'].get('CORRELATION_MIN_PERIODS', '3'))
+
+        # Cache
+        self.DATASET_CACHE_DIR = BASE_DIR / config['CACHE'].get('DATASET_DIR', '.cache/datasets')
+        self.DATASET_CACHE_ITEMS = int(config['CACHE'].get('DATASET_ITEMS', '8'))
+        self.DATASET_CACHE_MAX_MB = int(config['CACHE'].get('DATASET_MAX_MB', '512'))
+        self.SESSION_TTL_MINUTES = float(config['CACHE'].get('SESSION_TTL_MINUTES', '60'))
+
+        # Exécution du code généré
+        self.EXEC_WORKERS = int(config['EXEC'].get('WORKERS', '2'))
+        self.EXEC_CPU_SECONDS = int(config['EXEC'].get('CPU_SECONDS', '10'))
+        self.EXEC_MEMORY_MB = int(config['EXEC'].get('MEMORY_MB', '2048'))
+        self.EXEC_TIMEOUT = float(config['EXEC'].get('TIMEOUT', '30'))
+        self.EXEC_CACHE_SIZE = int(config['EXEC'].get('CACHE_SIZE', '256'))
+
+        # Moteur de requêtes hors mémoire (DuckDB, dépendance optionnelle)
+        self.ENGINE_OUT_OF_CORE = config['ENGINE'].getboolean('OUT_OF_CORE', True)
+        self.ENGINE_SOURCE_DIR = BASE_DIR / config['ENGINE'].get('SOURCE_DIR', '.cache/sources')
+        self.ENGINE_SOURCE_MAX_MB = int(config['ENGINE'].get('SOURCE_MAX_MB', '2048'))
+        self.ENGINE_MEMORY_MB = int(config['ENGINE'].get('MEMORY_MB', '512'))
+        self.ENGINE_THREADS = int(config['ENGINE'].get('THREADS', '2'))
+
+        # Historique
+        self.HISTORY_PATH = BASE_DIR / config['HISTORY'].get('PATH', '.cache/history.sqlite')
+        self.HISTORY_PAGE_SIZE = int(config['HISTORY'].get('PAGE_SIZE', '10'))
+        self.HISTORY_MAX_ENTRIES = int(config['HISTORY'].get('MAX_ENTRIES', '500'))
+
+        # Mode batch
+        self.BATCH_WORKERS = int(config['BATCH'].get('WORKERS', '0'))
+        self.BATCH_LLM_CONCURRENCY = int(config['BATCH'].get('LLM_CONCURRENCY', '4'))
+
+        # Préchargement des visualisations suggérées
+        self.PREFETCH_ENABLED = config['PREFETCH'].getboolean('ENABLED', True)
+        self.PREFETCH_MAX_SUGGESTIONS = int(config['PREFETCH'].get('MAX_SUGGESTIONS', '3'))
+        self.PREFETCH_WORKERS = int(config['PREFETCH'].get('WORKERS', '3'))
+        self.PREFETCH_BUDGET_SECONDS = float(config['PREFETCH'].get('BUDGET_SECONDS', '120'))
+        self.PREFETCH_TOKEN_BUDGET = int(config['PREFETCH'].get('TOKEN_BUDGET', '20000'))
+        self.PREFETCH_MATCH_RATIO = float(config['PREFETCH'].get('MATCH_RATIO', '0.9'))
+        self.PREFETCH_WAIT_SECONDS = float(config['PREFETCH'].get('WAIT_SECONDS', '2'))
+
+        # Tracing
+        self.TRACING_ENABLED = config['TRACING'].getboolean('ENABLED', True)
+        self.TRACING_PATH = BASE_DIR / config['TRACING'].get('PATH', '.cache/traces.jsonl')
+        self.TRACING_MAX_MB = float(config['TRACING'].get('MAX_MB', '50'))
+        self.TRACING_DEBUG_PANEL = config['TRACING'].getboolean('DEBUG_PANEL', False)
+
+        # Visualization
+        self.DEFAULT_THEME = config['VIZ'].get('DEFAULT_THEME', 'plotly_white')
+        self.COLOR_SCHEME = config['VIZ'].get('COLOR_SCHEME', 'Viridis')
+        self.MAX_POINTS = int(config['VIZ'].get('MAX_POINTS', '5000'))
+        self.HEATMAP_MAX_COLUMNS = int(config['VIZ'].get('HEATMAP_MAX_COLUMNS', '30'))
+        self.ROUTER_MIN_CONFIDENCE = float(config['VIZ'].get('ROUTER_MIN_CONFIDENCE', '0.75'))
+
+        # LLM
+        self.CLAUDE_API_KEY = os.getenv('CLAUDE_API_KEY')
+        self.CLAUDE_MODEL = config['LLM'].get('MODEL', 'claude-3-opus-20240229')
+        self.MAX_TOKENS = int(config['LLM'].get('MAX_TOKENS', '1000'))
+        self.TEMPERATURE = float(config['LLM'].get('TEMPERATURE', '0.7'))
+        self.COMBINED_REQUEST = config['LLM'].getboolean('COMBINED_REQUEST', False)
+        self.LLM_MAX_RETRIES = int(config['LLM'].get('MAX_RETRIES', '4'))
+        self.LLM_RETRY_BASE_DELAY = float(config['LLM'].get('RETRY_BASE_DELAY', '1.0'))
+        self.LLM_REQUESTS_PER_MINUTE = float(config['LLM'].get('REQUESTS_PER_MINUTE', '50'))
+        self.LLM_TOKENS_PER_MINUTE = float(config['LLM'].get('TOKENS_PER_MINUTE', '80000'))
+        self.LLM_PROMPT_CACHING = config['LLM'].getboolean('PROMPT_CACHING', True)
+        self.LLM_BASE_URL = config['LLM'].get('BASE_URL', '') or None
+        self.LLM_CACHE_PATH = BASE_DIR / config['LLM'].get('CACHE_PATH', '.cache/llm_responses.sqlite')
+        self.LLM_CACHE_TTL_HOURS = float(config['LLM'].get('CACHE_TTL_HOURS', '168'))
+        self.LLM_CACHE_MAX_ENTRIES = int(config['LLM'].get('CACHE_MAX_ENTRIES', '2000'))
+
+
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Lit la configuration une seule fois, au premier accès (et non à l'import du module),
+    puis la garde en cache pour tout le processus.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv(ENV_PATH)
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+    return Settings(config)
+
+
+def __getattr__(name):
+    # `from .config import settings` reste valable : l'objet est construit à la première demande
+    if name == 'settings':
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
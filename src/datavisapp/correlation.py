@@ -0,0 +1,243 @@
+import threading
+import warnings
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+from .config import settings
+from .timeseries import _storage
+
+# Nombre de lignes converties en matrice à la fois (borne la mémoire sur les tables larges)
+_BLOCK_ROWS = 65536
+
+
+def numeric_columns(frame: pd.DataFrame) -> list:
+    """Colonnes numériques d'un DataFrame aux types mélangés (booléens exclus)."""
+    return [c for c in frame.columns if is_numeric_dtype(frame[c]) and not is_bool_dtype(frame[c])]
+
+
+class CorrelationMatrix:
+    """
+    Matrices de corrélation (Pearson, Spearman) d'un dataset, calculées en NumPy vectorisé.
+    Pearson repose sur des statistiques suffisantes par paire de colonnes (effectifs, sommes,
+    sommes des carrés, produits croisés) : un bloc ajouté ou un autre objet fusionné met la
+    matrice à jour sans relire les données. Les valeurs manquantes sont ignorées paire par paire,
+    comme `DataFrame.corr()`.
+    Spearman a besoin des rangs : il est calculé sur le DataFrame complet quand il est connu,
+    sinon sur un échantillon de lignes tenu à jour bloc par bloc.
+    """
+
+    def __init__(self, columns=None, sample_size: int = None, min_periods: int = None):
+        self.columns = list(columns) if columns is not None else None
+        self.sample_size = sample_size or settings.PROFILE_SAMPLE_SIZE
+        self.min_periods = min_periods or settings.CORRELATION_MIN_PERIODS
+        self.df = None
+        self._shift = None
+        self._count = None
+        self._sums = None
+        self._squares = None
+        self._cross = None
+        self._sample = None
+        self._sample_keys = np.empty(0)
+        self._rng = np.random.default_rng()
+        self._matrices = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns=None) -> 'CorrelationMatrix':
+        """Statistiques calculées en une passe (par blocs de lignes) sur un DataFrame."""
+        matrix = cls(columns if columns is not None else numeric_columns(df))
+        for start in range(0, len(df), _BLOCK_ROWS):
+            matrix._accumulate(matrix._values(df.iloc[start:start + _BLOCK_ROWS]))
+        # Spearman : les rangs sont pris sur toutes les lignes plutôt que sur l'échantillon
+        matrix.df = df
+        return matrix
+
+    def _values(self, frame: pd.DataFrame) -> np.ndarray:
+        if self.columns is None:
+            self.columns = numeric_columns(frame)
+        return frame.reindex(columns=self.columns).to_numpy(dtype=float, na_value=np.nan)
+
+    def update(self, chunk: pd.DataFrame):
+        """Ajoute un bloc de lignes ; les colonnes sont fixées par le premier bloc."""
+        if self.df is not None:
+            # Les rangs ne sont plus ceux du DataFrame initial : Spearman passe sur l'échantillon
+            self._sample_rows(self._values(self.df))
+            self.df = None
+        values = self._values(chunk)
+        self._accumulate(values)
+        self._sample_rows(values)
+
+    def _accumulate(self, values: np.ndarray):
+        if self._count is None:
+            size = len(self.columns)
+            # Décalage par la moyenne du premier bloc : évite la perte de précision de
+            # sum(x²) - n·moyenne² quand les valeurs sont grandes devant leur dispersion
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)  # colonne vide dans le premier bloc
+                shift = np.nanmean(values, axis=0) if len(values) else np.zeros(size)
+            self._shift = np.nan_to_num(shift)
+            self._count, self._sums, self._squares, self._cross = (np.zeros((size, size)) for _ in range(4))
+        if not len(values):
+            return
+        present = ~np.isnan(values)
+        centered = np.where(present, values - self._shift, 0.0)
+        mask = present.astype(float)
+        # Élément (i, j) : statistique de la colonne i sur les lignes où i et j sont renseignées
+        self._count += mask.T @ mask
+        self._sums += centered.T @ mask
+        self._squares += (centered * centered).T @ mask
+        self._cross += centered.T @ centered
+        self._matrices = {}
+
+    def _sample_rows(self, values: np.ndarray):
+        # Échantillon uniforme et fusionnable : on garde les lignes aux plus petites clés aléatoires
+        keys = self._rng.random(len(values))
+        if self._sample is not None:
+            values = np.vstack([self._sample, values])
+            keys = np.concatenate([self._sample_keys, keys])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            values, keys = values[keep], keys[keep]
+        self._sample, self._sample_keys = values, keys
+
+    def merge(self, other: 'CorrelationMatrix'):
+        """Ajoute les statistiques d'un autre objet portant sur les mêmes colonnes."""
+        if other._count is None:
+            return
+        if self._count is None:
+            self.columns = list(other.columns)
+            self._shift = other._shift.copy()
+            self._count, self._sums, self._squares, self._cross = (
+                np.zeros_like(other._count) for _ in range(4)
+            )
+        if list(other.columns) != self.columns:
+            raise ValueError("Fusion de matrices de corrélation sur des colonnes différentes")
+        # Ramène les statistiques de l'autre objet au décalage de celui-ci
+        delta = other._shift - self._shift
+        self._squares += other._squares + 2 * delta[:, None] * other._sums + (delta ** 2)[:, None] * other._count
+        self._cross += (other._cross + delta[:, None] * other._sums.T + delta[None, :] * other._sums
+                        + np.outer(delta, delta) * other._count)
+        self._sums += other._sums + delta[:, None] * other._count
+        self._count += other._count
+        if other._sample is not None:
+            self._sample_keys, self._sample = (
+                (other._sample_keys, other._sample) if self._sample is None
+                else (np.concatenate([self._sample_keys, other._sample_keys]), np.vstack([self._sample, other._sample]))
+            )
+            self._sample_rows(np.empty((0, len(self.columns))))
+        self.df = None
+        self._matrices = {}
+
+    def subset(self, columns: list) -> 'CorrelationMatrix':
+        """Statistiques restreintes à quelques colonnes (sans relire les données)."""
+        index = [self.columns.index(column) for column in columns]
+        matrix = CorrelationMatrix(columns, self.sample_size, self.min_periods)
+        if self._count is not None:
+            rows = np.ix_(index, index)
+            matrix._shift = self._shift[index]
+            matrix._count, matrix._sums, matrix._squares, matrix._cross = (
+                self._count[rows], self._sums[rows], self._squares[rows], self._cross[rows]
+            )
+        if self._sample is not None:
+            matrix._sample, matrix._sample_keys = self._sample[:, index], self._sample_keys
+        matrix.df = self.df
+        return matrix
+
+    def pearson(self) -> pd.DataFrame:
+        if 'pearson' not in self._matrices:
+            self._matrices['pearson'] = self._frame(self._pearson_values())
+        return self._matrices['pearson']
+
+    def _pearson_values(self) -> np.ndarray:
+        if self._count is None or not len(self.columns):
+            return np.empty((0, 0))
+        n = self._count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_i = self._sums / n
+            mean_j = mean_i.T
+            covariance = self._cross / n - mean_i * mean_j
+            variance_i = self._squares / n - mean_i ** 2
+            variance_j = variance_i.T
+            corr = covariance / np.sqrt(np.clip(variance_i, 0, None) * np.clip(variance_j, 0, None))
+        corr[n < self.min_periods] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def spearman(self) -> pd.DataFrame:
+        """Corrélation de Spearman : Pearson sur les rangs (rangs moyens en cas d'égalité)."""
+        if 'spearman' not in self._matrices:
+            if self.df is not None:
+                ranks = CorrelationMatrix.from_frame(self.df[self.columns].rank(), self.columns)
+            else:
+                columns = self.columns or []
+                sample = self._sample if self._sample is not None else np.empty((0, len(columns)))
+                ranks = CorrelationMatrix.from_frame(pd.DataFrame(sample, columns=columns).rank(), columns)
+            ranks.min_periods = self.min_periods
+            self._matrices['spearman'] = self._frame(ranks._pearson_values())
+        return self._matrices['spearman']
+
+    def matrix(self, method: str = 'pearson') -> pd.DataFrame:
+        if method == 'pearson':
+            return self.pearson()
+        if method == 'spearman':
+            return self.spearman()
+        raise ValueError(f"Méthode de corrélation '{method}' non supportée")
+
+    def pair_counts(self) -> pd.DataFrame:
+        """Nombre de lignes renseignées pour chaque paire de colonnes."""
+        return self._frame(self._count if self._count is not None else np.empty((0, 0)))
+
+    def top_pairs(self, k: int = 10, method: str = 'pearson', absolute: bool = True) -> pd.DataFrame:
+        """
+        Les k paires de colonnes les plus corrélées (en valeur absolue par défaut), sans figure :
+        sélection partielle (argpartition) sur le triangle supérieur de la matrice.
+        """
+        corr = self.matrix(method).to_numpy()
+        rows, cols = np.triu_indices(len(corr), 1)
+        values = corr[rows, cols]
+        valid = ~np.isnan(values)
+        rows, cols, values = rows[valid], cols[valid], values[valid]
+        scores = np.abs(values) if absolute else values
+        k = min(k, len(values))
+        if k <= 0:
+            return pd.DataFrame(columns=['x', 'y', 'correlation', 'n'])
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return pd.DataFrame({
+            'x': [self.columns[i] for i in rows[best]],
+            'y': [self.columns[j] for j in cols[best]],
+            'correlation': values[best],
+            'n': self._count[rows[best], cols[best]].astype(int)
+        })
+
+    def _frame(self, values: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(values, index=self.columns, columns=self.columns)
+
+
+_matrices = OrderedDict()
+_matrices_lock = threading.Lock()
+
+
+def frame_correlations(df: pd.DataFrame) -> CorrelationMatrix:
+    """
+    Statistiques de corrélation des colonnes numériques de `df`, calculées une fois puis retrouvées
+    pour toute copie superficielle du même DataFrame (mêmes tableaux de valeurs), par exemple
+    celle que reçoit chaque snippet dans un worker de l'exécuteur.
+    """
+    columns = numeric_columns(df)
+    storages = [_storage(df[column]) for column in columns]
+    key = (tuple(columns), tuple(id(storage) for storage in storages))
+    with _matrices_lock:
+        entry = _matrices.get(key)
+        # L'identifiant d'un tableau libéré peut être réutilisé : on vérifie que ce sont les mêmes objets
+        if entry is not None and all(ref() is storage for ref, storage in zip(entry[0], storages)):
+            _matrices.move_to_end(key)
+            return entry[1]
+    matrix = CorrelationMatrix.from_frame(df, columns)
+    with _matrices_lock:
+        _matrices[key] = ([weakref.ref(storage) for storage in storages], matrix)
+        while len(_matrices) > max(settings.DATASET_CACHE_ITEMS, 1):
+            _matrices.popitem(last=False)
+    return matrix
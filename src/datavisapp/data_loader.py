@@ -1,21 +1,428 @@
+import functools
+import importlib.util
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 from typing import Union
 from .config import settings
+from .tracing import traced
+
+SUPPORTED_SUFFIXES = ('.csv', '.parquet', '.xls', '.xlsx')
+
+# Colonne ajoutée quand des tables de mêmes colonnes sont concaténées : table d'origine de chaque ligne
+TABLE_COLUMN = 'table_source'
+
+
+class _CountingReader:
+    """Enveloppe un fichier binaire et compte les octets effectivement lus."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def read1(self, size=-1):
+        data = self.raw.read1(size)
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        self.bytes_read += n or 0
+        return n
+
+    def __getattr__(self, name):
+        # seek, tell, seekable, closed... sont délégués au fichier sous-jacent
+        return getattr(self.raw, name)
+
+    def __iter__(self):
+        return iter(self.raw)
+
+
+class ReservoirSampler:
+    """
+    Échantillon aléatoire uniforme en une seule passe et en mémoire bornée.
+    Chaque ligne reçoit une clé aléatoire ; on conserve les `size` plus petites clés,
+    ce qui donne un échantillon sans remise sur l'ensemble des lignes vues.
+    """
+
+    def __init__(self, size: int, seed=None):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.rows_seen = 0
+        self._sample = None
+        self._keys = np.empty(0)
+
+    def update(self, chunk: pd.DataFrame):
+        self.rows_seen += len(chunk)
+        if chunk.empty:
+            return
+        keys = self.rng.random(len(chunk))
+        # Seules les `size` plus petites clés du bloc peuvent entrer dans l'échantillon :
+        # on les extrait avant la concaténation pour ne pas recopier tout le bloc
+        if len(keys) > self.size:
+            candidates = np.argpartition(keys, self.size - 1)[:self.size]
+            chunk, keys = chunk.take(candidates), keys[candidates]
+        if self._sample is None:
+            frame, all_keys = chunk.reset_index(drop=True), keys
+        else:
+            frame = pd.concat([self._sample, chunk], ignore_index=True)
+            all_keys = np.concatenate([self._keys, keys])
+        if len(all_keys) > self.size:
+            keep = np.argpartition(all_keys, self.size - 1)[:self.size]
+            frame, all_keys = frame.take(keep), all_keys[keep]
+            # `take` retourne déjà un nouvel objet : on remplace l'index sans recopier les données
+            frame.index = pd.RangeIndex(len(frame))
+        self._sample = frame
+        self._keys = all_keys
+
+    def merge(self, other: 'ReservoirSampler', columns: dict = None):
+        """
+        Fusionne l'échantillon d'un autre fichier : les plus petites clés de l'union forment un
+        échantillon uniforme de toutes les lignes vues. `columns` ajoute des colonnes constantes
+        (par exemple la table d'origine) aux lignes de `other`.
+        """
+        self.rows_seen += other.rows_seen
+        if other._sample is None:
+            return
+        sample = other._sample.assign(**columns) if columns else other._sample
+        if self._sample is None:
+            self._sample, self._keys = sample, other._keys
+            return
+        frame = pd.concat([self._sample, sample], ignore_index=True)
+        keys = np.concatenate([self._keys, other._keys])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size - 1)[:self.size]
+            frame, keys = frame.take(keep), keys[keep]
+            frame.index = pd.RangeIndex(len(frame))
+        self._sample, self._keys = frame, keys
+
+    def result(self) -> pd.DataFrame:
+        if self._sample is None:
+            return pd.DataFrame()
+        return self._sample
+
+
+def _load_part(part: dict, sample_size: int, chunk_size: int, max_rows: int) -> tuple:
+    """Lit une table (fichier, membre d'archive ou feuille) dans un processus du pool ; résultat picklable."""
+    start = time.perf_counter()
+    source = io.BytesIO(part['source']) if isinstance(part['source'], bytes) else part['source']
+    sampler, stats = DataLoader._sample_file(
+        source, part['format'], sample_size, chunk_size, max_rows, sheet=part['sheet']
+    )
+    stats.update(table=part['table'], file=part['file'], sheet=part['sheet'],
+                 seconds=time.perf_counter() - start)
+    return sampler, stats
+
 
 class DataLoader:
+    # Statistiques du dernier chargement (lignes vues, octets lus, mode)
+    last_stats = {}
+
     @staticmethod
-    def load_data(file: Union[str, pd.DataFrame]) -> pd.DataFrame:
+    @traced('load')
+    def load_data(file: Union[str, pd.DataFrame], streaming: bool = None) -> pd.DataFrame:
         """Charge les données depuis différents formats"""
         if isinstance(file, pd.DataFrame):
             return file
-        
-        if file.name.endswith('.csv'):
+        if isinstance(file, (list, tuple)) or DataLoader._file_name(file).endswith('.zip'):
+            # Plusieurs tables : voir load_tables pour les tables nommées
+            df, _, DataLoader.last_stats = DataLoader.load_tables(file)
+            return df
+
+        if streaming is None:
+            streaming = settings.STREAMING_LOAD
+        if streaming:
+            df, DataLoader.last_stats = DataLoader.load_streaming(file)
+            return df
+
+        name = DataLoader._file_name(file)
+        if name.endswith('.csv'):
             df = pd.read_csv(file, nrows=settings.MAX_ROWS)
-        elif file.name.endswith(('.xls', '.xlsx')):
+        elif name.endswith(('.xls', '.xlsx')):
             df = pd.read_excel(file, nrows=settings.MAX_ROWS)
-        elif file.name.endswith('.parquet'):
+        elif name.endswith('.parquet'):
             df = pd.read_parquet(file)
         else:
             raise ValueError("Format de fichier non supporté")
-            
-        return df.sample(min(settings.SAMPLE_SIZE, len(df))).copy()
\ No newline at end of file
+
+        DataLoader.last_stats = {'mode': 'eager', 'rows_seen': len(df), 'bytes_read': None}
+        return df.sample(min(settings.SAMPLE_SIZE, len(df)))
+
+    @staticmethod
+    def cache_params() -> dict:
+        """Paramètres qui influencent le résultat du chargement (clé de cache)."""
+        return {
+            'max_rows': settings.MAX_ROWS,
+            'sample_size': settings.SAMPLE_SIZE,
+            'streaming': settings.STREAMING_LOAD,
+            'streaming_max_rows': settings.STREAMING_MAX_ROWS,
+            # Les deux moteurs CSV n'infèrent pas tout à fait les mêmes types
+            'csv_engine': DataLoader.csv_engine(),
+            'concat_tables': settings.CONCAT_TABLES,
+        }
+
+    @staticmethod
+    def csv_engine() -> str:
+        """Moteur CSV effectif : pyarrow (multithread) s'il est demandé et installé, sinon le moteur C de pandas."""
+        if settings.CSV_ENGINE == 'pyarrow' and importlib.util.find_spec('pyarrow') is not None:
+            return 'pyarrow'
+        return 'c'
+
+    @staticmethod
+    @traced('load_tables')
+    def load_tables(files, workers: int = None) -> tuple:
+        """
+        Charge un ou plusieurs fichiers (CSV, Excel, Parquet, ou une archive zip qui en contient),
+        avec toutes les feuilles des classeurs Excel. Chaque fichier ou feuille est une table nommée,
+        lue en parallèle dans un pool de processus quand il y en a plusieurs.
+        Retourne (df, tables, stats) :
+        - df : le dataset principal, soit la concaténation (échantillon uniforme de toutes les lignes,
+          avec la colonne TABLE_COLUMN) des tables quand elles ont les mêmes colonnes, soit la plus grande ;
+        - tables : {nom: échantillon de chaque table} ;
+        - stats : lignes vues, octets lus et durée de lecture de chaque table.
+        """
+        parts = DataLoader.expand_inputs(files)
+        if not parts:
+            raise ValueError("Aucun fichier pris en charge (CSV, Excel, Parquet)")
+        sample_size = settings.SAMPLE_SIZE
+        # Sans streaming : échantillon des MAX_ROWS premières lignes, comme le chargement direct
+        max_rows = settings.STREAMING_MAX_ROWS if settings.STREAMING_LOAD else settings.MAX_ROWS
+        load = functools.partial(_load_part, sample_size=sample_size, chunk_size=settings.CHUNK_SIZE, max_rows=max_rows)
+        workers = min(workers or settings.LOAD_WORKERS or os.cpu_count() or 1, len(parts))
+
+        start = time.perf_counter()
+        if workers > 1:
+            # 'spawn' : on ne duplique pas les threads du serveur Streamlit
+            context = multiprocessing.get_context('spawn')
+            with tempfile.TemporaryDirectory(prefix='datavisapp-load-') as directory, \
+                    ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                # Les processus reçoivent un chemin (et la feuille), pas une copie du contenu par tâche
+                results = list(pool.map(load, _spill_sources(parts, directory)))
+        else:
+            results = [load(part) for part in parts]
+
+        samplers = {stats['table']: sampler for sampler, stats in results}
+        tables = {name: sampler.result() for name, sampler in samplers.items()}
+        if len(tables) > 1 and settings.CONCAT_TABLES and len({tuple(t.columns) for t in tables.values()}) == 1:
+            merged = ReservoirSampler(sample_size)
+            for name, sampler in samplers.items():
+                merged.merge(sampler, {TABLE_COLUMN: name})
+            df = merged.result()
+        else:
+            df = tables[max(samplers, key=lambda name: samplers[name].rows_seen)]
+
+        table_stats = [stats for _, stats in results]
+        bytes_read = [stats['bytes_read'] for stats in table_stats if stats['bytes_read'] is not None]
+        stats = {
+            'mode': 'streaming' if settings.STREAMING_LOAD else 'eager',
+            'rows_seen': sum(stats['rows_seen'] for stats in table_stats),
+            'bytes_read': sum(bytes_read) if bytes_read else None,
+            'workers': workers,
+            'seconds': time.perf_counter() - start,
+            'tables': table_stats,
+        }
+        return df, tables, stats
+
+    @staticmethod
+    def expand_inputs(files) -> list:
+        """
+        Liste des tables à lire : un élément {table, file, format, sheet, source} par fichier,
+        membre d'archive zip ou feuille de classeur Excel. `source` est un chemin ou le contenu (bytes).
+        """
+        if not isinstance(files, (list, tuple)):
+            files = [files]
+        parts = []
+        for file in files:
+            display = os.path.basename(str(getattr(file, 'name', file)))
+            if isinstance(file, (str, os.PathLike)):
+                source = str(file)
+            else:
+                # BytesIO / UploadedFile : getvalue() rend le tampon interne, sans copie tant qu'il n'est pas modifié
+                source = file.getvalue() if hasattr(file, 'getvalue') else DataLoader._read_bytes(file)
+            if display.lower().endswith('.zip'):
+                with zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source) as archive:
+                    for info in archive.infolist():
+                        member = info.filename
+                        if info.is_dir() or member.startswith('__MACOSX/') or not member.lower().endswith(SUPPORTED_SUFFIXES):
+                            continue
+                        parts += DataLoader._file_parts(f"{display}/{member}", archive.read(info))
+            else:
+                parts += DataLoader._file_parts(display, source)
+
+        # Noms de tables uniques, utilisables comme identifiants dans le code généré
+        seen = set()
+        for part in parts:
+            name, i = part['table'], 2
+            while part['table'] in seen:
+                part['table'] = f"{name}_{i}"
+                i += 1
+            seen.add(part['table'])
+        return parts
+
+    @staticmethod
+    def _file_parts(display: str, source) -> list:
+        name = display.lower()
+        fmt = next((suffix for suffix in SUPPORTED_SUFFIXES if name.endswith(suffix)), None)
+        if fmt is None:
+            raise ValueError(f"Format de fichier non supporté : {display}")
+        stem = _table_name(os.path.splitext(os.path.basename(display))[0])
+        part = {'table': stem, 'file': display, 'format': fmt, 'sheet': None, 'source': source}
+        if fmt not in ('.xls', '.xlsx'):
+            return [part]
+        with pd.ExcelFile(io.BytesIO(source) if isinstance(source, bytes) else source) as workbook:
+            sheets = workbook.sheet_names
+        if len(sheets) <= 1:
+            return [part]
+        return [{**part, 'table': f"{stem}_{_table_name(sheet)}", 'sheet': sheet} for sheet in sheets]
+
+    @staticmethod
+    def load_streaming(file, sample_size: int = None, chunk_size: int = None, max_rows: int = None,
+                       fmt: str = None, sheet=None):
+        """
+        Lit le fichier par blocs (CSV) ou par row groups (Parquet) et maintient un
+        échantillon réservoir non biaisé. Retourne le DataFrame échantillonné et un
+        dictionnaire de statistiques (lignes vues, octets lus).
+        `max_rows` <= 0 signifie que tout le fichier est parcouru.
+        `fmt` (ex. '.csv') remplace l'extension du nom de fichier ; `sheet` choisit la feuille Excel.
+        """
+        sampler, stats = DataLoader._sample_file(
+            file, fmt or DataLoader._file_name(file), sample_size or settings.SAMPLE_SIZE,
+            chunk_size or settings.CHUNK_SIZE, settings.STREAMING_MAX_ROWS if max_rows is None else max_rows,
+            sheet=sheet
+        )
+        return sampler.result(), stats
+
+    @staticmethod
+    def _sample_file(file, name: str, sample_size: int, chunk_size: int, max_rows: int, sheet=None):
+        """Parcourt le fichier et retourne (échantillon réservoir, statistiques)."""
+        engine = DataLoader.csv_engine()
+        raw, owned = DataLoader._open_binary(file)
+        try:
+            try:
+                return DataLoader._sample_chunks(raw, name, sample_size, chunk_size, max_rows, sheet, engine)
+            except _arrow_invalid():
+                # pyarrow infère les types sur le premier bloc : un bloc suivant incompatible
+                # (ex. texte dans une colonne d'entiers) fait relire le fichier avec pandas
+                raw.seek(0)
+                return DataLoader._sample_chunks(raw, name, sample_size, chunk_size, max_rows, sheet, 'c')
+        finally:
+            if owned:
+                raw.close()
+
+    @staticmethod
+    def _sample_chunks(raw, name, sample_size, chunk_size, max_rows, sheet, engine):
+        reader = _CountingReader(raw)
+        sampler = ReservoirSampler(sample_size)
+        if name.endswith('.csv'):
+            chunks = DataLoader._csv_chunks(reader, chunk_size, engine)
+        elif name.endswith('.parquet'):
+            chunks = DataLoader._parquet_batches(reader, chunk_size)
+        elif name.endswith(('.xls', '.xlsx')):
+            # Pas de lecture incrémentale possible pour Excel
+            chunks = [pd.read_excel(reader, sheet_name=sheet or 0, nrows=max_rows if max_rows > 0 else None)]
+        else:
+            raise ValueError("Format de fichier non supporté")
+
+        for chunk in chunks:
+            if max_rows > 0 and sampler.rows_seen + len(chunk) > max_rows:
+                chunk = chunk.iloc[:max_rows - sampler.rows_seen]
+            sampler.update(chunk)
+            if max_rows > 0 and sampler.rows_seen >= max_rows:
+                break
+
+        stats = {
+            'mode': 'streaming',
+            'rows_seen': sampler.rows_seen,
+            'bytes_read': reader.bytes_read,
+        }
+        return sampler, stats
+
+    @staticmethod
+    def _csv_chunks(source, chunk_size: int, engine: str):
+        """Blocs d'un CSV : lecteur incrémental pyarrow (analyse multithread) ou moteur C de pandas."""
+        if engine != 'pyarrow':
+            yield from pd.read_csv(source, chunksize=chunk_size)
+            return
+        import pyarrow.csv as pv
+
+        # Blocs d'environ 16 Mo : peu de blocs à fusionner dans l'échantillon
+        reader = pv.open_csv(source, read_options=pv.ReadOptions(block_size=16 << 20))
+        for batch in reader:
+            yield batch.to_pandas()
+
+    @staticmethod
+    def _parquet_batches(source, batch_size: int):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield batch.to_pandas()
+
+    @staticmethod
+    def _file_name(file) -> str:
+        return str(getattr(file, 'name', file)).lower()
+
+    @staticmethod
+    def _read_bytes(file) -> bytes:
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        data = file.read()
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        return data
+
+    @staticmethod
+    def _open_binary(file):
+        """Retourne (fichier binaire, ouvert_par_nous)."""
+        if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+            return open(file, 'rb'), True
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        return file, False
+
+
+def _spill_sources(parts: list, directory) -> list:
+    """
+    Écrit une fois sur disque chaque contenu en mémoire (fichier téléversé, membre d'archive)
+    et retourne les tables avec ce chemin pour source : les feuilles d'un même classeur partagent le fichier.
+    """
+    paths = {}
+    spilled = []
+    for part in parts:
+        source = part['source']
+        if isinstance(source, bytes):
+            if id(source) not in paths:
+                paths[id(source)] = os.path.join(directory, f"{len(paths)}{part['format']}")
+                with open(paths[id(source)], 'wb') as f:
+                    f.write(source)
+            source = paths[id(source)]
+        spilled.append({**part, 'source': source})
+    return spilled
+
+
+def _table_name(text: str) -> str:
+    """Nom de table utilisable comme identifiant (Python et SQL)."""
+    name = re.sub(r'\W+', '_', str(text)).strip('_').lower() or 'table'
+    return f"t_{name}" if name[0].isdigit() else name
+
+
+def _arrow_invalid():
+    """Exception d'analyse de pyarrow (ou une exception jamais levée si pyarrow est absent)."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return ()
+    return pa.ArrowInvalid
@@ -1,35 +1,57 @@
 import pandas as pd
 import numpy as np
 from pandas.api.types import is_numeric_dtype
+from .config import settings
+from .type_inference import TypeInferenceEngine, downcast_numeric
+from .profiler import DatasetProfile
+from .tracing import traced
 
 class DataProcessor:
+    # À incrémenter dès que le nettoyage change, pour invalider les datasets en cache
+    CLEANING_VERSION = 3
+
     def __init__(self, df: pd.DataFrame):
         self.df = df
+        self.type_report = {}
         self.clean_data()
         
+    @traced('clean')
     def clean_data(self):
         """Nettoyage automatique des données"""
-        # Suppression des colonnes vides
-        self.df = self.df.dropna(axis=1, how='all')
+        # Suppression des colonnes vides (le DataFrame n'est recopié que s'il y en a)
+        empty = [col for col in self.df.columns if self.df[col].isna().all()]
+        if empty:
+            self.df = self.df.drop(columns=empty)
         
-        # Conversion des types de données
-        for col in self.df.select_dtypes(include=['object']):
-            try:
-                self.df[col] = pd.to_datetime(self.df[col])
-            except:
-                pass
+        # Conversion des types de données (inférence sur échantillon, une conversion par colonne)
+        columns, self.type_report = TypeInferenceEngine().convert_columns(self.df)
                 
-        # Gestion des valeurs manquantes
-        for col in self.df.columns:
-            if is_numeric_dtype(self.df[col]):
-                self.df[col].fillna(self.df[col].median(), inplace=True)
-            else:
-                self.df[col].fillna(self.df[col].mode()[0], inplace=True)
+        # Gestion des valeurs manquantes : seules les colonnes incomplètes sont remplacées
+        for col, series in columns.items():
+            if series.hasnans:
+                fill_value = series.median() if is_numeric_dtype(series) else series.mode()[0]
+                columns[col] = series.fillna(fill_value)
+                if settings.COMPACT_FRAMES and is_numeric_dtype(series):
+                    # Colonne d'entiers passée en flottant à cause des valeurs manquantes
+                    columns[col] = downcast_numeric(columns[col], integral_floats=True)
+                # Type final, après remplacement des valeurs manquantes et réduction
+                self.type_report[col]['dtype'] = str(columns[col].dtype)
+        
+        # Assemblage final, sans recopier les colonnes
+        self.df = pd.DataFrame(columns, index=self.df.index, copy=False)
     
-    def get_summary(self) -> dict:
-        """Retourne un résumé statistique des données"""
+    @staticmethod
+    def cache_params() -> dict:
+        """Paramètres qui influencent le résultat du nettoyage (clé de cache)."""
         return {
-            'stats': self.df.describe().to_dict(),
-            'missing_values': self.df.isna().sum().to_dict(),
-            'dtypes': self.df.dtypes.astype(str).to_dict()
-        }
\ No newline at end of file
+            'cleaning_version': DataProcessor.CLEANING_VERSION,
+            'infer_sample_size': settings.INFER_SAMPLE_SIZE,
+            'infer_parse_ratio': settings.INFER_PARSE_RATIO,
+            'category_max_ratio': settings.CATEGORY_MAX_RATIO,
+            'category_max_unique': settings.CATEGORY_MAX_UNIQUE,
+            'compact': settings.COMPACT_FRAMES,
+        }
+
+    def profile(self) -> DatasetProfile:
+        """Profil paresseux du dataset nettoyé (statistiques calculées à la demande)"""
+        return DatasetProfile(self.df)
@@ -0,0 +1,477 @@
+import atexit
+import hashlib
+import io
+import multiprocessing
+import pickle
+import queue
+import resource
+import threading
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+from .cache import table_key
+from .config import settings
+from .query_engine import get_query_engine
+from .tracing import tracer
+
+
+class SnippetError(Exception):
+    """Erreur lors de l'exécution d'un snippet de visualisation généré."""
+
+
+class MissingFigureError(SnippetError):
+    """Le snippet s'est exécuté sans produire de variable 'fig'."""
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+class _CompiledCache:
+    """Cache LRU des objets code compilés, indexés par empreinte du source."""
+
+    def __init__(self, size: int = 256):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, code: str):
+        key = code_hash(code)
+        with self._lock:
+            compiled = self._items.get(key)
+            if compiled is not None:
+                self._items.move_to_end(key)
+                return compiled
+        compiled = compile(code, f"<snippet {key[:12]}>", 'exec')
+        with self._lock:
+            self._items[key] = compiled
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return compiled
+
+
+def _sql_unavailable(query: str, params=None):
+    raise SnippetError("Le moteur SQL (DuckDB) n'est pas disponible pour ce dataset.")
+
+
+def _run_snippet(compiled, df, engine=None, tables=None) -> str:
+    """
+    Exécute le code compilé et retourne la figure sérialisée en JSON.
+    Le snippet dispose de `df`, de `tables` (tables nommées quand plusieurs fichiers ou feuilles
+    ont été chargés), de `engine` (QueryEngine sur le fichier complet, ou None)
+    et de `sql(requete)` qui exécute une requête DuckDB sur la table `dataset`.
+    """
+    import plotly.io as pio
+
+    # Copie superficielle : le snippet peut ajouter ou supprimer des colonnes
+    # sans toucher au DataFrame partagé entre sessions (ou gardé par le worker)
+    local_namespace = {
+        'df': df.copy(deep=False),
+        'tables': {name: table.copy(deep=False) for name, table in (tables or {}).items()},
+        'engine': engine,
+        'sql': engine.sql if engine is not None else _sql_unavailable,
+    }
+    exec(compiled, {}, local_namespace)
+    if 'fig' not in local_namespace:
+        raise MissingFigureError("Le code généré n'a pas produit de variable 'fig'.")
+    return pio.to_json(local_namespace['fig'])
+
+
+def _dataset_group(key: str) -> str:
+    """Clé du dataset auquel appartient une clé de table nommée (voir cache.table_key)."""
+    return key.split('.', 1)[0]
+
+
+def _serialize_frame(df) -> tuple:
+    """Sérialise le DataFrame en Arrow IPC (repli sur pickle pour les types non supportés)."""
+    try:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return 'arrow', sink.getvalue()
+    except (ImportError, ValueError, TypeError, NotImplementedError):
+        buffer = io.BytesIO()
+        pickle.dump(df, buffer, protocol=5)
+        return 'pickle', buffer.getbuffer()
+
+
+##############################
+# Côté worker
+
+_worker_frames = {}
+_worker_segments = {}
+_worker_compiled = _CompiledCache()
+
+
+def _worker_init(memory_mb: int):
+    # Préchauffage : les imports lourds sont faits une fois par worker
+    import pandas  # noqa: F401
+    import plotly.express  # noqa: F401
+    import plotly.graph_objects  # noqa: F401
+    import plotly.io  # noqa: F401
+
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _worker_frame(dataset_key: str, shm_name: str, size: int, fmt: str):
+    """
+    Reconstruit le dataset (ou l'une de ses tables nommées) depuis la mémoire partagée, une seule fois
+    par worker : le flux Arrow IPC est lu dans le segment, puis converti (copié) en DataFrame pandas.
+    """
+    if dataset_key in _worker_frames:
+        return _worker_frames[dataset_key]
+
+    # Une seule version de dataset gardée par worker, avec ses tables nommées
+    group = _dataset_group(dataset_key)
+    for key in [key for key in _worker_frames if _dataset_group(key) != group]:
+        del _worker_frames[key]
+        try:
+            _worker_segments.pop(key).close()
+        except BufferError:
+            pass
+
+    # Les workers 'spawn' partagent le resource tracker du processus principal,
+    # qui reste seul responsable de la suppression du segment
+    shm = shared_memory.SharedMemory(name=shm_name)
+    if fmt == 'arrow':
+        import pyarrow as pa
+
+        table = pa.ipc.open_stream(pa.py_buffer(shm.buf[:size])).read_all()
+        df = table.to_pandas(split_blocks=True)
+    else:
+        df = pickle.loads(shm.buf[:size])
+    _worker_segments[dataset_key] = shm
+    _worker_frames[dataset_key] = df
+    return df
+
+
+def _worker_execute(code: str, dataset_key: str, shm_name: str, size: int, fmt: str, cpu_seconds: int,
+                    rows=None, source: str = None, tables=None) -> str:
+    if cpu_seconds > 0:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_seconds, hard))
+    df = _worker_frame(dataset_key, shm_name, size, fmt)
+    if rows is not None:
+        df = df.iloc[rows]
+    tables = {name: _worker_frame(*shared) for name, shared in (tables or {}).items()}
+    try:
+        return _run_snippet(_worker_compiled.get(code), df, get_query_engine(source), tables)
+    except SnippetError:
+        raise
+    except MemoryError:
+        raise SnippetError("Limite mémoire dépassée lors de l'exécution du code généré.")
+    except Exception as e:
+        # Les exceptions arbitraires du snippet ne sont pas toujours sérialisables
+        raise SnippetError(f"{type(e).__name__}: {e}") from None
+
+
+def _worker_main(conn, memory_mb: int):
+    """Boucle d'un worker : exécute les tâches reçues sur son canal, une à la fois, jusqu'à None."""
+    _worker_init(memory_mb)
+    conn.send(('ready', None))
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            task = None
+        if task is None:
+            # Datasets libérés avant les segments : à la sortie de l'interpréteur, un segment
+            # encore référencé par un DataFrame ne pourrait pas être fermé
+            _worker_frames.clear()
+            for shm in _worker_segments.values():
+                try:
+                    shm.close()
+                except BufferError:
+                    pass
+            return
+        try:
+            conn.send(('ok', _worker_execute(*task)))
+        except SnippetError as e:
+            conn.send(('error', e))
+        except Exception as e:
+            # Erreur hors du snippet (segment de mémoire partagée disparu, etc.)
+            conn.send(('error', SnippetError(f"{type(e).__name__}: {e}")))
+
+
+##############################
+# Côté processus principal
+
+class _Worker:
+    """Processus worker avec son propre canal : il peut être arrêté seul."""
+
+    def __init__(self, context, memory_mb: int):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, memory_mb), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def run(self, task: tuple, timeout: float = None) -> str:
+        """
+        Exécute la tâche et retourne la figure JSON. Le délai court à partir de l'envoi de la tâche :
+        le démarrage du worker (imports) n'en fait pas partie.
+        Lève TimeoutError au-delà de `timeout`, EOFError si le worker s'est arrêté.
+        """
+        if not self.ready:
+            self.conn.recv()
+            self.ready = True
+        self.conn.send(task)
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        status, value = self.conn.recv()
+        if status == 'error':
+            raise value
+        return value
+
+    def stop(self, kill: bool = False):
+        if not kill:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class _WorkerPool:
+    """
+    Workers préchauffés, démarrés à la création du pool. Chaque tâche attend un worker libre,
+    puis s'exécute avec son propre délai ; un worker qui dépasse ce délai ou s'arrête
+    (limite CPU ou mémoire) est remplacé seul, sans interrompre les snippets des autres sessions.
+    """
+
+    def __init__(self, workers: int, memory_mb: int):
+        # 'spawn' : on ne duplique pas les threads du serveur Streamlit
+        self._context = multiprocessing.get_context('spawn')
+        self.memory_mb = memory_mb
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context, self.memory_mb)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def run(self, task: tuple, timeout: float = None) -> str:
+        # Attente d'un worker libre, hors du délai d'exécution
+        worker = self._idle.get()
+        healthy = False
+        try:
+            result = worker.run(task, timeout)
+            healthy = True
+            return result
+        except SnippetError:
+            healthy = True
+            raise
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                self._replace(worker)
+
+    def _replace(self, worker: _Worker):
+        with self._lock:
+            self._workers.discard(worker)
+            closed = self._closed
+        worker.stop(kill=True)
+        if not closed:
+            self._idle.put(self._spawn())
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            workers, self._workers = list(self._workers), set()
+        for worker in workers:
+            worker.stop()
+
+
+class SnippetExecutor:
+    """
+    Exécute les snippets générés par le LLM hors du processus Streamlit.
+    - les objets code compilés sont mis en cache par empreinte ;
+    - un pool de workers préchauffés (pandas/plotly déjà importés) exécute les snippets
+      avec des limites de temps CPU et de mémoire ;
+    - le DataFrame est sérialisé une fois par dataset (Arrow IPC, repli sur pickle) dans un segment
+      de mémoire partagée ; chaque worker le convertit une fois en DataFrame pandas et le garde.
+      Ce n'est pas un partage sans copie : on évite seulement de le renvoyer à chaque tâche ;
+    - la figure JSON est mise en cache par (empreinte du code, clé du dataset).
+    Avec `workers=0`, les snippets s'exécutent dans le processus courant, sans isolation.
+    """
+
+    def __init__(self, workers: int = None, cpu_seconds: int = None, memory_mb: int = None,
+                 timeout: float = None, cache_size: int = None):
+        self.workers = settings.EXEC_WORKERS if workers is None else workers
+        self.cpu_seconds = settings.EXEC_CPU_SECONDS if cpu_seconds is None else cpu_seconds
+        self.memory_mb = settings.EXEC_MEMORY_MB if memory_mb is None else memory_mb
+        self.timeout = settings.EXEC_TIMEOUT if timeout is None else timeout
+        self.cache_size = settings.EXEC_CACHE_SIZE if cache_size is None else cache_size
+        self._compiled = _CompiledCache()
+        self._results = OrderedDict()
+        self._frames = OrderedDict()
+        # Segments référencés par des tâches en cours (nom -> nombre de tâches) et segments
+        # évincés qui attendent la fin de ces tâches pour être supprimés
+        self._segment_users = {}
+        self._retired = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def render(self, code: str, df, dataset_key: str, rows=None, view_key: str = None, source=None,
+               tables: dict = None) -> str:
+        """
+        Retourne la figure JSON produite par `code` sur `df`.
+        `rows` (positions de lignes) restreint l'exécution à une vue filtrée du dataset,
+        identifiée dans le cache par `view_key` ; le dataset complet reste partagé tel quel.
+        `source` (chemin du fichier complet) donne accès au moteur DuckDB via `engine` et `sql` ;
+        il est ignoré pour une vue filtrée, que le moteur ne connaît pas.
+        `tables` ({nom: DataFrame}) sont les tables nommées du dataset, couvertes par `dataset_key`.
+        """
+        if rows is not None:
+            source = None
+        result_key = (code_hash(code), dataset_key, view_key if rows is not None else None)
+        with tracer.span('exec.render', rows=len(df) if rows is None else len(rows)) as span:
+            with self._lock:
+                cached = self._results.get(result_key)
+                if cached is not None:
+                    self._results.move_to_end(result_key)
+            span.set_attribute('cache.hit', cached is not None)
+            if cached is not None:
+                return cached
+
+            try:
+                compiled = self._compiled.get(code)
+            except SyntaxError as e:
+                raise SnippetError(f"SyntaxError: {e}") from None
+
+            if self.workers <= 0:
+                try:
+                    figure_json = _run_snippet(
+                        compiled, df if rows is None else df.iloc[rows], get_query_engine(source), tables
+                    )
+                except SnippetError:
+                    raise
+                except Exception as e:
+                    raise SnippetError(str(e)) from e
+            else:
+                figure_json = self._render_in_pool(code, df, dataset_key, rows, source, tables)
+            span.set_attribute('figure_bytes', len(figure_json))
+
+            with self._lock:
+                self._results[result_key] = figure_json
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+            return figure_json
+
+    def _render_in_pool(self, code: str, df, dataset_key: str, rows=None, source=None, tables=None) -> str:
+        segments = []
+        try:
+            with tracer.span('exec.share_frame'):
+                shm, size, fmt = self._share_frame(df, dataset_key)
+                segments.append(shm.name)
+                shared_tables = {}
+                for name, table in (tables or {}).items():
+                    key = table_key(dataset_key, name)
+                    table_shm, table_size, table_fmt = self._share_frame(table, key)
+                    segments.append(table_shm.name)
+                    shared_tables[name] = (key, table_shm.name, table_size, table_fmt)
+            task = (code, dataset_key, shm.name, size, fmt, self.cpu_seconds,
+                    rows, str(source) if source is not None else None, shared_tables)
+            try:
+                return self._get_pool().run(task, timeout=self.timeout or None)
+            except TimeoutError:
+                raise SnippetError(f"Temps d'exécution dépassé ({self.timeout}s).")
+            except (EOFError, OSError):
+                raise SnippetError("Le worker a été interrompu (limite CPU ou mémoire dépassée).")
+        finally:
+            self._release_segments(segments)
+
+    def _share_frame(self, df, dataset_key: str):
+        """
+        Segment du dataset (créé au premier usage), réservé pour une tâche : il n'est pas supprimé
+        avant l'appel correspondant à `_release_segments`, même s'il est évincé entre-temps.
+        """
+        group = _dataset_group(dataset_key)
+        with self._lock:
+            # Un dataset et ses tables nommées sont marqués utilisés et évincés ensemble
+            for key in [key for key in self._frames if _dataset_group(key) == group]:
+                self._frames.move_to_end(key)
+            if dataset_key not in self._frames:
+                fmt, payload = _serialize_frame(df)
+                size = len(payload)
+                shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+                shm.buf[:size] = memoryview(payload).cast('B')
+                self._frames[dataset_key] = (shm, size, fmt)
+            shared = self._frames[dataset_key]
+            self._segment_users[shared[0].name] = self._segment_users.get(shared[0].name, 0) + 1
+            while len({_dataset_group(key) for key in self._frames}) > max(settings.DATASET_CACHE_ITEMS, 1):
+                oldest = _dataset_group(next(iter(self._frames)))
+                for key in [key for key in self._frames if _dataset_group(key) == oldest]:
+                    old, _, _ = self._frames.pop(key)
+                    if self._segment_users.get(old.name):
+                        # Un worker a reçu ce nom et ne l'a peut-être pas encore ouvert
+                        self._retired[old.name] = old
+                    else:
+                        _unlink(old)
+            return shared
+
+    def _release_segments(self, names: list):
+        """Fin d'une tâche : les segments évincés qu'elle était la dernière à utiliser sont supprimés."""
+        with self._lock:
+            for name in names:
+                self._segment_users[name] -= 1
+                if not self._segment_users[name]:
+                    del self._segment_users[name]
+                    if name in self._retired:
+                        _unlink(self._retired.pop(name))
+
+    def _get_pool(self) -> '_WorkerPool':
+        with self._lock:
+            if self._pool is None:
+                self._pool = _WorkerPool(self.workers, self.memory_mb)
+            return self._pool
+
+    def shutdown(self):
+        # On attend l'arrêt des workers : sinon la sortie du processus peut rester
+        # bloquée sur un worker qui n'a pas reçu le signal d'arrêt
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+        with self._lock:
+            for shm in [shm for shm, _, _ in self._frames.values()] + list(self._retired.values()):
+                _unlink(shm)
+            self._frames.clear()
+            self._retired.clear()
+
+
+def _unlink(shm):
+    shm.close()
+    shm.unlink()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> SnippetExecutor:
+    """Exécuteur partagé par toutes les sessions du processus."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = SnippetExecutor()
+            atexit.register(_executor.shutdown)
+        return _executor
@@ -0,0 +1,232 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+
+class FakeAnthropic:
+    """
+    Faux client Anthropic pour les tests et les benchmarks hors ligne.
+    `responder(system, messages)` construit le texte de la réponse ; par défaut,
+    le prompt est renvoyé tel quel. Le cache de prompts est simulé : un préfixe système
+    marqué `cache_control` déjà vu est compté en `cache_read_input_tokens`.
+    """
+
+    def __init__(self, responder=None, latency: float = 0.0, token_latency: float = 0.0):
+        self.responder = responder or (lambda system, messages: messages[-1]['content'])
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls = 0
+        self.prompt_cache = _PromptCache()
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self._create, stream=self._stream)
+
+    def _create(self, model, max_tokens, messages, system="", **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        text = self.responder(system, messages)
+        return _message(system, messages, text, self.prompt_cache)
+
+    def _stream(self, model, max_tokens, messages, system="", **kwargs):
+        with self._lock:
+            self.calls += 1
+        return _FakeStream(self, system, messages)
+
+
+class _FakeStream:
+    """Équivalent minimal du `MessageStream` du SDK : context manager exposant `text_stream`."""
+
+    def __init__(self, fake, system, messages):
+        self.fake = fake
+        self.system = system
+        self.messages = messages
+        self.text = fake.responder(system, messages)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        for token in re.findall(r'\s*\S+', self.text):
+            if self.fake.token_latency:
+                time.sleep(self.fake.token_latency)
+            yield token
+
+    def get_final_message(self):
+        return _message(self.system, self.messages, self.text, self.fake.prompt_cache)
+
+
+class _PromptCache:
+    """Préfixes système marqués `cache_control` déjà reçus (cache de prompts simulé, sans expiration)."""
+
+    def __init__(self):
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, system) -> tuple:
+        """Retourne (jetons lus depuis le cache, jetons écrits dans le cache) pour ce préfixe."""
+        if not isinstance(system, list):
+            return 0, 0
+        cached = " ".join(block.get('text', '') for block in system if block.get('cache_control'))
+        if not cached:
+            return 0, 0
+        with self._lock:
+            hit = cached in self._seen
+            self._seen.add(cached)
+        tokens = len(cached.split())
+        return (tokens, 0) if hit else (0, tokens)
+
+
+def _system_text(system) -> str:
+    if isinstance(system, list):
+        return " ".join(block.get('text', '') for block in system)
+    return system or ""
+
+
+def _message(system, messages, text, prompt_cache: _PromptCache = None):
+    # Comme l'API : input_tokens exclut les jetons lus ou écrits dans le cache
+    cache_read, cache_creation = prompt_cache.lookup(system) if prompt_cache else (0, 0)
+    total = len(_system_text(system).split()) + sum(len(str(m['content']).split()) for m in messages)
+    return SimpleNamespace(
+        content=[SimpleNamespace(type='text', text=text)],
+        usage=SimpleNamespace(
+            input_tokens=total - cache_read - cache_creation,
+            output_tokens=len(text.split()),
+            cache_read_input_tokens=cache_read,
+            cache_creation_input_tokens=cache_creation
+        )
+    )
+
+
+class MockAnthropicServer:
+    """
+    Serveur HTTP local qui imite l'endpoint /v1/messages de l'API Anthropic (réponses JSON
+    et streaming SSE), pour tester le vrai SDK sans réseau :
+
+        with MockAnthropicServer() as server:
+            client = Anthropic(api_key="test", base_url=server.base_url)
+
+    `rate_limited=n` fait répondre 429 aux n premières requêtes. Les compteurs `requests` et
+    `connections` permettent de vérifier la réutilisation des connexions (keep-alive).
+    """
+
+    def __init__(self, responder=None, latency: float = 0.0, rate_limited: int = 0, retry_after: float = 0.0):
+        self.responder = responder or (lambda system, messages: messages[-1]['content'])
+        self.latency = latency
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.requests = 0
+        self.connections = 0
+        self.prompt_cache = _PromptCache()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _handler_class(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _next_status(self) -> int:
+        with self._lock:
+            self.requests += 1
+            if self.rate_limited:
+                self.rate_limited -= 1
+                return 429
+        return 200
+
+
+def _handler_class(server: MockAnthropicServer):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 : la connexion reste ouverte entre deux requêtes
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            with server._lock:
+                server.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if server._next_status() == 429:
+                self._send(429, 'application/json', json.dumps({
+                    'type': 'error', 'error': {'type': 'rate_limit_error', 'message': 'Rate limited'}
+                }), {'retry-after': str(server.retry_after)})
+                return
+            if server.latency:
+                time.sleep(server.latency)
+            messages = body.get('messages', [])
+            text = server.responder(body.get('system', ''), messages)
+            message = _message(body.get('system', ''), messages, text, server.prompt_cache)
+            usage = vars(message.usage)
+            if body.get('stream'):
+                self._send(200, 'text/event-stream', _sse_events(body.get('model'), text, usage))
+            else:
+                self._send(200, 'application/json', json.dumps({
+                    'id': 'msg_mock', 'type': 'message', 'role': 'assistant', 'model': body.get('model'),
+                    'content': [{'type': 'text', 'text': text}],
+                    'stop_reason': 'end_turn', 'stop_sequence': None, 'usage': usage
+                }))
+
+        def _send(self, status: int, content_type: str, payload: str, headers: dict = None):
+            data = payload.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def _sse_events(model, text: str, usage: dict) -> str:
+    events = [
+        ('message_start', {'type': 'message_start', 'message': {
+            'id': 'msg_mock', 'type': 'message', 'role': 'assistant', 'model': model, 'content': [],
+            'stop_reason': None, 'stop_sequence': None,
+            'usage': {**usage, 'output_tokens': 0}
+        }}),
+        ('content_block_start', {'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}}),
+    ]
+    events += [
+        ('content_block_delta', {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': token}})
+        for token in re.findall(r'\s*\S+', text)
+    ]
+    events += [
+        ('content_block_stop', {'type': 'content_block_stop', 'index': 0}),
+        ('message_delta', {'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                           'usage': {'output_tokens': usage['output_tokens']}}),
+        ('message_stop', {'type': 'message_stop'}),
+    ]
+    return "".join(f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in events)
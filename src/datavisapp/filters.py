@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .config import settings
+
+
+class FilterIndex:
+    """
+    Index de filtrage calculé une fois par dataset : pour chaque colonne numérique,
+    l'ordre de tri (argsort), les valeurs triées et les bornes min/max.
+    Un filtre par plage se résout alors par recherche dichotomique, sans parcourir le DataFrame.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._sorted = {}
+        self._bounds = {}
+        for col in df.select_dtypes(include='number').columns:
+            values = df[col].to_numpy(dtype=float, na_value=np.nan)
+            order = np.argsort(values, kind='stable')
+            sorted_values = values[order]
+            # Les NaN sont triés en fin de tableau : on les exclut de l'index
+            valid = int(np.count_nonzero(~np.isnan(sorted_values)))
+            self._sorted[col] = (sorted_values[:valid], order[:valid])
+            if valid:
+                self._bounds[col] = (float(sorted_values[0]), float(sorted_values[valid - 1]))
+
+    @property
+    def numeric_columns(self) -> list:
+        return list(self._bounds)
+
+    def bounds(self, column: str) -> tuple:
+        """(min, max) précalculés de la colonne."""
+        return self._bounds[column]
+
+    def range_positions(self, column: str, low: float, high: float) -> np.ndarray:
+        """Positions (triées) des lignes dont la valeur est dans [low, high]."""
+        sorted_values, order = self._sorted[column]
+        start = np.searchsorted(sorted_values, low, side='left')
+        end = np.searchsorted(sorted_values, high, side='right')
+        return np.sort(order[start:end])
+
+    def is_full_range(self, column: str, low: float, high: float) -> bool:
+        min_val, max_val = self._bounds[column]
+        return low <= min_val and high >= max_val
+
+    def filter(self, column: str, low: float, high: float) -> pd.DataFrame:
+        if self.is_full_range(column, low, high):
+            return self.df
+        return self.df.iloc[self.range_positions(column, low, high)]
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_filter_index(dataset_key: str, df: pd.DataFrame) -> FilterIndex:
+    """Index partagé par toutes les sessions qui utilisent le même dataset."""
+    with _indexes_lock:
+        if dataset_key in _indexes:
+            _indexes.move_to_end(dataset_key)
+            return _indexes[dataset_key]
+    index = FilterIndex(df)
+    with _indexes_lock:
+        _indexes[dataset_key] = index
+        while len(_indexes) > max(settings.DATASET_CACHE_ITEMS, 1):
+            _indexes.popitem(last=False)
+    return index
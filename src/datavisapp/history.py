@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import closing
+from pathlib import Path
+
+from .config import settings
+from .executor import code_hash
+
+_COLUMNS = ('id', 'kind', 'query', 'details', 'interpretation', 'code', 'viz_type', 'theme', 'created_at')
+
+
+class HistoryStore:
+    """
+    Historique persistant (SQLite) des visualisations, indépendant des sessions.
+    Les entrées sont rattachées à l'empreinte du dataset et gardent la figure Plotly
+    sérialisée (JSON compressé) : un rechargement ne réexécute pas le code.
+    Une même requête (type, question, code) sur un même dataset n'est enregistrée qu'une fois.
+    """
+
+    def __init__(self, path=None, max_entries: int = None):
+        self.path = Path(path or settings.HISTORY_PATH)
+        self.max_entries = max_entries if max_entries is not None else settings.HISTORY_MAX_ENTRIES
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with closing(sqlite3.connect(self.path)) as conn, conn:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS history ("
+                            "id INTEGER PRIMARY KEY AUTOINCREMENT, dataset TEXT NOT NULL, "
+                            "kind TEXT NOT NULL, query TEXT NOT NULL, details TEXT, interpretation TEXT, "
+                            "code TEXT NOT NULL, code_hash TEXT NOT NULL, viz_type TEXT, theme TEXT, "
+                            "figure BLOB, created_at REAL NOT NULL, "
+                            "UNIQUE (dataset, kind, query, code_hash))"
+                        )
+                        conn.execute(
+                            "CREATE INDEX IF NOT EXISTS history_dataset ON history (dataset, created_at DESC)"
+                        )
+                    self._initialized = True
+        # Une connexion par opération : utilisable depuis n'importe quel thread.
+        # `with conn` ne fait que valider la transaction : la connexion est fermée par `closing`
+        return closing(sqlite3.connect(self.path, timeout=10))
+
+    def add(self, dataset: str, kind: str, query: str, code: str, interpretation: str = None,
+            details: str = None, viz_type: str = None, theme: str = None, figure_json: str = None) -> int:
+        """Enregistre une entrée (ou la remonte en tête si elle existe déjà) et retourne son id."""
+        now = time.time()
+        figure = zlib.compress(figure_json.encode()) if figure_json else None
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT INTO history (dataset, kind, query, details, interpretation, code, code_hash, "
+                "viz_type, theme, figure, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (dataset, kind, query, code_hash) DO UPDATE SET "
+                "created_at = excluded.created_at, details = excluded.details, theme = excluded.theme, "
+                "figure = coalesce(excluded.figure, history.figure)",
+                (dataset, kind, query, details, interpretation, code, code_hash(code),
+                 viz_type, theme, figure, now)
+            )
+            entry_id = conn.execute(
+                "SELECT id FROM history WHERE dataset = ? AND kind = ? AND query = ? AND code_hash = ?",
+                (dataset, kind, query, code_hash(code))
+            ).fetchone()[0]
+            conn.execute(
+                "DELETE FROM history WHERE dataset = ? AND id NOT IN ("
+                "SELECT id FROM history WHERE dataset = ? ORDER BY created_at DESC LIMIT ?)",
+                (dataset, dataset, self.max_entries)
+            )
+        return entry_id
+
+    def count(self, dataset: str) -> int:
+        with self._connect() as conn, conn:
+            return conn.execute("SELECT count(*) FROM history WHERE dataset = ?", (dataset,)).fetchone()[0]
+
+    def page(self, dataset: str, page: int = 0, page_size: int = None) -> list:
+        """Entrées d'une page (la plus récente d'abord), sans les figures."""
+        page_size = page_size or settings.HISTORY_PAGE_SIZE
+        with self._connect() as conn, conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM history WHERE dataset = ? "
+                "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (dataset, page_size, page * page_size)
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def figure(self, entry_id: int):
+        """Figure JSON enregistrée pour l'entrée, ou None."""
+        with self._connect() as conn, conn:
+            row = conn.execute("SELECT figure FROM history WHERE id = ?", (entry_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return zlib.decompress(row[0]).decode()
+
+
+history_store = HistoryStore()
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import closing
+from pathlib import Path
+
+from .config import settings
+
+
+class ResponseCache:
+    """
+    Cache persistant (SQLite) des réponses du LLM.
+    Les entrées expirent après `ttl` secondes et le nombre d'entrées est borné :
+    les moins récemment utilisées sont supprimées en premier.
+    """
+
+    def __init__(self, path=None, ttl: float = None, max_entries: int = None):
+        self.path = Path(path or settings.LLM_CACHE_PATH)
+        self.ttl = ttl if ttl is not None else settings.LLM_CACHE_TTL_HOURS * 3600
+        self.max_entries = max_entries if max_entries is not None else settings.LLM_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, system: str, prompt: str, max_tokens: int) -> str:
+        payload = json.dumps([model, system, prompt, max_tokens])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _connect(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with closing(sqlite3.connect(self.path)) as conn, conn:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS responses ("
+                            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                        )
+                    self._initialized = True
+        # Une connexion par opération : utilisable depuis n'importe quel thread.
+        # `with conn` ne fait que valider la transaction : la connexion est fermée par `closing`
+        return closing(sqlite3.connect(self.path, timeout=10))
+
+    def get(self, key: str):
+        now = time.time()
+        with self._connect() as conn, conn:
+            row = conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM responses WHERE key NOT IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+
+class SingleFlight:
+    """
+    Déduplication des appels concurrents : tant qu'un appel pour une clé est en cours,
+    les appels identiques attendent son résultat au lieu d'en lancer un nouveau.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,144 @@
+"""
+Étapes du pipeline indépendantes de Streamlit : chargement et nettoyage d'un dataset,
+chemin local (routeur) et génération par le LLM.
+Utilisées par l'application (app4.py) et par le mode batch (batch.py).
+"""
+import json
+import time
+
+from .cache import dataset_cache, dataset_key, files_digest, table_key
+from .config import settings
+from .data_loader import DataLoader
+from .data_processor import DataProcessor
+from .executor import SnippetError
+from .profiler import get_profile
+from .prompts import tables_digest, visualization_prompts
+from .query_engine import duckdb_available, get_query_engine, materialize_source
+from .router import VisualizationRouter
+from .tracing import set_attribute
+
+
+##############################
+# Chargement
+
+def dataset_params() -> dict:
+    """Paramètres de chargement et de nettoyage qui font partie de la clé d'un dataset."""
+    return {**DataLoader.cache_params(), **DataProcessor.cache_params()}
+
+
+def load_dataset(file, digest: str = None) -> dict:
+    """
+    Charge et nettoie le dataset, via le cache partagé (mémoire puis disque).
+    `file` peut être une liste de fichiers, une archive zip ou un classeur Excel à plusieurs feuilles.
+    Retourne {key, digest, df, tables, source, source_rows, profile, type_report, load_stats} ;
+    `tables` contient les tables nommées quand il y en a plusieurs (vide sinon) ;
+    `source` est le chemin du fichier complet pour le moteur DuckDB, ou None, et `source_rows` son nombre de lignes.
+    """
+    digest = digest or files_digest(file)
+    key = dataset_key(digest, dataset_params())
+    set_attribute('cache.hit', True)
+
+    def build():
+        set_attribute('cache.hit', False)
+        df, tables, load_stats = DataLoader.load_tables(file)
+        processor = DataProcessor(df)
+        names = list(tables) if len(tables) > 1 else []
+        for name in names:
+            dataset_cache.put(table_key(key, name), DataProcessor(tables[name]).df)
+        # Lignes du fichier complet comptées une fois par DuckDB, puis gardées avec le dataset
+        path = _source_path(file, digest)
+        return processor.df, {
+            'type_report': processor.type_report,
+            'load_stats': load_stats,
+            'tables': names,
+            'source_rows': get_query_engine(path).row_count() if path is not None else None
+        }
+
+    df, meta = dataset_cache.get_or_create(key, build)
+    tables = _named_tables(key, meta.get('tables') or [])
+    if tables is None:
+        # Une table a été évincée du cache sans le dataset principal : on relit tout
+        df, meta = dataset_cache.put(key, *build())
+        tables = _named_tables(key, meta['tables'])
+    path = _source_path(file, digest)
+    return {
+        'key': key,
+        'digest': digest,
+        'df': df,
+        'tables': tables,
+        'source': str(path) if path is not None else None,
+        'source_rows': meta.get('source_rows'),
+        # Profil paresseux, partagé : rien n'est calculé avant la première demande
+        'profile': get_profile(key, df),
+        'type_report': meta.get('type_report'),
+        'load_stats': meta.get('load_stats')
+    }
+
+
+def _source_path(file, digest: str):
+    """Fichier complet enregistré pour le moteur DuckDB (None si indisponible ou format non pris en charge)."""
+    single = file[0] if isinstance(file, (list, tuple)) and len(file) == 1 else file
+    if not settings.ENGINE_OUT_OF_CORE or not duckdb_available() or isinstance(single, (list, tuple)):
+        return None
+    path = materialize_source(single, digest)
+    return path if get_query_engine(path) is not None else None
+
+
+def _named_tables(key: str, names: list) -> dict:
+    """Tables nommées du dataset depuis le cache, ou None si l'une d'elles n'y est plus."""
+    tables = {}
+    for name in names:
+        entry = dataset_cache.get(table_key(key, name))
+        if entry is None:
+            return None
+        tables[name] = entry[0]
+    return tables
+
+
+##############################
+# Génération
+
+def route_locally(dataset: dict, query: str, viz_type: str, executor) -> dict:
+    """
+    Chemin rapide : template Visualizer choisi et paramétré localement, validé par un rendu.
+    Retourne la route ({template, params, confidence, code, interpretation}) ou None
+    (repli sur le LLM) si la question n'est pas reconnue ou si le rendu échoue.
+    """
+    route = VisualizationRouter(dataset['df']).route(query, viz_type)
+    if route is not None:
+        try:
+            executor.render(route['code'], dataset['df'], dataset['key'], source=dataset.get('source'),
+                            tables=dataset.get('tables'))
+        except SnippetError:
+            route = None
+    return route
+
+
+def parse_interpretation(response: str) -> str:
+    """L'interprétation peut arriver sous forme de JSON {"analysis": ...} : on en extrait le texte."""
+    try:
+        return json.loads(response).get("analysis")
+    except (json.JSONDecodeError, AttributeError):
+        return response
+
+
+def generate_visualization(dataset: dict, query: str, viz_type: str, client, executor, schema: str = None) -> dict:
+    """
+    Génère l'interprétation et le code de la visualisation générale, sans affichage :
+    routeur local d'abord, puis LLM. Retourne {interpretation, code, timings}.
+    `schema` (profil compact des colonnes) évite de recalculer le profil s'il est déjà connu.
+    """
+    start = time.perf_counter()
+    route = route_locally(dataset, query, viz_type, executor)
+    if route is not None:
+        return {
+            'interpretation': route['interpretation'],
+            'code': route['code'],
+            'timings': {'mode': 'local', 'total': time.perf_counter() - start}
+        }
+    interpretation_prompt, code_prompt = visualization_prompts(
+        schema or dataset['profile'].digest(), query, viz_type, dataset.get('source'), tables_digest(dataset.get('tables')),
+        dataset.get('source_rows')
+    )
+    interpretation, code, timings = client.generate_interpretation_and_code(interpretation_prompt, code_prompt)
+    return {'interpretation': parse_interpretation(interpretation), 'code': code, 'timings': timings}
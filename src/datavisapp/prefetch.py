@@ -0,0 +1,178 @@
+"""
+Préchargement spéculatif des visualisations suggérées par le résumé du dataset.
+
+Pendant que l'utilisateur lit le résumé, les suggestions sont générées (routeur local
+ou LLM en priorité basse) et exécutées en tâche de fond. Une question qui correspond à
+une suggestion, ou un clic sur celle-ci, réutilise le résultat sans nouvel aller-retour.
+Le préchargement est borné (durée et jetons d'entrée) et annulé au chargement d'un autre dataset.
+"""
+import difflib
+import re
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from .config import settings
+from .pipeline import generate_visualization
+from .router import _normalize
+from .tracing import tracer
+
+# Mots-clés (normalisés) d'une suggestion -> type de visualisation de la barre latérale
+SUGGESTION_VIZ_TYPES = (
+    ('histogramme', 'Histogramme'),
+    ('scatter', 'Scatter'),
+    ('nuage de points', 'Scatter'),
+    ('matrice de correlation', 'Matrice de corrélation'),
+    ('heatmap', 'Heatmap'),
+    ('choropleth', 'Choropleth'),
+    ('carte', 'Choropleth'),
+    ('toile d araignee', "Toile d'araignée"),
+    ('radar', "Toile d'araignée"),
+)
+DEFAULT_VIZ_TYPE = "Graphique"
+
+# Ligne d'une liste numérotée : "1. texte" ou "2) texte"
+_ITEM = re.compile(r'^\s*(\d+)\s*[.)]\s+(.+?)\s*$')
+
+
+def parse_suggestions(summary: str, limit: int = None) -> list:
+    """
+    Extrait les suggestions de la dernière liste numérotée du résumé.
+    Retourne une liste de {query, viz_type}, sans doublons.
+    """
+    limit = settings.PREFETCH_MAX_SUGGESTIONS if limit is None else limit
+    items = []
+    for line in (summary or "").splitlines():
+        match = _ITEM.match(line)
+        if not match:
+            continue
+        if match.group(1) == '1':
+            items = []
+        text = match.group(2).replace('**', '').replace('__', '').strip(' :-')
+        if text:
+            items.append(text)
+
+    suggestions, seen = [], set()
+    for text in items:
+        normalized = _normalize(text)
+        if normalized in seen:
+            continue
+        seen.add(normalized)
+        viz_type = next((label for word, label in SUGGESTION_VIZ_TYPES if f" {word} " in f" {normalized} "),
+                        DEFAULT_VIZ_TYPE)
+        suggestions.append({'query': text, 'viz_type': viz_type})
+    return suggestions[:limit]
+
+
+class Prefetcher:
+    """
+    Préchargement des suggestions d'un dataset.
+    Chaque suggestion passe par les états pending -> running -> ready (ou error, skipped, cancelled) ;
+    le résultat prêt contient {interpretation, code, timings, figure_json}.
+    Une suggestion n'est plus lancée une fois le budget (durée ou jetons) épuisé ou après `cancel()`.
+    """
+
+    def __init__(self, dataset: dict, client, executor, workers: int = None, budget_seconds: float = None,
+                 token_budget: int = None):
+        self.dataset = dataset
+        self.client = client
+        self.executor = executor
+        self.workers = workers or settings.PREFETCH_WORKERS
+        self.budget_seconds = settings.PREFETCH_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+        self.token_budget = settings.PREFETCH_TOKEN_BUDGET if token_budget is None else token_budget
+        self.items = []
+        self.input_tokens = 0
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._deadline = None
+        self._pool = None
+
+    def start(self, suggestions: list) -> 'Prefetcher':
+        """Lance la génération des suggestions en tâche de fond et retourne immédiatement."""
+        if not suggestions:
+            return self
+        # Profil calculé ici, une fois : les tâches de fond se partagent le même schéma
+        schema = self.dataset['profile'].digest()
+        self._deadline = time.monotonic() + self.budget_seconds
+        self._pool = ThreadPoolExecutor(max_workers=min(self.workers, len(suggestions)) or 1,
+                                        thread_name_prefix='prefetch')
+        for suggestion in suggestions:
+            item = {**suggestion, 'status': 'pending', 'result': None, 'error': None}
+            item['future'] = self._pool.submit(self._run, item, schema)
+            self.items.append(item)
+        self._pool.shutdown(wait=False)
+        return self
+
+    def _exhausted(self) -> bool:
+        if self._cancelled.is_set() or time.monotonic() > self._deadline:
+            return True
+        with self._lock:
+            return bool(self.token_budget) and self.input_tokens >= self.token_budget
+
+    def _run(self, item: dict, schema: str):
+        if self._exhausted():
+            item['status'] = 'cancelled' if self._cancelled.is_set() else 'skipped'
+            return None
+        item['status'] = 'running'
+        start = time.perf_counter()
+        try:
+            with tracer.span('prefetch.suggestion', query=item['query'], viz_type=item['viz_type']) as span:
+                generated = generate_visualization(
+                    self.dataset, item['query'], item['viz_type'], self.client, self.executor, schema=schema
+                )
+                with self._lock:
+                    self.input_tokens += generated['timings'].get('input_tokens', 0)
+                # Réponse arrivée après l'annulation : le dataset a changé, rien à exécuter
+                if self._cancelled.is_set():
+                    item['status'] = 'cancelled'
+                    return None
+                generated['figure_json'] = self.executor.render(
+                    generated['code'], self.dataset['df'], self.dataset['key'], source=self.dataset.get('source'),
+                    tables=self.dataset.get('tables')
+                )
+                span.set_attribute('prefetch.mode', generated['timings'].get('mode'))
+        except Exception as e:
+            item['status'], item['error'] = 'error', f"{type(e).__name__}: {e}"
+            return None
+        generated['timings']['prefetch'] = time.perf_counter() - start
+        item['result'], item['status'] = generated, 'ready'
+        return generated
+
+    def match(self, query: str) -> dict:
+        """Suggestion la plus proche de `query` (similarité >= [PREFETCH] MATCH_RATIO), ou None."""
+        normalized = _normalize(query)
+        best, best_ratio = None, settings.PREFETCH_MATCH_RATIO
+        for item in self.items:
+            ratio = difflib.SequenceMatcher(None, normalized, _normalize(item['query'])).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = item, ratio
+        return best
+
+    def result(self, item: dict, timeout: float = None) -> dict:
+        """
+        Résultat préchargé de la suggestion, en attendant au plus `timeout` secondes
+        (par défaut [PREFETCH] WAIT_SECONDS) si elle est en cours.
+        Retourne None si elle a échoué ou n'est pas prête ; une suggestion pas encore lancée
+        est alors abandonnée, puisque l'appelant la génère lui-même.
+        """
+        timeout = settings.PREFETCH_WAIT_SECONDS if timeout is None else timeout
+        try:
+            return item['future'].result(timeout=timeout)
+        except (CancelledError, FutureTimeoutError):
+            if item['future'].cancel():
+                item['status'] = 'cancelled'
+            return None
+
+    def cancel(self):
+        """Abandonne les suggestions non lancées ; celles en cours ne sont pas exécutées."""
+        self._cancelled.set()
+        for item in self.items:
+            if item['future'].cancel():
+                item['status'] = 'cancelled'
+
+    def stats(self) -> dict:
+        counts = {}
+        for item in self.items:
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+        return {'suggestions': len(self.items), 'input_tokens': self.input_tokens, **counts}
@@ -0,0 +1,314 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+from .config import settings
+from .correlation import CorrelationMatrix, frame_correlations
+
+
+class HyperLogLog:
+    """Estimation de cardinalité en mémoire constante (2**p registres), fusionnable."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, series: pd.Series):
+        if series.empty:
+            return
+        hashes = pd.util.hash_pandas_object(series, index=False).to_numpy(dtype=np.uint64)
+        rest_bits = 64 - self.p
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = (hashes & np.uint64((1 << rest_bits) - 1)).astype(np.float64)
+        # Position du premier bit à 1 dans les bits restants (exact : rest < 2**52)
+        with np.errstate(divide='ignore'):
+            rank = np.where(rest > 0, rest_bits - np.floor(np.log2(rest)), rest_bits + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog'):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(float)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class ColumnProfile:
+    """
+    Statistiques d'une colonne, mises à jour bloc par bloc et fusionnables.
+    Les statistiques dérivées (quantiles, histogramme, top-k) sont calculées à la demande.
+    """
+
+    def __init__(self, name, kind: str, sample_size: int = None, top_capacity: int = None):
+        self.name = name
+        self.kind = kind
+        self.dtype = None
+        self.sample_size = sample_size or settings.PROFILE_SAMPLE_SIZE
+        self.top_capacity = top_capacity or settings.PROFILE_TOP_CAPACITY
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.hll = HyperLogLog()
+        self.counts = pd.Series(dtype='int64')
+        self.counts_truncated = False
+        self._sample = np.empty(0)
+        self._sample_keys = np.empty(0)
+        # Graine fixe : même échantillon, donc même digest (préfixe de prompt stable) pour un même dataset
+        self._rng = np.random.default_rng(0)
+
+    @staticmethod
+    def kind_of(series: pd.Series) -> str:
+        if is_bool_dtype(series):
+            return 'boolean'
+        if is_datetime64_any_dtype(series):
+            return 'datetime'
+        if is_numeric_dtype(series):
+            return 'numeric'
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return 'category'
+        return 'string'
+
+    def update(self, series: pd.Series):
+        # Type réel de la colonne (ex. int16, string, category) : le code généré doit en tenir compte
+        self.dtype = self.dtype or str(series.dtype)
+        values = series.dropna()
+        self.count += len(series)
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+        self.hll.update(values)
+        if self.kind in ('numeric', 'datetime'):
+            numbers = self._as_numbers(values)
+            self.min = numbers.min() if self.min is None else min(self.min, numbers.min())
+            self.max = numbers.max() if self.max is None else max(self.max, numbers.max())
+            self.sum += float(numbers.sum())
+            self.sum_squares += float(np.dot(numbers, numbers))
+            self._add_sample(numbers, self._rng.random(len(numbers)))
+        else:
+            self._add_counts(values.astype(str).value_counts())
+
+    def merge(self, other: 'ColumnProfile'):
+        self.dtype = self.dtype or other.dtype
+        self.count += other.count
+        self.nulls += other.nulls
+        self.hll.merge(other.hll)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sum += other.sum
+        self.sum_squares += other.sum_squares
+        self._add_sample(other._sample, other._sample_keys)
+        self.counts_truncated |= other.counts_truncated
+        self._add_counts(other.counts)
+
+    def _as_numbers(self, values: pd.Series) -> np.ndarray:
+        if self.kind == 'datetime':
+            if values.dt.tz is not None:
+                values = values.dt.tz_convert(None)
+            return values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+        return values.to_numpy(dtype=float)
+
+    def _add_sample(self, values, keys):
+        # Échantillon réservoir (plus petites clés aléatoires), fusionnable entre blocs
+        values = np.concatenate([self._sample, values])
+        keys = np.concatenate([self._sample_keys, keys])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size - 1)[:self.sample_size]
+            values, keys = values[keep], keys[keep]
+        self._sample, self._sample_keys = values, keys
+
+    def _add_counts(self, counts: pd.Series):
+        if counts.empty:
+            return
+        merged = self.counts.add(counts, fill_value=0) if not self.counts.empty else counts
+        if len(merged) > self.top_capacity:
+            merged = merged.nlargest(self.top_capacity)
+            self.counts_truncated = True
+        self.counts = merged.astype('int64')
+
+    @property
+    def non_null(self) -> int:
+        return self.count - self.nulls
+
+    @property
+    def cardinality(self) -> int:
+        """Nombre de valeurs distinctes : exact tant que le compteur n'a pas été tronqué."""
+        if self.kind not in ('numeric', 'datetime') and not self.counts_truncated:
+            return len(self.counts)
+        return self.hll.estimate()
+
+    @property
+    def mean(self):
+        return self.sum / self.non_null if self.non_null else None
+
+    @property
+    def std(self):
+        if self.non_null < 2:
+            return None
+        variance = (self.sum_squares - self.sum * self.sum / self.non_null) / (self.non_null - 1)
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def quantiles(self, qs=(0.25, 0.5, 0.75)) -> dict:
+        if not len(self._sample):
+            return {}
+        return {q: self._to_value(v) for q, v in zip(qs, np.quantile(self._sample, qs))}
+
+    def histogram(self, bins: int = 10):
+        """(bords, effectifs) estimés sur l'échantillon, remis à l'échelle du nombre de valeurs."""
+        if not len(self._sample):
+            return np.empty(0), np.empty(0)
+        counts, edges = np.histogram(self._sample, bins=bins, range=(self.min, self.max))
+        scale = self.non_null / len(self._sample)
+        return edges, np.round(counts * scale).astype(int)
+
+    def top_k(self, k: int = 5) -> dict:
+        return self.counts.nlargest(k).to_dict()
+
+    def _to_value(self, value):
+        if value is None:
+            return None
+        if self.kind == 'datetime':
+            return pd.Timestamp(int(value))
+        return float(value)
+
+    def to_dict(self) -> dict:
+        profile = {
+            'kind': self.kind,
+            'count': self.count,
+            'missing': self.nulls,
+            'distinct': self.cardinality,
+        }
+        if self.kind in ('numeric', 'datetime'):
+            profile.update({
+                'min': self._to_value(self.min),
+                'max': self._to_value(self.max),
+                'quantiles': self.quantiles(),
+            })
+            if self.kind == 'numeric':
+                profile.update({'mean': self.mean, 'std': self.std})
+        else:
+            profile['top'] = self.top_k()
+        return profile
+
+    def digest(self) -> str:
+        """Description compacte (une ligne) pour les prompts du LLM."""
+        parts = [self.dtype or self.kind, f"{self.cardinality} distinctes"]
+        if self.nulls:
+            parts.append(f"{self.nulls / max(self.count, 1):.0%} manquants")
+        if self.kind == 'numeric' and self.min is not None:
+            parts.append(f"min {self.min:.4g}, médiane {self.quantiles((0.5,))[0.5]:.4g}, max {self.max:.4g}")
+        elif self.kind == 'datetime' and self.min is not None:
+            parts.append(f"du {self._to_value(self.min):%Y-%m-%d} au {self._to_value(self.max):%Y-%m-%d}")
+        elif len(self.counts):
+            parts.append("ex. " + ", ".join(repr(v)[:30] for v in self.counts.nlargest(3).index))
+        return f"{self.name} ({', '.join(parts)})"
+
+
+class DatasetProfile:
+    """
+    Profil d'un dataset.
+    - construit sur un DataFrame, il est paresseux : chaque colonne n'est profilée qu'à la
+      première demande, puis mise en cache ;
+    - construit bloc par bloc (`update`) ou par fusion (`merge`), il permet de profiler un
+      gros fichier en une passe de streaming.
+    """
+
+    def __init__(self, df: pd.DataFrame = None):
+        self.df = df
+        self._columns = {}
+        self._correlations = None
+
+    @property
+    def column_names(self) -> list:
+        return list(self.df.columns) if self.df is not None else list(self._columns)
+
+    def column(self, name) -> ColumnProfile:
+        if name not in self._columns:
+            series = self.df[name]
+            profile = ColumnProfile(name, ColumnProfile.kind_of(series))
+            profile.update(series)
+            self._columns[name] = profile
+        return self._columns[name]
+
+    def update(self, chunk: pd.DataFrame):
+        """Ajoute un bloc de lignes au profil (mode streaming)."""
+        for name in chunk.columns:
+            if name not in self._columns:
+                self._columns[name] = ColumnProfile(name, ColumnProfile.kind_of(chunk[name]))
+            self._columns[name].update(chunk[name])
+        self._own_correlations().update(chunk)
+
+    def merge(self, other: 'DatasetProfile'):
+        for name in other.column_names:
+            theirs = other.column(name)
+            if name in self._columns:
+                self._columns[name].merge(theirs)
+            else:
+                self._columns[name] = theirs
+        self._own_correlations().merge(other.correlations)
+
+    def _own_correlations(self) -> CorrelationMatrix:
+        """Statistiques modifiables : une copie de celles, partagées, du DataFrame."""
+        if self._correlations is None:
+            self._correlations = CorrelationMatrix()
+            if self.df is not None:
+                self._correlations.merge(frame_correlations(self.df))
+        return self._correlations
+
+    @property
+    def correlations(self) -> CorrelationMatrix:
+        """
+        Statistiques de corrélation du dataset, calculées une fois à la première demande
+        et partagées avec les heatmaps de Visualizer sur le même DataFrame.
+        """
+        if self._correlations is None:
+            if self.df is not None:
+                return frame_correlations(self.df)
+            self._correlations = CorrelationMatrix()
+        return self._correlations
+
+    def correlation(self, method: str = 'pearson') -> pd.DataFrame:
+        """Matrice de corrélation (Pearson ou Spearman) des colonnes numériques."""
+        return self.correlations.matrix(method)
+
+    def top_correlations(self, k: int = 10, method: str = 'pearson') -> pd.DataFrame:
+        """Les k paires de colonnes les plus corrélées (tables larges : sans matrice affichée)."""
+        return self.correlations.top_pairs(k, method)
+
+    def summary(self) -> dict:
+        return {name: self.column(name).to_dict() for name in self.column_names}
+
+    def digest(self, max_columns: int = None) -> str:
+        """Schéma compact du dataset (une ligne par colonne) pour les prompts du LLM."""
+        max_columns = max_columns or settings.PROFILE_DIGEST_COLUMNS
+        names = self.column_names
+        lines = [f"- {self.column(name).digest()}" for name in names[:max_columns]]
+        if len(names) > max_columns:
+            lines.append(f"- ... et {len(names) - max_columns} autres colonnes")
+        return "\n".join(lines)
+
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def get_profile(dataset_key: str, df: pd.DataFrame) -> DatasetProfile:
+    """Profil partagé par toutes les sessions qui utilisent le même dataset."""
+    with _profiles_lock:
+        if dataset_key not in _profiles:
+            _profiles[dataset_key] = DatasetProfile(df)
+            while len(_profiles) > max(settings.DATASET_CACHE_ITEMS, 1):
+                _profiles.popitem(last=False)
+        _profiles.move_to_end(dataset_key)
+        return _profiles[dataset_key]
@@ -0,0 +1,107 @@
+"""
+Construction des prompts envoyés au LLM.
+
+Chaque prompt est séparé en deux parties :
+- `system` : préfixe stable pour un dataset (rôle, contexte, schéma compact des colonnes).
+  Il est identique pour toutes les questions posées sur le même dataset, et donc éligible
+  au cache de prompts du fournisseur (cache_control) ;
+- `user` : la demande propre à la requête, courte.
+"""
+from typing import NamedTuple
+
+
+class Prompt(NamedTuple):
+    system: str
+    user: str
+
+
+def dataset_context(schema: str, source: str = None, tables: str = None, source_rows: int = None) -> str:
+    """Préfixe système commun à toutes les requêtes sur un dataset ; déterministe pour un même schéma."""
+    return f"""Tu es un expert en data analysis et en data visualization en Python.
+Le dataset est chargé dans la variable 'df' (DataFrame pandas). Colonnes (nom, type, statistiques) :
+{schema}
+Utilise exactement ces noms de colonnes et tiens compte de leur type : convertis explicitement
+une colonne avant un calcul si son type ne s'y prête pas.{tables_instructions(tables)}{sql_instructions(source, source_rows)}"""
+
+
+def tables_digest(tables: dict) -> str:
+    """Liste compacte des tables nommées (une ligne par table : colonnes et types), ou None."""
+    if not tables:
+        return None
+    return "\n".join(
+        f"- tables[{name!r}] : " + ", ".join(f"{column} ({dtype})" for column, dtype in table.dtypes.astype(str).items())
+        for name, table in tables.items()
+    )
+
+
+def tables_instructions(tables: str = None) -> str:
+    """Consignes pour les tables nommées (plusieurs fichiers ou feuilles chargés)."""
+    if not tables:
+        return ""
+    return f"""
+Chaque fichier ou feuille chargé est aussi disponible dans le dictionnaire 'tables' (DataFrames pandas, échantillons) :
+{tables}
+Utilise 'tables' si la question porte sur une table précise ou nécessite d'en joindre plusieurs."""
+
+
+def sql_instructions(source: str = None, source_rows: int = None) -> str:
+    """
+    Consignes pour le moteur DuckDB, quand le fichier complet est disponible.
+    `source_rows` est le nombre de lignes du fichier, compté une fois au chargement du dataset.
+    """
+    if source is None:
+        return ""
+    rows = f" ({source_rows} lignes)" if source_rows is not None else ""
+    return f"""
+Attention : 'df' n'est qu'un échantillon. Le fichier complet{rows} est interrogeable
+avec la fonction sql(requete), qui exécute une requête DuckDB sur la table 'dataset' et retourne un DataFrame pandas.
+Pour les agrégations (sommes, comptages, moyennes par groupe, histogrammes, séries temporelles avec date_trunc),
+calcule le résultat avec sql(...) et trace ce résultat agrégé."""
+
+
+_CODE_RULES = (
+    "Affecte le graphique à la variable 'fig'. "
+    "Ne fournis que le code, sans aucun formatage, commentaires ou explications."
+)
+
+
+def summary_prompt(schema: str, source: str = None, tables: str = None, source_rows: int = None) -> Prompt:
+    return Prompt(dataset_context(schema, source, tables, source_rows), """Fournis un bref résumé du dataset en décrivant quelles informations pourraient être contenues et ce que ces variables indiquent.
+Ensuite, suggère trois visualisations pertinentes à réaliser sur ce dataset, en liste numérotée,
+chacune formulée comme une demande courte qui cite les colonnes concernées, par exemple :
+  1. Histogramme de la distribution de <colonne>
+  2. Scatter plot de la relation entre <colonne> et <colonne>
+  3. Heatmap des corrélations entre les variables numériques
+Ne fournis que le résumé et les suggestions, sans code.""")
+
+
+def visualization_prompts(schema: str, query: str, viz_type: str, source: str = None, tables: str = None,
+                          source_rows: int = None) -> tuple:
+    """Retourne (prompt d'interprétation, prompt de code) pour la visualisation générale."""
+    system = dataset_context(schema, source, tables, source_rows)
+    request = f'Question (visualisation de type "{viz_type}") : "{query.strip()}"'
+    interpretation = Prompt(system, f"""{request}
+Fournis une courte interprétation textuelle décrivant ce que le graphique devrait montrer, sans code.""")
+    code = Prompt(system, f"""{request}
+Génère un snippet de code Python complet qui crée cette visualisation à partir de 'df',
+avec la bibliothèque la plus adaptée. N'utilise pas de formatage de type %d. {_CODE_RULES}""")
+    return interpretation, code
+
+
+def dynamic_prompts(schema: str, query: str, variable: str, range_values: tuple, tables: str = None) -> tuple:
+    """
+    Retourne (prompt d'interprétation, prompt de code) pour un visuel dynamique filtré sur `variable`.
+    Sans moteur SQL : une requête sur le fichier complet ignorerait le filtre appliqué à 'df'.
+    """
+    system = dataset_context(schema, tables=tables)
+    request = (
+        f'Visuel interactif filtré sur "{variable}" entre {range_values[0]} et {range_values[1]}. '
+        f'Question : "{query.strip()}"'
+    )
+    interpretation = Prompt(system, f"""{request}
+Fournis une courte interprétation textuelle décrivant ce que le graphique dynamique devrait montrer, sans code.""")
+    code = Prompt(system, f"""{request}
+Génère un snippet de code Python complet qui crée une visualisation interactive à partir de 'df',
+avec la bibliothèque la plus adaptée. 'df' est déjà filtré par l'application sur "{variable}" :
+n'applique aucun filtre et n'écris aucune borne en dur, le graphique doit rester valable pour d'autres plages. {_CODE_RULES}""")
+    return interpretation, code
@@ -0,0 +1,212 @@
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .config import settings
+
+# Fréquences pandas -> unités de date_trunc
+_FREQ_UNITS = {
+    'H': 'hour', 'h': 'hour',
+    'D': 'day',
+    'W': 'week',
+    'M': 'month', 'ME': 'month', 'MS': 'month',
+    'Q': 'quarter', 'QE': 'quarter', 'QS': 'quarter',
+    'Y': 'year', 'YE': 'year', 'YS': 'year', 'A': 'year',
+}
+
+_AGGREGATES = {'sum': 'sum', 'mean': 'avg', 'avg': 'avg', 'count': 'count', 'min': 'min', 'max': 'max'}
+
+
+def duckdb_available() -> bool:
+    return importlib.util.find_spec('duckdb') is not None
+
+
+def _quote(identifier: str) -> str:
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def _literal(text: str) -> str:
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+class QueryEngine:
+    """
+    Moteur de requêtes hors mémoire (DuckDB) sur le fichier complet, exposé sous la vue `dataset`.
+    Les agrégations sont calculées par DuckDB en parcourant toutes les lignes ;
+    seul le résultat agrégé revient en pandas.
+    """
+
+    TABLE = 'dataset'
+
+    def __init__(self, path, memory_mb: int = None, threads: int = None):
+        import duckdb
+
+        self.path = Path(path)
+        memory_mb = settings.ENGINE_MEMORY_MB if memory_mb is None else memory_mb
+        threads = settings.ENGINE_THREADS if threads is None else threads
+        config = {}
+        if memory_mb > 0:
+            config['memory_limit'] = f"{memory_mb}MB"
+        if threads > 0:
+            config['threads'] = threads
+        self._conn = duckdb.connect(':memory:', config=config)
+        # Répertoire de débordement sur disque quand la limite mémoire est atteinte
+        spill_dir = settings.ENGINE_SOURCE_DIR / 'spill'
+        spill_dir.mkdir(parents=True, exist_ok=True)
+        self._conn.execute(f"SET temp_directory = {_literal(spill_dir)}")
+        self._conn.execute(f"CREATE VIEW {self.TABLE} AS SELECT * FROM {self._reader()}")
+        self._row_count = None
+
+    def _reader(self) -> str:
+        name = self.path.name.lower()
+        if name.endswith('.parquet'):
+            return f"read_parquet({_literal(self.path)})"
+        if name.endswith('.csv'):
+            return f"read_csv_auto({_literal(self.path)})"
+        raise ValueError("Format de fichier non supporté par le moteur de requêtes")
+
+    def sql(self, query: str, params=None) -> pd.DataFrame:
+        """Exécute une requête SQL (DuckDB) et retourne le résultat en DataFrame."""
+        # Un curseur par requête : la connexion DuckDB n'est pas partagée entre threads
+        cursor = self._conn.cursor()
+        try:
+            return cursor.execute(query, params or []).df()
+        finally:
+            cursor.close()
+
+    def row_count(self) -> int:
+        if self._row_count is None:
+            self._row_count = int(self.sql(f"SELECT count(*) AS n FROM {self.TABLE}")['n'].iloc[0])
+        return self._row_count
+
+    def group_aggregate(self, by: str, value: str, agg: str = 'sum') -> pd.DataFrame:
+        """Agrégation group-by sur toutes les lignes (une ligne par catégorie)."""
+        function = _AGGREGATES[agg]
+        return self.sql(
+            f"SELECT {_quote(by)}, {function}(TRY_CAST({_quote(value)} AS DOUBLE)) AS {_quote(value)} "
+            f"FROM {self.TABLE} WHERE {_quote(by)} IS NOT NULL GROUP BY 1 ORDER BY 1"
+        )
+
+    def value_counts(self, column: str, normalize: bool = False) -> pd.Series:
+        counts = self.sql(
+            f"SELECT {_quote(column)} AS value, count(*) AS n FROM {self.TABLE} "
+            f"WHERE {_quote(column)} IS NOT NULL GROUP BY 1 ORDER BY n DESC"
+        )
+        result = pd.Series(counts['n'].to_numpy(), index=counts['value'].to_numpy(), name=column)
+        return result / result.sum() if normalize else result
+
+    def histogram(self, column: str, bins: int = 10) -> tuple:
+        """Histogramme sur toutes les lignes : retourne (centres, largeurs, effectifs) comme `histogram_counts`."""
+        value = f"TRY_CAST({_quote(column)} AS DOUBLE)"
+        bounds = self.sql(f"SELECT min({value}) AS low, max({value}) AS high FROM {self.TABLE}")
+        low, high = bounds['low'].iloc[0], bounds['high'].iloc[0]
+        if pd.isna(low):
+            return np.array([]), np.array([]), np.array([], dtype=int)
+        if high == low:
+            low, high = low - 0.5, high + 0.5
+        width = (high - low) / bins
+        counts = self.sql(
+            f"SELECT least(CAST(floor(({value} - ?) / ?) AS INTEGER), ?) AS bucket, count(*) AS n "
+            f"FROM {self.TABLE} WHERE {value} IS NOT NULL GROUP BY 1",
+            [low, width, bins - 1]
+        )
+        bin_counts = np.zeros(bins, dtype=int)
+        bin_counts[counts['bucket'].to_numpy()] = counts['n'].to_numpy()
+        edges = low + width * np.arange(bins + 1)
+        return (edges[:-1] + edges[1:]) / 2, np.diff(edges), bin_counts
+
+    def resample(self, date_column: str, value_column: str, freq: str = 'M', agg: str = 'mean') -> pd.DataFrame:
+        """Agrégation temporelle (date_trunc) sur toutes les lignes, indexée par période."""
+        unit = _FREQ_UNITS.get(freq)
+        if unit is None:
+            raise ValueError(f"Fréquence '{freq}' non supportée")
+        result = self.sql(
+            f"SELECT date_trunc({_literal(unit)}, TRY_CAST({_quote(date_column)} AS TIMESTAMP)) AS {_quote(date_column)}, "
+            f"{_AGGREGATES[agg]}(TRY_CAST({_quote(value_column)} AS DOUBLE)) AS {_quote(value_column)} "
+            f"FROM {self.TABLE} WHERE {_quote(date_column)} IS NOT NULL GROUP BY 1 ORDER BY 1"
+        )
+        return result.dropna(subset=[date_column]).set_index(date_column)
+
+    def close(self):
+        self._conn.close()
+
+
+def materialize_source(file, digest: str):
+    """
+    Retourne le chemin d'un fichier lisible par DuckDB pour `file` (chemin ou fichier téléversé),
+    en écrivant le contenu téléversé une seule fois dans le répertoire des sources.
+    Retourne None pour les formats non pris en charge (Excel).
+    """
+    name = str(getattr(file, 'name', file)).lower()
+    suffix = next((s for s in ('.csv', '.parquet') if name.endswith(s)), None)
+    if suffix is None:
+        return None
+    if isinstance(file, (str, os.PathLike)):
+        return Path(file)
+
+    directory = settings.ENGINE_SOURCE_DIR
+    path = directory / f"{digest}{suffix}"
+    if path.exists():
+        os.utime(path)
+        return path
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        if hasattr(file, 'getbuffer'):
+            f.write(file.getbuffer())
+        else:
+            file.seek(0)
+            f.write(file.read())
+            file.seek(0)
+    os.replace(tmp_path, path)
+    _evict_sources(directory, keep=path)
+    return path
+
+
+def _evict_sources(directory: Path, keep: Path):
+    max_bytes = settings.ENGINE_SOURCE_MAX_MB * 1024 * 1024
+    # Les fichiers lus par un moteur encore ouvert (vue DuckDB) ne sont pas supprimés
+    with _engines_lock:
+        in_use = {Path(path) for path in _engines}
+    files = sorted((p for p in directory.iterdir() if p.is_file() and p != keep), key=lambda p: p.stat().st_mtime)
+    total = keep.stat().st_size + sum(p.stat().st_size for p in files)
+    files = [p for p in files if p not in in_use]
+    while files and total > max_bytes:
+        oldest = files.pop(0)
+        total -= oldest.stat().st_size
+        oldest.unlink(missing_ok=True)
+
+
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+
+
+def get_query_engine(path):
+    """
+    Moteur partagé pour un fichier source (un par chemin, LRU).
+    Retourne None si le moteur est désactivé, si DuckDB n'est pas installé ou si le format
+    n'est pas pris en charge.
+    """
+    if path is None or not settings.ENGINE_OUT_OF_CORE or not duckdb_available():
+        return None
+    import duckdb
+
+    key = str(path)
+    with _engines_lock:
+        if key in _engines:
+            _engines.move_to_end(key)
+            return _engines[key]
+        try:
+            engine = QueryEngine(path)
+        except (ValueError, duckdb.Error):
+            return None
+        _engines[key] = engine
+        while len(_engines) > max(settings.DATASET_CACHE_ITEMS, 1):
+            _, old = _engines.popitem(last=False)
+            old.close()
+        return engine
@@ -26,11 +26,18 @@ QUESTION_TO_VIZ = {
     ]
 }
 
-def detect_visualization_type(question):
-    """Détecte le type de visualisation depuis la question"""
+def match_visualization_type(question):
+    """Retourne (type, graphique, motif reconnu) ou None si aucun motif ne correspond"""
     question = question.lower()
     for viz_type, patterns in QUESTION_TO_VIZ.items():
         for pattern in patterns:
             if pattern[0] in question:
-                return viz_type, pattern[1]
+                return viz_type, pattern[1], pattern[0]
+    return None
+
+def detect_visualization_type(question):
+    """Détecte le type de visualisation depuis la question"""
+    match = match_visualization_type(question)
+    if match:
+        return match[0], match[1]
     return 'distribution', 'histogram'  # Fallback
\ No newline at end of file
@@ -0,0 +1,216 @@
+import re
+import threading
+import unicodedata
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+from .config import settings
+from .query_parser import match_visualization_type
+
+# Graphique détecté par query_parser -> template de Visualizer
+CHART_TO_TEMPLATE = {
+    'histogram': 'distribution',
+    'composition': 'composition',
+    'scatter': 'correlation',
+    'heatmap': 'heatmap',
+    'bar': 'comparison',
+    'line': 'trend',
+    'choropleth': 'geo',
+}
+
+# Intentions que les templates ne rendent pas (filtre, top N, agrégat autre que celui du template) :
+# la question part au LLM même si un type de graphique est reconnu
+UNSUPPORTED_INTENT = re.compile(
+    r'\b(top|moyenne|moyen|mediane|combien|nombre de|total|pourcentage|proportion|superieure?s?|inferieure?s?'
+    r'|plus (grand|petit|eleve|faible)s?|premiers?|derniers?|seulement|uniquement|sauf|hors|filtre\w*)\b'
+)
+
+TEMPLATE_LABELS = {
+    'distribution': 'la distribution',
+    'composition': 'la composition',
+    'correlation': 'la relation',
+    'heatmap': 'les corrélations',
+    'comparison': 'la comparaison',
+    'trend': "l'évolution",
+    'geo': 'la répartition géographique',
+}
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()
+
+
+class RouterStats:
+    """Compteurs du chemin local (sans LLM) pour les questions posées dans l'application, partagés par toutes les sessions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local = 0
+        self.llm = 0
+
+    def record(self, local: bool):
+        with self._lock:
+            if local:
+                self.local += 1
+            else:
+                self.llm += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.local + self.llm
+        return self.local / total if total else 0.0
+
+
+router_stats = RouterStats()
+
+
+class VisualizationRouter:
+    """
+    Chemin rapide déterministe : reconnaît le type de graphique avec query_parser,
+    associe les colonnes citées dans la question à df.columns et produit un appel
+    à Visualizer. Retourne None quand la correspondance échoue ou est trop incertaine,
+    auquel cas la question part au LLM.
+    """
+
+    def __init__(self, df: pd.DataFrame, min_confidence: float = None):
+        self.df = df
+        self.min_confidence = settings.ROUTER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        # Les noms les plus longs d'abord, pour que "prix unitaire" l'emporte sur "prix"
+        self._columns = sorted(
+            ((_normalize(col), col) for col in df.columns),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+
+    def bind_columns(self, question: str) -> list:
+        """Colonnes citées dans la question, dans leur ordre d'apparition."""
+        text = f" {_normalize(question)} "
+        found = []
+        for normalized, col in self._columns:
+            if not normalized:
+                continue
+            position = text.find(f" {normalized} ")
+            if position != -1:
+                found.append((position, col))
+                text = text.replace(f" {normalized} ", " " + "#" * len(normalized) + " ")
+        return [col for _, col in sorted(found)]
+
+    def route(self, question: str, viz_type: str = None):
+        """
+        Retourne {'template', 'params', 'confidence', 'code', 'interpretation'} ou None.
+        Il faut un motif de graphique reconnu dans la question (le type de la barre latérale
+        ne suffit pas) et aucune intention que les templates ne savent pas rendre (filtre, top N,
+        moyenne...). La confiance (0.5 + 0.5 × part liée) doit dépasser strictement le seuil.
+        """
+        match = match_visualization_type(question)
+        if not match or match[1] not in CHART_TO_TEMPLATE or re.search(r'[<>=]', question):
+            return None
+        template = CHART_TO_TEMPLATE[match[1]]
+
+        columns = self.bind_columns(question)
+        # Intentions cherchées hors des noms de colonnes (une colonne peut s'appeler "total")
+        text = f" {_normalize(question)} "
+        for column in columns:
+            text = text.replace(f" {_normalize(column)} ", " ")
+        if UNSUPPORTED_INTENT.search(text):
+            return None
+        binding = self._bind_params(template, columns)
+        if binding is None:
+            return None
+        params, inferred = binding
+        confidence = 0.5 + 0.5 * self._bound_ratio(params, inferred, columns)
+        if confidence <= self.min_confidence:
+            return None
+        if viz_type == "Toile d'araignée" and template == 'comparison':
+            params['type'] = 'radar'
+        described = [
+            column for key, value in params.items() if key != 'type'
+            for column in (value if isinstance(value, list) else [value])
+        ]
+
+        return {
+            'template': template,
+            'params': params,
+            'confidence': confidence,
+            'code': (
+                "from datavisapp.visualizer import Visualizer\n"
+                f"fig = Visualizer(df, engine=engine).create_visualization({template!r}, {params!r})"
+            ),
+            'interpretation': (
+                f"Graphique montrant {TEMPLATE_LABELS[template]} "
+                + (f"de {', '.join(repr(str(c)) for c in described)}" if described else "des variables numériques")
+                + ", généré localement à partir de la question."
+            ),
+        }
+
+    @staticmethod
+    def _bound_ratio(params: dict, inferred: list, columns: list) -> float:
+        """
+        Part des colonnes du graphique citées dans la question (une colonne déduite sans ambiguïté
+        compte pour moitié), multipliée par la part des colonnes citées que le graphique utilise.
+        """
+        used = [column for key, value in params.items() if key != 'type'
+                for column in (value if isinstance(value, list) else [value])]
+        if not used:
+            # Graphique sur toutes les colonnes numériques : aucune colonne ne doit être citée
+            return 0.0 if columns else 1.0
+        named = [column for column in used if column in columns]
+        ratio = (len(named) + 0.5 * len(inferred)) / len(used)
+        if columns:
+            ratio *= len(set(named)) / len(columns)
+        return ratio
+
+    def _bind_params(self, template: str, columns: list):
+        """
+        Associe les colonnes citées aux paramètres du template ; retourne (params, colonnes déduites
+        sans être citées) ou None s'il manque une colonne.
+        """
+        numeric = [c for c in columns if is_numeric_dtype(self.df[c]) and not is_datetime64_any_dtype(self.df[c])]
+        dates = [c for c in columns if is_datetime64_any_dtype(self.df[c])]
+        others = [c for c in columns if c not in numeric and c not in dates]
+
+        if template == 'distribution':
+            if not columns:
+                return None
+            return {'column': (numeric or columns)[0]}, []
+        if template == 'composition':
+            if not columns:
+                return None
+            return {'column': (others or columns)[0]}, []
+        if template == 'correlation':
+            if len(numeric) < 2:
+                return None
+            params = {'x': numeric[0], 'y': numeric[1]}
+            if others:
+                params['color'] = others[0]
+            return params, []
+        if template == 'heatmap':
+            # Sans colonne citée, la matrice porte sur toutes les colonnes numériques
+            if len(numeric) >= 2:
+                return {'columns': numeric}, []
+            all_numeric = [c for c in self.df.columns
+                           if is_numeric_dtype(self.df[c]) and not is_datetime64_any_dtype(self.df[c])]
+            if len(all_numeric) < 2:
+                return None
+            return {}, []
+        if template == 'comparison':
+            if not others or not numeric:
+                return None
+            return {'x': others[0], 'y': numeric[0]}, []
+        if template == 'trend':
+            if not numeric:
+                return None
+            if dates:
+                return {'date_column': dates[0], 'value_column': numeric[0]}, []
+            # Une seule colonne de dates dans le dataset : on peut la déduire sans la citer
+            all_dates = [c for c in self.df.columns if is_datetime64_any_dtype(self.df[c])]
+            if len(all_dates) == 1:
+                return {'date_column': all_dates[0], 'value_column': numeric[0]}, [all_dates[0]]
+            return None
+        if template == 'geo':
+            if not others or not numeric:
+                return None
+            return {'geo_column': others[0], 'value_column': numeric[0]}, []
+        return None
@@ -0,0 +1,172 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import settings
+
+# Priorités : les requêtes interactives (un utilisateur attend) passent avant celles de fond
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+
+def estimate_tokens(*texts: str, max_tokens: int = None) -> int:
+    """Estimation prudente du coût d'une requête : ~4 caractères par jeton, plus la réponse maximale."""
+    max_tokens = settings.MAX_TOKENS if max_tokens is None else max_tokens
+    return sum(len(text) for text in texts) // 4 + max_tokens
+
+
+class TokenBucket:
+    """Seau à jetons : `capacity` unités, rechargées de `capacity` par minute. Capacité 0 = illimité."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Secondes avant de disposer de `amount` (borné à la capacité), 0 si disponible."""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) * 60 / self.capacity
+
+    def take(self, amount: float):
+        if self.capacity:
+            self._refill()
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        if self.capacity:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RequestScheduler:
+    """
+    Ordonnanceur des appels à l'API Claude, partagé par toutes les sessions du processus.
+    Deux seaux à jetons font respecter les budgets de requêtes et de jetons par minute ;
+    les requêtes en attente passent par ordre de priorité, puis d'arrivée.
+    Le coût en jetons est estimé à la réservation, puis corrigé avec l'usage réel (`release`).
+    """
+
+    def __init__(self, requests_per_minute: float = None, tokens_per_minute: float = None, clock=time.monotonic):
+        rpm = settings.LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        tpm = settings.LLM_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        self.clock = clock
+        self._requests = TokenBucket(rpm, clock)
+        self._tokens = TokenBucket(tpm, clock)
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        # Métriques
+        self.in_flight = 0
+        self.granted = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+
+    def acquire(self, estimated_tokens: int, priority: int = INTERACTIVE) -> float:
+        """Attend son tour et la disponibilité des budgets ; retourne le temps d'attente (s)."""
+        start = self.clock()
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+            try:
+                while True:
+                    if self._waiting[0] == ticket:
+                        delay = max(
+                            self._paused_until - self.clock(),
+                            self._requests.wait_time(1),
+                            self._tokens.wait_time(estimated_tokens)
+                        )
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                heapq.heappop(self._waiting)
+                self._requests.take(1)
+                self._tokens.take(estimated_tokens)
+                self.in_flight += 1
+                self.granted += 1
+                waited = self.clock() - start
+                self.total_wait += waited
+                return waited
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                raise
+            finally:
+                self._condition.notify_all()
+
+    def release(self, estimated_tokens: int, used_tokens: int = None):
+        """Fin de requête : rend au seau les jetons réservés mais non consommés."""
+        with self._condition:
+            self.in_flight -= 1
+            if used_tokens is not None and used_tokens < estimated_tokens:
+                self._tokens.give_back(estimated_tokens - used_tokens)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, estimated_tokens: int, priority: int = INTERACTIVE):
+        """
+        Réserve un créneau pour une requête. L'objet produit permet d'indiquer l'usage réel :
+        `usage.tokens = n` avant la sortie du bloc.
+        """
+        waited = self.acquire(estimated_tokens, priority)
+        usage = _SlotUsage(waited)
+        try:
+            yield usage
+        finally:
+            self.release(estimated_tokens, usage.tokens)
+
+    def pause(self, seconds: float):
+        """Suspend toutes les requêtes (réponse 429 de l'API avec retry-after)."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        with self._condition:
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiting:
+                queued[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return {
+                'queued': queued,
+                'queue_depth': len(self._waiting),
+                'max_queue_depth': self.max_queue_depth,
+                'in_flight': self.in_flight,
+                'granted': self.granted,
+                'mean_wait_s': self.total_wait / self.granted if self.granted else 0.0,
+            }
+
+
+class _SlotUsage:
+    def __init__(self, waited: float):
+        self.waited = waited
+        self.tokens = None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Ordonnanceur partagé par le processus (créé au premier appel)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
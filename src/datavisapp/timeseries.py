@@ -0,0 +1,213 @@
+"""
+Agrégation temporelle des courbes de tendance.
+
+Les lignes sont triées une seule fois selon la colonne de dates, puis résumées en une
+pyramide d'agrégats (somme, effectif, min, max) par jour ; les niveaux supérieurs sont
+calculés à partir des niveaux inférieurs : jour -> semaine, jour -> mois -> trimestre -> année.
+Un changement de fréquence ou de colonne de valeurs est ensuite servi par les agrégats,
+sans reparcourir les lignes. La pyramide est partagée par les copies superficielles du DataFrame.
+"""
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+from .config import settings
+
+# Fréquence (alias pandas) -> niveau de la pyramide
+FREQ_LEVELS = {
+    'D': 'day',
+    'W': 'week',
+    'M': 'month', 'ME': 'month', 'MS': 'month',
+    'Q': 'quarter', 'QE': 'quarter', 'QS': 'quarter',
+    'Y': 'year', 'YE': 'year', 'YS': 'year', 'A': 'year',
+}
+
+# Niveau -> fréquence pandas des débuts de période (périodes vides comprises dans le résultat)
+LEVEL_FREQS = {'day': 'D', 'week': 'W-MON', 'month': 'MS', 'quarter': 'QS', 'year': 'YS'}
+
+AGGREGATES = ('mean', 'sum', 'count', 'min', 'max')
+
+
+def _week_start(days: np.ndarray) -> np.ndarray:
+    # Semaines commençant le lundi, comme date_trunc('week') ; le 1970-01-01 était un jeudi
+    numbers = days.astype(np.int64)
+    return (numbers - (numbers + 3) % 7).astype('datetime64[D]')
+
+
+def _month_start(days: np.ndarray) -> np.ndarray:
+    return days.astype('datetime64[M]').astype('datetime64[D]')
+
+
+def _quarter_start(days: np.ndarray) -> np.ndarray:
+    months = days.astype('datetime64[M]').astype(np.int64)
+    return (months - months % 3).astype('datetime64[M]').astype('datetime64[D]')
+
+
+def _year_start(days: np.ndarray) -> np.ndarray:
+    return days.astype('datetime64[Y]').astype('datetime64[D]')
+
+
+# Niveau -> (niveau dont il est agrégé, début de période)
+_PARENTS = {
+    'week': ('day', _week_start),
+    'month': ('day', _month_start),
+    'quarter': ('month', _quarter_start),
+    'year': ('quarter', _year_start),
+}
+
+
+def _segments(keys: np.ndarray) -> np.ndarray:
+    """Position de début de chaque groupe de clés égales consécutives (clés triées)."""
+    if not len(keys):
+        return np.empty(0, dtype=np.intp)
+    return np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+
+
+def _combine(starts: np.ndarray, stats: tuple) -> tuple:
+    """Agrège (somme, effectif, min, max) par groupe ; fmin/fmax ignorent les groupes sans valeur."""
+    if not len(starts):
+        return stats
+    sums, counts, mins, maxs = stats
+    return (np.add.reduceat(sums, starts), np.add.reduceat(counts, starts),
+            np.fmin.reduceat(mins, starts), np.fmax.reduceat(maxs, starts))
+
+
+def _storage(series: pd.Series):
+    """Tableau NumPy qui porte les données de la colonne, commun aux copies superficielles du DataFrame."""
+    values = getattr(series.array, 'asi8', None)
+    if values is None:
+        values = series.to_numpy()
+    while isinstance(values.base, np.ndarray):
+        values = values.base
+    return values
+
+
+class RollupPyramid:
+    """
+    Agrégats par période d'un dataset pour une colonne de dates.
+    Les colonnes de valeurs sont agrégées à la première demande, puis gardées avec la pyramide.
+    """
+
+    LEVELS = ('day', 'week', 'month', 'quarter', 'year')
+
+    def __init__(self, dates: pd.Series):
+        if getattr(dates.dt, 'tz', None) is not None:
+            dates = dates.dt.tz_localize(None)
+        timestamps = dates.to_numpy(dtype='datetime64[ns]')
+        valid = np.flatnonzero(~np.isnat(timestamps))
+        # Seul tri des lignes : les agrégats de toutes les colonnes réutilisent cet ordre
+        self._order = valid[np.argsort(timestamps[valid], kind='stable')]
+        days = timestamps[self._order].astype('datetime64[D]')
+        self._starts = {'day': _segments(days)}
+        self.labels = {'day': days[self._starts['day']]}
+        for level in self.LEVELS[1:]:
+            parent, period_start = _PARENTS[level]
+            keys = period_start(self.labels[parent])
+            self._starts[level] = _segments(keys)
+            self.labels[level] = keys[self._starts[level]]
+        self.rows = len(self._order)
+        self._columns = {}
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, values: pd.Series):
+        """Calcule les agrégats de `values` à tous les niveaux (une passe sur les lignes)."""
+        if is_numeric_dtype(values) and not is_datetime64_any_dtype(values):
+            numbers = values.to_numpy(dtype=float, na_value=np.nan)[self._order]
+        else:
+            # Colonne non numérique : seul l'effectif des valeurs renseignées a un sens
+            numbers = np.where(values.notna().to_numpy()[self._order], 1.0, np.nan)
+        missing = np.isnan(numbers)
+        stats = {'day': _combine(
+            self._starts['day'], (np.where(missing, 0.0, numbers), (~missing).astype(np.int64), numbers, numbers)
+        )}
+        for level in self.LEVELS[1:]:
+            stats[level] = _combine(self._starts[level], stats[_PARENTS[level][0]])
+        with self._lock:
+            self._columns[name] = {'numeric': is_numeric_dtype(values) and not is_datetime64_any_dtype(values),
+                                   'stats': stats}
+            self._sources[name] = weakref.ref(_storage(values))
+
+    def has(self, name, values: pd.Series) -> bool:
+        """Vrai si les agrégats de `name` ont été calculés sur ces mêmes données."""
+        source = self._sources.get(name)
+        return source is not None and source() is _storage(values)
+
+    def series(self, name, freq: str = 'M', agg: str = 'mean') -> pd.Series:
+        """Série agrégée par période (début de période en index), périodes vides comprises (NaN)."""
+        level = FREQ_LEVELS.get(freq)
+        if level is None:
+            raise ValueError(f"Fréquence '{freq}' non supportée par les agrégats")
+        if agg not in AGGREGATES:
+            raise ValueError(f"Agrégation '{agg}' non supportée")
+        column = self._columns[name]
+        if not column['numeric'] and agg != 'count':
+            raise ValueError(f"La colonne '{name}' n'est pas numérique : seule l'agrégation 'count' est possible")
+        sums, counts, mins, maxs = column['stats'][level]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = {
+                'mean': np.where(counts > 0, sums / counts, np.nan),
+                'sum': sums,
+                'count': counts,
+                'min': mins,
+                'max': maxs,
+            }[agg]
+        index = pd.DatetimeIndex(self.labels[level].astype('datetime64[ns]'))
+        result = pd.Series(values, index=index, name=name)
+        if len(index):
+            result = result.reindex(pd.date_range(index[0], index[-1], freq=LEVEL_FREQS[level]))
+            if agg in ('sum', 'count'):
+                result = result.fillna(0)
+        return result
+
+
+_pyramids = OrderedDict()
+_pyramids_lock = threading.Lock()
+
+
+def get_rollups(df: pd.DataFrame, date_column) -> RollupPyramid:
+    """
+    Pyramide d'agrégats de `df` pour `date_column`, construite une fois puis retrouvée pour
+    toute copie superficielle du même DataFrame (même tableau de dates).
+    """
+    dates = df[date_column]
+    if not is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+    storage = _storage(dates)
+    key = (id(storage), date_column)
+    with _pyramids_lock:
+        entry = _pyramids.get(key)
+        # L'identifiant d'un tableau libéré peut être réutilisé : on vérifie que c'est le même objet
+        if entry is not None and entry[0]() is storage:
+            _pyramids.move_to_end(key)
+            return entry[1]
+    pyramid = RollupPyramid(dates)
+    with _pyramids_lock:
+        _pyramids[key] = (weakref.ref(storage), pyramid)
+        while len(_pyramids) > max(settings.DATASET_CACHE_ITEMS, 1):
+            _pyramids.popitem(last=False)
+    return pyramid
+
+
+def resample(df: pd.DataFrame, date_column, value_column, freq: str = 'M', agg: str = 'mean') -> pd.DataFrame:
+    """
+    Agrégation temporelle de `value_column`, indexée par début de période.
+    Les fréquences du jour à l'année sont servies par la pyramide ; les fréquences plus fines
+    (heure, minute) sont calculées directement sur les deux colonnes concernées.
+    """
+    if freq not in FREQ_LEVELS:
+        values = df[value_column]
+        if agg != 'count' and not is_numeric_dtype(values):
+            raise ValueError(f"La colonne '{value_column}' n'est pas numérique : seule l'agrégation 'count' est possible")
+        series = values.set_axis(pd.to_datetime(df[date_column], errors='coerce')).resample(freq).agg(agg)
+        return series.rename_axis(date_column).to_frame(value_column)
+
+    pyramid = get_rollups(df, date_column)
+    values = df[value_column]
+    if not pyramid.has(value_column, values):
+        pyramid.add(value_column, values)
+    return pyramid.series(value_column, freq, agg).rename_axis(date_column).to_frame(value_column)
@@ -0,0 +1,194 @@
+import contextvars
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .config import settings
+
+# Span courant du contexte d'exécution (thread ou tâche)
+_current_span = contextvars.ContextVar('datavisapp_current_span', default=None)
+
+# Codes de statut OTLP (STATUS_CODE_OK, STATUS_CODE_ERROR) et type de span interne (SPAN_KIND_INTERNAL)
+_STATUS_CODES = {'OK': 1, 'ERROR': 2}
+_SPAN_KIND_INTERNAL = 1
+_NON_FINITE = {'nan': 'NaN', 'inf': 'Infinity', '-inf': '-Infinity'}
+
+
+class Span:
+    """
+    Intervalle de temps nommé d'une trace, avec des attributs (jetons, cache...).
+    Tous les spans d'une même trace partagent la liste `trace` des spans terminés.
+    """
+
+    def __init__(self, name: str, parent=None, attributes: dict = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = 'OK'
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.trace = parent.trace if parent else []
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def add(self, key: str, value):
+        """Cumule une valeur numérique (ex. jetons de plusieurs appels)."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    @property
+    def duration(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def to_dict(self) -> dict:
+        """Représentation au format JSON d'OpenTelemetry (OTLP) : entiers 64 bits en texte, attributs typés."""
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id or '',
+            'name': self.name,
+            'kind': _SPAN_KIND_INTERNAL,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns if self.end_ns is not None else self.start_ns),
+            'attributes': [{'key': key, 'value': otlp_value(value)} for key, value in self.attributes.items()],
+            'status': {'code': _STATUS_CODES[self.status]},
+        }
+
+
+def otlp_value(value) -> dict:
+    """Valeur d'attribut OTLP (AnyValue) : booléen, entier, flottant, liste ou texte."""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        # JSON n'a pas de NaN ni d'infini : proto3 les écrit en texte
+        return {'doubleValue': value if math.isfinite(value) else _NON_FINITE[str(value)]}
+    if isinstance(value, (list, tuple)):
+        return {'arrayValue': {'values': [otlp_value(item) for item in value]}}
+    return {'stringValue': str(value)}
+
+
+class JsonlExporter:
+    """
+    Écrit chaque trace terminée dans un fichier JSONL, un span par ligne.
+    Au-delà de `max_bytes`, le fichier est renommé en `<nom>.1` (remplaçant l'ancien) et un nouveau est commencé.
+    """
+
+    def __init__(self, path, max_bytes: int = None):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def export(self, spans: list):
+        lines = "".join(json.dumps(span.to_dict()) + "\n" for span in spans)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.max_bytes and self.path.exists() and self.path.stat().st_size + len(lines) > self.max_bytes:
+                self.path.replace(self.path.with_name(self.path.name + '.1'))
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+
+class Tracer:
+    """
+    Crée les spans et exporte chaque trace quand son span racine se termine.
+    Le span parent est pris dans le contexte courant ; `propagate` le transmet aux threads.
+    """
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    def start(self, name: str, **attributes) -> Span:
+        """Démarre un span enfant du span courant, sans le rendre courant (cas des générateurs)."""
+        return Span(name, _current_span.get(), attributes)
+
+    def finish(self, span: Span, error: BaseException = None):
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.status = 'ERROR'
+            span.set_attribute('error', f"{type(error).__name__}: {error}")
+        span.trace.append(span)
+        if span.parent_id is None and self.exporter is not None:
+            try:
+                self.exporter.export(span.trace)
+            except OSError:
+                # L'instrumentation ne doit jamais faire échouer l'application
+                pass
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        span = self.start(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            _current_span.reset(token)
+            self.finish(span, e)
+            raise
+        _current_span.reset(token)
+        self.finish(span)
+
+
+def current_span():
+    """Span courant, ou None hors de toute trace."""
+    return _current_span.get()
+
+
+def set_attribute(key: str, value):
+    """Ajoute un attribut au span courant s'il y en a un."""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def record_usage(usage, span: Span = None):
+    """Cumule les jetons consommés (`response.usage` d'Anthropic) sur le span."""
+    span = span or _current_span.get()
+    if span is None or usage is None:
+        return
+    span.add('gen_ai.usage.input_tokens', getattr(usage, 'input_tokens', 0) or 0)
+    span.add('gen_ai.usage.output_tokens', getattr(usage, 'output_tokens', 0) or 0)
+    # Cache de prompts : jetons lus depuis le cache et écrits dans le cache
+    span.add('gen_ai.usage.cache_read_input_tokens', getattr(usage, 'cache_read_input_tokens', 0) or 0)
+    span.add('gen_ai.usage.cache_creation_input_tokens', getattr(usage, 'cache_creation_input_tokens', 0) or 0)
+
+
+def propagate(fn):
+    """
+    Enveloppe `fn` pour qu'elle s'exécute dans le contexte courant (span parent compris),
+    par exemple dans un thread d'un ThreadPoolExecutor.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        # Une copie par appel : un même Context ne peut pas être actif dans deux threads
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def traced(name: str = None):
+    """Décorateur : exécute la fonction dans un span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+tracer = Tracer(
+    JsonlExporter(settings.TRACING_PATH, int(settings.TRACING_MAX_MB * 1024 * 1024))
+    if settings.TRACING_ENABLED else None
+)
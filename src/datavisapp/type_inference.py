@@ -0,0 +1,154 @@
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import (
+    is_bool_dtype,
+    is_datetime64_any_dtype,
+    is_float_dtype,
+    is_integer_dtype,
+    is_numeric_dtype,
+    is_object_dtype,
+    is_string_dtype,
+)
+
+from .config import settings
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+
+class TypeInferenceEngine:
+    """
+    Inférence de types en une passe :
+    1. on sonde un petit échantillon de valeurs non nulles de chaque colonne ;
+    2. on décide du type cible (datetime, numeric, category, string) ;
+    3. on convertit chaque colonne une seule fois, en vectorisé.
+    """
+
+    def __init__(self, sample_size: int = None, parse_ratio: float = None,
+                 category_max_ratio: float = None, category_max_unique: int = None, compact: bool = None):
+        self.sample_size = sample_size or settings.INFER_SAMPLE_SIZE
+        self.parse_ratio = parse_ratio or settings.INFER_PARSE_RATIO
+        self.category_max_ratio = category_max_ratio or settings.CATEGORY_MAX_RATIO
+        self.category_max_unique = category_max_unique or settings.CATEGORY_MAX_UNIQUE
+        # Mode compact : texte stocké en Arrow (string[pyarrow]) plutôt qu'en objets Python
+        self.compact = settings.COMPACT_FRAMES if compact is None else compact
+
+    def infer(self, series: pd.Series) -> tuple:
+        """Retourne (type cible, format de date éventuel) pour une colonne."""
+        if is_bool_dtype(series):
+            return 'boolean', None
+        if is_datetime64_any_dtype(series):
+            return 'datetime', None
+        if is_numeric_dtype(series):
+            return 'numeric', None
+        if not (is_object_dtype(series) or is_string_dtype(series)):
+            return 'other', None
+
+        values = series.dropna()
+        probe = values.iloc[:self.sample_size].astype(str)
+        if probe.empty:
+            return 'string', None
+
+        if pd.to_numeric(probe, errors='coerce').notna().mean() >= self.parse_ratio:
+            return 'numeric', None
+
+        date_format = guess_datetime_format(probe.iloc[0])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            parsed = pd.to_datetime(probe, errors='coerce', format=date_format or 'mixed')
+        if parsed.notna().mean() >= self.parse_ratio:
+            return 'datetime', date_format
+        return self.text_type(values), None
+
+    def text_type(self, values: pd.Series) -> str:
+        """Type d'une colonne de texte (valeurs non nulles) : category si peu de modalités, sinon string."""
+        n_unique = values.nunique()
+        if n_unique <= self.category_max_unique and n_unique <= self.category_max_ratio * len(values):
+            return 'category'
+        return 'string'
+
+    def convert(self, series: pd.Series, target: str, date_format=None) -> pd.Series:
+        """Convertit la colonne vers le type cible (une seule conversion)."""
+        if target == 'numeric':
+            if not is_numeric_dtype(series):
+                series = pd.to_numeric(series, errors='coerce')
+            return downcast_numeric(series)
+        if target == 'datetime' and not is_datetime64_any_dtype(series):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                return pd.to_datetime(series, errors='coerce', format=date_format or 'mixed')
+        if target == 'category':
+            # Catégorie = encodage par dictionnaire : codes entiers (int8 si < 128 modalités)
+            return series.astype('category')
+        if target == 'string' and self.compact:
+            return compact_strings(series)
+        return series
+
+    def convert_columns(self, df: pd.DataFrame) -> tuple:
+        """
+        Applique l'inférence à toutes les colonnes.
+        Retourne les colonnes converties {colonne: Series} et un rapport {colonne: {type, dtype, coerced, seconds}}.
+        Une colonne dont des valeurs renseignées ne sont pas convertibles (hors de l'échantillon sondé)
+        garde ses valeurs d'origine : `coerced` est alors le nombre de valeurs qui auraient été perdues.
+        """
+        converted = {}
+        report = {}
+        for col in df.columns:
+            start = time.perf_counter()
+            series = df[col]
+            target, date_format = self.infer(series)
+            converted[col] = self.convert(series, target, date_format)
+            coerced = 0
+            if converted[col] is not series and target in ('numeric', 'datetime'):
+                coerced = int(converted[col].isna().sum() - series.isna().sum())
+            if coerced:
+                target = self.text_type(series.dropna())
+                converted[col] = self.convert(series, target)
+            report[col] = {
+                'type': target,
+                'dtype': str(converted[col].dtype),
+                'coerced': coerced,
+                'seconds': time.perf_counter() - start,
+            }
+        return converted, report
+
+    def run(self, df: pd.DataFrame) -> tuple:
+        """Comme `convert_columns`, mais retourne un DataFrame (les colonnes ne sont pas recopiées)."""
+        converted, report = self.convert_columns(df)
+        return pd.DataFrame(converted, index=df.index, copy=False), report
+
+
+def compact_strings(series: pd.Series) -> pd.Series:
+    """Stocke une colonne de texte en Arrow (string[pyarrow]) ; inchangée si pyarrow est absent."""
+    try:
+        return series.astype('string[pyarrow]')
+    except (ImportError, TypeError, ValueError):
+        return series
+
+
+def downcast_numeric(series: pd.Series, integral_floats: bool = False) -> pd.Series:
+    """
+    Réduit la taille des entiers, et des flottants seulement si c'est sans perte.
+    Avec `integral_floats`, un flottant sans valeur manquante dont toutes les valeurs sont
+    entières (colonne d'entiers complétée après coup) redevient un entier.
+    """
+    if is_bool_dtype(series):
+        return series
+    if is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if integral_floats and is_float_dtype(series) and not series.hasnans:
+        values = series.to_numpy()
+        if np.array_equal(values, np.trunc(values)):
+            return pd.to_numeric(series.astype(np.int64), downcast='integer')
+    if series.dtype == np.float64:
+        values = series.to_numpy()
+        as_float32 = values.astype(np.float32)
+        finite = np.isfinite(values)
+        if np.array_equal(as_float32[finite], values[finite]):
+            return pd.Series(as_float32, index=series.index, name=series.name)
+    return series
@@ -1,17 +1,27 @@
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from .aggregation import density_sample_indices, group_aggregate, histogram_counts, lttb_indices, trendline
+from .config import settings
+from .correlation import frame_correlations, numeric_columns
+from .timeseries import resample
 
 class Visualizer:
-    def __init__(self, df):
+    def __init__(self, df, max_points: int = None, engine=None):
         self.df = df
         self.color_scale = px.colors.sequential.Viridis
+        # Au-delà de ce nombre de points, les données sont agrégées ou réduites côté serveur
+        self.max_points = max_points or settings.MAX_POINTS
+        # Moteur hors mémoire (QueryEngine) : les agrégations portent alors sur le fichier complet
+        self.engine = engine
 
     def create_visualization(self, viz_type, params):
         """Route vers le template approprié"""
         templates = {
             'distribution': self._distribution_chart,
             'correlation': self._correlation_chart,
+            'heatmap': self._heatmap_chart,
             'composition': self._composition_chart,
             'comparison': self._comparison_chart,
             'trend': self._trend_chart,
@@ -23,6 +33,15 @@ class Visualizer:
 
     def _distribution_chart(self, column, bins=10):
         """Distribution d'une variable"""
+        if (self.engine is not None or len(self.df) > self.max_points) and is_numeric_dtype(self.df[column]):
+            # Histogramme pré-calculé : seuls les effectifs par classe sont envoyés au navigateur
+            if self.engine is not None:
+                centers, widths, counts = self.engine.histogram(column, bins)
+            else:
+                centers, widths, counts = histogram_counts(self.df[column], bins)
+            fig = go.Figure(go.Bar(x=centers, y=counts, width=widths, marker_color=self.color_scale[2]))
+            fig.update_layout(title=f"Distribution de {column}", xaxis_title=column, yaxis_title="count", bargap=0)
+            return fig
         return px.histogram(
             self.df, 
             x=column, 
@@ -34,18 +53,49 @@ class Visualizer:
 
     def _correlation_chart(self, x, y, color=None):
         """Corrélation entre deux variables"""
-        return px.scatter(
-            self.df, 
+        data = self._reduce_scatter(x, y)
+        fig = px.scatter(
+            data, 
             x=x, y=y, 
             color=color,
-            trendline='lowess',
             color_continuous_scale=self.color_scale,
             title=f"Corrélation entre {x} et {y}"
         )
+        # Tendance calculée sur les données réduites
+        trend_x, trend_y = trendline(data[x], data[y])
+        fig.add_trace(go.Scatter(x=trend_x, y=trend_y, mode='lines', name='tendance', line=dict(color='black')))
+        return fig
+
+    def _heatmap_chart(self, columns=None, method='pearson', max_columns=None):
+        """Matrice de corrélation (heatmap) des colonnes numériques"""
+        numeric = numeric_columns(self.df)
+        columns = [c for c in columns if c in numeric] if columns else numeric
+        # Statistiques calculées une fois par dataset (partagées avec son profil) : on n'en garde que les colonnes demandées
+        correlations = frame_correlations(self.df)
+        if columns != correlations.columns:
+            correlations = correlations.subset(columns)
+        corr = correlations.matrix(method)
+        max_columns = max_columns or settings.HEATMAP_MAX_COLUMNS
+        if len(corr) > max_columns:
+            # Table large : seules les colonnes des paires les plus corrélées sont affichées
+            pairs = correlations.top_pairs(max_columns * max_columns, method)
+            keep = list(dict.fromkeys(pairs[['x', 'y']].to_numpy().ravel()))[:max_columns]
+            corr = corr.loc[keep, keep]
+        return px.imshow(
+            corr,
+            text_auto='.2f' if len(corr) <= 12 else False,
+            zmin=-1, zmax=1,
+            color_continuous_scale='RdBu_r',
+            aspect='auto',
+            title=f"Matrice de corrélation ({method.capitalize()})"
+        )
 
     def _composition_chart(self, column, threshold=0.01):
         """Composition (camembert/treemap)"""
-        counts = self.df[column].value_counts(normalize=True)
+        if self.engine is not None:
+            counts = self.engine.value_counts(column, normalize=True)
+        else:
+            counts = self.df[column].value_counts(normalize=True)
         filtered = counts[counts > threshold]
         if len(filtered) < 5:
             return px.pie(filtered, names=filtered.index, values=filtered.values, title=f"Composition de {column}")
@@ -55,13 +105,20 @@ class Visualizer:
     def _comparison_chart(self, x, y, type='bar'):
         """Comparaison de catégories"""
         if type == 'bar':
-            return px.bar(self.df, x=x, y=y, color=x, title=f"Comparaison de {x} et {y}")
+            # Une barre par catégorie (somme), au lieu d'un segment empilé par ligne
+            data = self._group_aggregate(x, y, 'sum')
+            return px.bar(data, x=x, y=y, color=x, title=f"Comparaison de {x} et {y}")
         elif type == 'radar':
-            return px.line_polar(self.df, r=y, theta=x, line_close=True, title=f"Comparaison (Radar) de {x} et {y}")
+            data = self._group_aggregate(x, y, 'mean')
+            return px.line_polar(data, r=y, theta=x, line_close=True, title=f"Comparaison (Radar) de {x} et {y}")
 
-    def _trend_chart(self, date_column, value_column, freq='M'):
+    def _trend_chart(self, date_column, value_column, freq='M', agg='mean'):
         """Tendance temporelle"""
-        df_resampled = self.df.set_index(date_column).resample(freq).mean()
+        if self.engine is not None:
+            df_resampled = self.engine.resample(date_column, value_column, freq, agg)
+        else:
+            # Agrégats par période pré-calculés : changer de fréquence ou de colonne ne reparcourt pas les lignes
+            df_resampled = resample(self.df, date_column, value_column, freq, agg)
         return px.area(df_resampled, y=value_column, line_shape='spline', title=f"Tendance de {value_column} au fil du temps")
 
     def _geo_chart(self, geo_column, value_column):
@@ -75,6 +132,29 @@ class Visualizer:
             title=f"Carte géographique de {value_column}"
         )
 
+    def _group_aggregate(self, by, value, agg):
+        if self.engine is not None:
+            return self.engine.group_aggregate(by, value, agg)
+        return group_aggregate(self.df, by, value, agg)
+
+    def _reduce_scatter(self, x, y):
+        """Sous-échantillonnage par densité quand le nuage dépasse le budget de points"""
+        if len(self.df) <= self.max_points:
+            return self.df
+        keep = density_sample_indices(self.df[x], self.df[y], self.max_points)
+        return self.df.iloc[keep]
+
+    def _reduce_line(self, x, y):
+        """Réduction LTTB d'une série triée selon x quand elle dépasse le budget de points"""
+        data = self.df.sort_values(x)
+        if len(data) <= self.max_points:
+            return data
+        x_values = data[x]
+        if not is_numeric_dtype(x_values):
+            x_values = pd.to_datetime(x_values).astype('int64')
+        keep = lttb_indices(x_values, data[y], self.max_points)
+        return data.iloc[keep]
+
 def get_visualization_template(chart_type: str):
     templates = {
         "histogramme": "generate_histogram",
@@ -87,6 +167,8 @@ def get_visualization_template(chart_type: str):
 # Pour que les méthodes attendues par get_visualization_template existent,
 # on peut ajouter ces alias dans la classe Visualizer.
 def generate_histogram(self, x: str, color: str = None):
+    if color is None and len(self.df) > self.max_points and is_numeric_dtype(self.df[x]):
+        return self._distribution_chart(x, bins=50)
     return px.histogram(
         self.df, 
         x=x, 
@@ -96,7 +178,7 @@ def generate_histogram(self, x: str, color: str = None):
 
 def generate_line_chart(self, x: str, y: str):
     return px.line(
-        self.df, 
+        self._reduce_line(x, y), 
         x=x, y=y, 
         title=f"Courbe de {y} en fonction de {x}"
     )
@@ -0,0 +1,29 @@
+import pytest
+
+from datavisapp.cache import DatasetCache
+from datavisapp.config import settings
+from datavisapp.history import HistoryStore
+from datavisapp.llm_cache import ResponseCache
+from datavisapp.tracing import tracer
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(monkeypatch):
+    """Aucune trace écrite dans le projet ; nouvelles tentatives quasi immédiates."""
+    monkeypatch.setattr(tracer, 'exporter', None)
+    monkeypatch.setattr(settings, 'LLM_RETRY_BASE_DELAY', 0.01)
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    return ResponseCache(tmp_path / 'llm_responses.sqlite')
+
+
+@pytest.fixture
+def dataset_cache(tmp_path):
+    return DatasetCache(tmp_path / 'datasets', memory_items=4, disk_max_bytes=64 * 1024 * 1024)
+
+
+@pytest.fixture
+def history_store(tmp_path):
+    return HistoryStore(tmp_path / 'history.sqlite', max_entries=5)
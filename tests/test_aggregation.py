@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from datavisapp.aggregation import density_sample_indices, histogram_counts, lttb_indices, trendline
+from datavisapp.visualizer import Visualizer
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(10_000)
+    y = np.sin(x / 500)
+    y[4321] = 50
+
+    keep = lttb_indices(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert 4321 in keep
+
+
+def test_lttb_returns_every_point_below_threshold():
+    assert list(lttb_indices([0, 1, 2], [1, 2, 3], 10)) == [0, 1, 2]
+
+
+def test_density_sampling_thins_dense_areas_and_keeps_outliers():
+    rng = np.random.default_rng(0)
+    x = np.concatenate([rng.normal(0, 0.01, 50_000), [10.0, -10.0]])
+    y = np.concatenate([rng.normal(0, 0.01, 50_000), [10.0, 10.0]])
+    y[5] = np.nan
+
+    keep = density_sample_indices(x, y, 400)
+    assert len(keep) <= 400
+    assert np.all(np.diff(keep) > 0)
+    assert {50_000, 50_001} <= set(keep)
+
+
+def test_histogram_counts_ignore_missing_values():
+    centers, widths, counts = histogram_counts([0, 1, 2, 3, np.nan, np.inf], bins=3)
+    assert counts.sum() == 4
+    assert np.allclose(widths, 1.0) and np.allclose(centers, [0.5, 1.5, 2.5])
+
+
+def test_trendline_follows_a_linear_relation():
+    x = np.linspace(0, 100, 5000)
+    trend_x, trend_y = trendline(x, 2 * x + 1, bins=20)
+    assert len(trend_x) == 20
+    # Lissage sur 3 intervalles : exact à l'intérieur, biaisé aux bords seulement
+    assert np.allclose(trend_y[1:-1], 2 * trend_x[1:-1] + 1, rtol=0.01)
+
+
+def test_visualizer_sends_at_most_max_points():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'x': rng.normal(size=20_000), 'y': rng.normal(size=20_000),
+                       'ville': rng.choice(['Lyon', 'Paris'], 20_000)})
+    visualizer = Visualizer(df, max_points=500)
+
+    scatter = visualizer.create_visualization('correlation', {'x': 'x', 'y': 'y'})
+    assert len(scatter.data[0].x) <= 500
+    histogram = visualizer.create_visualization('distribution', {'column': 'x'})
+    # Histogramme pré-calculé : un effectif par classe, pas une valeur par ligne
+    assert len(histogram.data[0].x) == 10 and sum(histogram.data[0].y) == 20_000
+    bars = visualizer.create_visualization('comparison', {'x': 'ville', 'y': 'x'})
+    assert sum(len(trace.x) for trace in bars.data) == 2
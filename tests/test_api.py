@@ -0,0 +1,46 @@
+import json
+
+from datavisapp.api import ClaudeClient
+from datavisapp.fakes import FakeAnthropic
+from datavisapp.prompts import Prompt
+
+INTERPRETATION = Prompt("", "Interprète la distribution de age")
+CODE = Prompt("", "Écris le code de l'histogramme de age")
+
+
+def _responder(system, messages):
+    if "unique objet JSON" in messages[-1]['content']:
+        return json.dumps({'interpretation': "Asymétrique.", 'code': "fig = 1"})
+    return "réponse séparée"
+
+
+def test_parallel_mode_sums_usage_of_both_calls():
+    client = ClaudeClient(client=FakeAnthropic(responder=_responder, latency=0.05))
+
+    _, _, timings = client.generate_interpretation_and_code(INTERPRETATION, CODE, combined=False)
+    assert timings['mode'] == 'parallel'
+    assert timings['input_tokens'] == len(INTERPRETATION.user.split()) + len(CODE.user.split())
+    assert timings['cached_input_tokens'] == 0
+    assert {'interpretation', 'code', 'total'} <= timings.keys()
+
+
+def test_combined_mode_makes_one_call():
+    fake = FakeAnthropic(responder=_responder)
+    client = ClaudeClient(client=fake)
+
+    interpretation, code, timings = client.generate_interpretation_and_code(INTERPRETATION, CODE, combined=True)
+    assert (interpretation, code, timings['mode']) == ("Asymétrique.", "fig = 1", 'combined')
+    assert fake.calls == 1
+
+
+def test_unparsable_combined_answer_is_marked_as_fallback():
+    fake = FakeAnthropic(responder=lambda system, messages: "pas de JSON ici")
+    client = ClaudeClient(client=fake)
+
+    interpretation, code, timings = client.generate_interpretation_and_code(INTERPRETATION, CODE, combined=True)
+    assert (interpretation, code) == ("pas de JSON ici", "pas de JSON ici")
+    assert timings['mode'] == 'combined_fallback'
+    assert fake.calls == 3
+    # Les jetons de l'appel combiné perdu sont comptés avec ceux des deux appels séparés
+    assert timings['input_tokens'] > len(INTERPRETATION.user.split()) + len(CODE.user.split())
+    assert {'combined', 'interpretation', 'code', 'total'} <= timings.keys()
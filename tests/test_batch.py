@@ -0,0 +1,93 @@
+import json
+from concurrent.futures import Future
+
+import pandas as pd
+import pytest
+
+from datavisapp.batch import DEFAULT_VIZ_TYPE, BatchRunner, load_manifest
+from datavisapp.config import settings
+from datavisapp.executor import SnippetExecutor
+from datavisapp.fakes import MockAnthropicServer
+
+FIGURE = "import plotly.express as px\nfig = px.histogram(df, x='age')"
+
+
+def test_json_manifest_resolves_paths_and_sanitizes_ids(tmp_path):
+    manifest = tmp_path / 'lots' / 'manifest.json'
+    manifest.parent.mkdir()
+    manifest.write_text(json.dumps({'jobs': [
+        {'id': 'ventes / 2024', 'dataset': '../ventes.csv', 'question': "ventes par mois", 'viz_type': "Courbe"},
+        {'dataset': 'clients.xlsx', 'question': "âge des clients"},
+    ]}), encoding='utf-8')
+
+    jobs = load_manifest(manifest)
+    assert [job['id'] for job in jobs] == ['ventes_2024', 'job-0001']
+    assert jobs[0]['dataset'] == str((tmp_path / 'ventes.csv').resolve())
+    assert (jobs[0]['viz_type'], jobs[1]['viz_type']) == ("Courbe", DEFAULT_VIZ_TYPE)
+
+
+def test_csv_manifest(tmp_path):
+    manifest = tmp_path / 'manifest.csv'
+    manifest.write_text("dataset,question,viz_type,id\nventes.csv,ventes par ville,,a\nventes.csv,top 5,Barres,b\n",
+                        encoding='utf-8')
+    jobs = load_manifest(manifest)
+    assert [(job['id'], job['question'], job['viz_type']) for job in jobs] == [
+        ('a', "ventes par ville", DEFAULT_VIZ_TYPE), ('b', "top 5", "Barres")
+    ]
+
+
+@pytest.mark.parametrize('entries, message', [
+    ([{'dataset': 'a.csv'}], "obligatoires"),
+    ([{'id': 'x', 'dataset': 'a.csv', 'question': "q"}, {'id': 'x', 'dataset': 'b.csv', 'question': "q"}], "double"),
+])
+def test_invalid_manifest_is_rejected(tmp_path, entries, message):
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text(json.dumps(entries), encoding='utf-8')
+    with pytest.raises(ValueError, match=message):
+        load_manifest(manifest)
+
+
+@pytest.fixture
+def prepared():
+    """Dataset tel que le retourne `_prepare_dataset`, sans passer par le pool de processus."""
+    future = Future()
+    future.set_result({
+        'key': 'batch-test', 'df': pd.DataFrame({'age': [21, 35, 48, 60]}), 'tables': {},
+        'source': None, 'schema': "- age (numeric)", 'seconds': 0.0
+    })
+    return future
+
+
+@pytest.fixture
+def executor():
+    executor = SnippetExecutor(workers=1, timeout=5, cpu_seconds=0, memory_mb=0)
+    yield executor
+    executor.shutdown()
+
+
+def test_rate_limited_job_is_retried_and_written(tmp_path, prepared, executor, monkeypatch):
+    anthropic = pytest.importorskip('anthropic')
+    monkeypatch.setattr(settings, 'CLAUDE_MODEL', 'claude-test')
+    with MockAnthropicServer(responder=lambda system, messages: FIGURE, rate_limited=2) as server:
+        sdk = anthropic.Anthropic(api_key='test', base_url=server.base_url, max_retries=0)
+        runner = BatchRunner(workers=1, llm_concurrency=1, client=sdk, executor=executor, formats=('json',))
+        job = {'id': 'histoire', 'dataset': 'ventes.csv', 'question': "Raconte ces données", 'viz_type': "Graphique"}
+        result = runner._run_job(job, prepared, tmp_path)
+
+    assert result['status'] == 'ok', result.get('error')
+    # Deux réponses 429 réessayées, puis les deux appels (interprétation et code)
+    assert server.requests == 4
+    assert result['outputs'] == ['histoire.json']
+    assert '"histogram"' in (tmp_path / 'histoire.json').read_text(encoding='utf-8')
+    assert {'wait_dataset', 'generate', 'exec', 'write', 'total'} <= result['timings'].keys()
+
+
+def test_failed_dataset_only_fails_its_jobs(tmp_path, executor):
+    failed = Future()
+    failed.set_exception(FileNotFoundError("ventes.csv"))
+    runner = BatchRunner(workers=1, llm_concurrency=1, client=object(), executor=executor)
+    result = runner._run_job({'id': 'a', 'dataset': 'ventes.csv', 'question': "q", 'viz_type': "Graphique"},
+                             failed, tmp_path)
+    assert result['status'] == 'error'
+    assert result['error'] == "FileNotFoundError: ventes.csv"
+    assert 'total' in result['timings']
@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from datavisapp.cache import DatasetCache
+
+FRAME = pd.DataFrame({'age': [25, 32, 47], 'ville': ['Lyon', 'Paris', 'Lyon']})
+
+
+def test_concurrent_sessions_build_a_dataset_once(dataset_cache):
+    builds = []
+    barrier = threading.Barrier(4)
+    results = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.2)
+        return FRAME, {'rows': 3}
+
+    def load():
+        barrier.wait()
+        results.append(dataset_cache.get_or_create('cle', build))
+
+    threads = [threading.Thread(target=load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert all(df is results[0][0] for df, _ in results)
+    assert list(dataset_cache.directory.glob('*.tmp')) == []
+
+
+def test_failed_build_is_retried(dataset_cache):
+    def failing():
+        raise ValueError("fichier illisible")
+
+    with pytest.raises(ValueError):
+        dataset_cache.get_or_create('cle', failing)
+    df, meta = dataset_cache.get_or_create('cle', lambda: (FRAME, {'rows': 3}))
+    assert meta == {'rows': 3}
+
+
+def test_entries_survive_a_restart_on_disk(dataset_cache):
+    dataset_cache.put('cle', FRAME, {'rows': 3})
+    restarted = DatasetCache(dataset_cache.directory, memory_items=4, disk_max_bytes=dataset_cache.disk_max_bytes)
+
+    df, meta = restarted.get('cle')
+    pd.testing.assert_frame_equal(df, FRAME)
+    assert meta == {'rows': 3}
+    assert restarted.hits['disk'] == 1
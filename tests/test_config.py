@@ -0,0 +1,30 @@
+import configparser
+
+from datavisapp.config import Settings
+
+# settings.toml d'avant les sections ajoutées (nettoyage, cache, exécuteur...)
+OLD_SETTINGS = """
+[DATA]
+MAX_ROWS = 5000
+
+[VIZ]
+DEFAULT_THEME = plotly_dark
+
+[LLM]
+MODEL = claude-test
+"""
+
+
+def test_missing_sections_fall_back_to_defaults():
+    config = configparser.ConfigParser()
+    config.read_string(OLD_SETTINGS)
+    settings = Settings(config)
+
+    assert (settings.MAX_ROWS, settings.DEFAULT_THEME, settings.CLAUDE_MODEL) == (5000, 'plotly_dark', 'claude-test')
+    assert settings.EXEC_WORKERS == 2
+    assert settings.TRACING_ENABLED is True
+    assert settings.PREFETCH_WAIT_SECONDS == 2.0
+
+
+def test_empty_configuration():
+    assert Settings(configparser.ConfigParser()).DATASET_CACHE_ITEMS == 8
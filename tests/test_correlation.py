@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datavisapp.correlation import CorrelationMatrix
+from datavisapp.profiler import get_profile
+from datavisapp.visualizer import Visualizer
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(2000, 4)), columns=['a', 'b', 'c', 'd'])
+    df['b'] += 2 * df['a']
+    # Grandes valeurs peu dispersées : sensibles à la perte de précision de sum(x²) - n·moyenne²
+    df['c'] = 1e9 + df['c']
+    df.loc[::7, 'd'] = np.nan
+    return df
+
+
+def test_pearson_matches_pandas(frame):
+    expected = frame.corr()
+    assert np.allclose(CorrelationMatrix.from_frame(frame).pearson(), expected)
+
+
+def test_merge_of_chunks_with_different_shifts_matches_full_pass(frame):
+    merged = CorrelationMatrix()
+    for start in range(0, len(frame), 500):
+        part = CorrelationMatrix()
+        # Blocs de moyennes différentes : chaque objet a son propre décalage
+        part.update(frame.iloc[start:start + 500] + start)
+        merged.merge(part)
+    shifted = pd.concat([frame.iloc[start:start + 500] + start for start in range(0, len(frame), 500)])
+    assert np.allclose(merged.pearson(), shifted.corr())
+    assert merged.pair_counts().loc['a', 'd'] == frame['d'].notna().sum()
+
+
+def test_subset_keeps_statistics_of_the_requested_columns(frame):
+    full = CorrelationMatrix.from_frame(frame)
+    subset = full.subset(['d', 'a'])
+    assert list(subset.pearson().columns) == ['d', 'a']
+    assert np.allclose(subset.pearson(), frame[['d', 'a']].corr())
+    assert np.allclose(subset.spearman(), CorrelationMatrix.from_frame(frame, ['d', 'a']).spearman())
+
+
+def test_heatmap_reuses_the_dataset_profile(frame, monkeypatch):
+    profile = get_profile('dataset-heatmap', frame)
+    correlations = profile.correlations
+
+    def full_pass(*args, **kwargs):
+        raise AssertionError("statistiques recalculées à chaque rendu")
+
+    monkeypatch.setattr(CorrelationMatrix, 'from_frame', full_pass)
+    for columns in (None, ['a', 'b']):
+        # Copie superficielle, comme le DataFrame que reçoit chaque snippet dans un worker
+        visualizer = Visualizer(frame.copy(deep=False))
+        fig = visualizer.create_visualization('heatmap', {'columns': columns} if columns else {})
+        expected = frame[columns or list(frame.columns)].corr().to_numpy()
+        assert np.allclose(np.array(fig.data[0].z, dtype=float), expected)
+    assert profile.correlations is correlations
+
+
+def test_profile_merge_does_not_change_shared_statistics(frame):
+    profile = get_profile('dataset-merge', frame)
+    shared = profile.correlations
+    before = shared.pearson().copy()
+    other = get_profile('dataset-merge-other', frame + 1)
+
+    profile.merge(other)
+    assert profile.correlations is not shared
+    pd.testing.assert_frame_equal(shared.pearson(), before)
+    assert profile.correlations.pair_counts().loc['a', 'a'] == 2 * len(frame)
@@ -0,0 +1,165 @@
+import io
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datavisapp.config import settings
+from datavisapp.data_loader import TABLE_COLUMN, DataLoader, ReservoirSampler, _spill_sources
+
+
+def _upload(name: str, df: pd.DataFrame) -> io.BytesIO:
+    file = io.BytesIO(df.to_csv(index=False).encode())
+    file.name = name
+    return file
+
+
+def _archive(name: str, members: dict) -> io.BytesIO:
+    file = io.BytesIO()
+    with zipfile.ZipFile(file, 'w') as archive:
+        for member, content in members.items():
+            archive.writestr(member, content)
+    file.name = name
+    return file
+
+
+@pytest.fixture
+def numbered_csv(tmp_path):
+    path = tmp_path / 'lignes.csv'
+    pd.DataFrame({'id': np.arange(1000), 'valeur': np.arange(1000) * 0.5}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_reservoir_keeps_size_rows_without_duplicates():
+    sampler = ReservoirSampler(100, seed=0)
+    for start in range(0, 10_000, 700):
+        sampler.update(pd.DataFrame({'id': np.arange(start, min(start + 700, 10_000))}))
+
+    sample = sampler.result()
+    assert sampler.rows_seen == 10_000
+    assert len(sample) == 100 and sample['id'].is_unique
+    assert list(sample.index) == list(range(100))
+
+
+def test_reservoir_is_uniform_over_chunks():
+    # Chaque ligne d'un flux de 1000 lignes en blocs inégaux doit être retenue avec probabilité 10 %
+    hits = np.zeros(1000)
+    for seed in range(400):
+        sampler = ReservoirSampler(100, seed=seed)
+        for start, stop in ((0, 50), (50, 700), (700, 1000)):
+            sampler.update(pd.DataFrame({'id': np.arange(start, stop)}))
+        hits[sampler.result()['id'].to_numpy()] += 1
+    by_decile = hits.reshape(10, 100).sum(axis=1) / 400
+    assert np.allclose(by_decile, 10, atol=1.5)
+
+
+def test_merged_reservoirs_sample_the_union():
+    left, right = ReservoirSampler(50, seed=1), ReservoirSampler(50, seed=2)
+    left.update(pd.DataFrame({'id': np.arange(0, 100)}))
+    right.update(pd.DataFrame({'id': np.arange(100, 1000)}))
+    left.merge(right, {'table_source': 'droite'})
+
+    sample = left.result()
+    assert left.rows_seen == 1000 and len(sample) == 50
+    # Les lignes de droite, 9 fois plus nombreuses, dominent l'échantillon fusionné
+    assert (sample['id'] >= 100).sum() > 30
+    assert set(sample.loc[sample['id'] >= 100, 'table_source']) == {'droite'}
+
+
+@pytest.mark.parametrize('engine', ['c', 'pyarrow'])
+def test_streaming_stops_at_max_rows(numbered_csv, engine, monkeypatch):
+    monkeypatch.setattr(settings, 'CSV_ENGINE', engine)
+    df, stats = DataLoader.load_streaming(numbered_csv, sample_size=50, chunk_size=64, max_rows=300)
+
+    assert stats['rows_seen'] == 300
+    assert len(df) == 50 and df['id'].max() < 300
+
+
+def test_streaming_without_limit_reads_the_whole_file(numbered_csv, tmp_path):
+    parquet = tmp_path / 'lignes.parquet'
+    pd.read_csv(numbered_csv).to_parquet(parquet, row_group_size=100)
+
+    for source in (numbered_csv, str(parquet)):
+        df, stats = DataLoader.load_streaming(source, sample_size=2000, chunk_size=64, max_rows=0)
+        assert stats['rows_seen'] == 1000
+        assert sorted(df['id']) == list(range(1000))
+
+
+def test_uploads_are_loaded_in_parallel_from_spilled_files():
+    ventes = pd.DataFrame({'mois': range(100), 'montant': range(100)})
+    uploads = [_upload('ventes_2023.csv', ventes), _upload('ventes_2024.csv', ventes + 1)]
+
+    df, tables, stats = DataLoader.load_tables(uploads, workers=2)
+    assert set(tables) == {'ventes_2023', 'ventes_2024'}
+    assert (stats['workers'], stats['rows_seen']) == (2, 200)
+    assert len(df) == 200
+
+
+def test_each_content_is_spilled_once(tmp_path):
+    content = b"a,b\n1,2\n"
+    parts = [
+        {'table': 'classeur_janvier', 'file': 'classeur.xlsx', 'format': '.xlsx', 'sheet': 'janvier', 'source': content},
+        {'table': 'classeur_fevrier', 'file': 'classeur.xlsx', 'format': '.xlsx', 'sheet': 'fevrier', 'source': content},
+        {'table': 'clients', 'file': 'clients.csv', 'format': '.csv', 'sheet': None, 'source': '/data/clients.csv'},
+    ]
+    spilled = _spill_sources(parts, tmp_path)
+    assert spilled[0]['source'] == spilled[1]['source']
+    assert [part['sheet'] for part in spilled] == ['janvier', 'fevrier', None]
+    assert spilled[2]['source'] == '/data/clients.csv'
+    assert os.listdir(tmp_path) == [os.path.basename(spilled[0]['source'])]
+    assert parts[0]['source'] is content
+
+
+def test_zip_members_are_named_tables():
+    ventes = pd.DataFrame({'mois': range(30), 'montant': range(30)})
+    archive = _archive('export.zip', {
+        '2023/ventes.csv': ventes.to_csv(index=False),
+        '2024/ventes.csv': (ventes + 1).to_csv(index=False),
+        '2024/': '',
+        '__MACOSX/2024/._ventes.csv': 'x',
+        'LISEZMOI.txt': 'ignoré',
+    })
+
+    parts = DataLoader.expand_inputs(archive)
+    assert [(part['table'], part['file']) for part in parts] == [
+        ('ventes', 'export.zip/2023/ventes.csv'), ('ventes_2', 'export.zip/2024/ventes.csv')
+    ]
+    df, tables, stats = DataLoader.load_tables(archive, workers=1)
+    assert set(tables) == {'ventes', 'ventes_2'}
+    # Mêmes colonnes : tables concaténées, avec leur origine
+    assert df[TABLE_COLUMN].value_counts().to_dict() == {'ventes': 30, 'ventes_2': 30}
+    assert stats['rows_seen'] == 60
+
+
+def test_tables_with_different_columns_fall_back_to_the_largest():
+    clients = _upload('clients.csv', pd.DataFrame({'client': range(20), 'ville': ['Lyon'] * 20}))
+    commandes = _upload('commandes.csv', pd.DataFrame({'commande': range(50), 'montant': range(50)}))
+
+    df, tables, _ = DataLoader.load_tables([clients, commandes], workers=1)
+    assert list(df.columns) == ['commande', 'montant'] and len(df) == 50
+    assert set(tables) == {'clients', 'commandes'}
+    assert TABLE_COLUMN not in df.columns
+
+
+def test_identical_tables_are_not_concatenated_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, 'CONCAT_TABLES', False)
+    ventes = pd.DataFrame({'mois': range(10), 'montant': range(10)})
+    df, tables, _ = DataLoader.load_tables([_upload('a.csv', ventes), _upload('b.csv', ventes.head(4))], workers=1)
+    assert len(df) == 10 and TABLE_COLUMN not in df.columns
+
+
+def test_every_excel_sheet_is_a_table():
+    pytest.importorskip('openpyxl')
+    workbook = io.BytesIO()
+    with pd.ExcelWriter(workbook) as writer:
+        pd.DataFrame({'mois': range(12), 'montant': range(12)}).to_excel(writer, sheet_name='Janvier 2024', index=False)
+        pd.DataFrame({'mois': range(5), 'montant': range(5)}).to_excel(writer, sheet_name='Février', index=False)
+    workbook.name = 'ventes.xlsx'
+
+    df, tables, stats = DataLoader.load_tables(workbook, workers=1)
+    assert set(tables) == {t['table'] for t in stats['tables']}
+    assert sorted(len(table) for table in tables.values()) == [5, 12]
+    assert sorted(t['sheet'] for t in stats['tables']) == ['Février', 'Janvier 2024']
+    assert len(df) == 17
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from datavisapp.executor import MissingFigureError, SnippetError, SnippetExecutor
+
+FIGURE = "import plotly.express as px\nfig = px.histogram(df, x='age')"
+SLOW_FIGURE = "import time\ntime.sleep({seconds})\n" + FIGURE
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({'age': [21, 35, 35, 48, 60], 'ville': ['Lyon', 'Paris', 'Paris', 'Nice', 'Lyon']})
+
+
+@pytest.fixture
+def executor():
+    executor = SnippetExecutor(workers=2, timeout=1.5, cpu_seconds=0, memory_mb=0)
+    yield executor
+    executor.shutdown()
+
+
+def test_figure_is_rendered_in_worker(executor, df):
+    figure_json = executor.render(FIGURE, df, 'dataset')
+    assert '"histogram"' in figure_json
+
+
+def test_snippet_errors_keep_their_type(executor, df):
+    with pytest.raises(MissingFigureError):
+        executor.render("x = 1", df, 'dataset')
+    with pytest.raises(SnippetError, match="KeyError"):
+        executor.render("fig = df['inconnue']", df, 'dataset')
+
+
+def test_timeout_only_stops_the_slow_snippet(executor, df):
+    # Préchauffe les deux workers
+    executor.render(FIGURE, df, 'dataset')
+    results = {}
+
+    def render_slow():
+        try:
+            executor.render(SLOW_FIGURE.format(seconds=30), df, 'dataset')
+        except SnippetError as e:
+            results['slow'] = str(e)
+
+    def render_other():
+        results['other'] = executor.render(SLOW_FIGURE.format(seconds=1), df, 'dataset')
+
+    threads = [threading.Thread(target=render_slow), threading.Thread(target=render_other)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert "Temps d'exécution dépassé" in results['slow']
+    assert '"histogram"' in results['other']
+    # Le worker arrêté a été remplacé
+    assert '"histogram"' in executor.render(FIGURE + "\nfig.update_layout(title='après')", df, 'dataset')
+
+
+def test_waiting_for_a_free_worker_does_not_count_toward_timeout(df):
+    executor = SnippetExecutor(workers=1, timeout=1.5, cpu_seconds=0, memory_mb=0)
+    try:
+        executor.render(FIGURE, df, 'dataset')
+        errors = []
+
+        def render(seconds):
+            try:
+                executor.render(SLOW_FIGURE.format(seconds=seconds), df, 'dataset')
+            except SnippetError as e:
+                errors.append(str(e))
+
+        # Chaque snippet dure 1 s : le second attend le premier, mais son exécution tient dans le délai
+        threads = [threading.Thread(target=render, args=(seconds,)) for seconds in (1, 1.01)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+    finally:
+        executor.shutdown()
+
+
+def test_in_process_execution(df):
+    executor = SnippetExecutor(workers=0)
+    assert '"histogram"' in executor.render(FIGURE, df, 'dataset')
+
+
+def test_evicted_dataset_stays_available_to_queued_tasks(df, monkeypatch):
+    from datavisapp.config import settings
+
+    monkeypatch.setattr(settings, 'DATASET_CACHE_ITEMS', 1)
+    executor = SnippetExecutor(workers=1, timeout=10, cpu_seconds=0, memory_mb=0)
+    results = {}
+
+    def render(name, code):
+        try:
+            results[name] = executor.render(code, df, name)
+        except SnippetError as e:
+            results[name] = str(e)
+
+    try:
+        executor.render(FIGURE, df, 'prechauffage')
+        # Un seul worker : 'attente' reçoit le nom de son segment puis attend que 'lent' se termine,
+        # pendant que 'nouveau' évince son dataset
+        threads = [threading.Thread(target=render, args=('lent', SLOW_FIGURE.format(seconds=1))),
+                   threading.Thread(target=render, args=('attente', FIGURE)),
+                   threading.Thread(target=render, args=('nouveau', FIGURE))]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.2)
+        for thread in threads:
+            thread.join()
+        assert all('"histogram"' in results[name] for name in ('lent', 'attente', 'nouveau')), results
+        assert executor._retired == {} and executor._segment_users == {}
+        assert list(executor._frames) == ['nouveau']
+    finally:
+        executor.shutdown()
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datavisapp.executor import SnippetExecutor
+from datavisapp.filters import FilterIndex, get_filter_index
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 100, 1000).astype(float)
+    values[::13] = np.nan
+    return pd.DataFrame({'age': values, 'score': rng.normal(size=1000), 'ville': rng.choice(['Lyon', 'Nice'], 1000)})
+
+
+@pytest.mark.parametrize('low, high', [(10, 20), (20, 20), (-5, 3), (99, 500), (30.5, 30.7)])
+def test_range_filter_matches_boolean_mask(df, low, high):
+    index = FilterIndex(df)
+    expected = df[(df['age'] >= low) & (df['age'] <= high)]
+    pd.testing.assert_frame_equal(index.filter('age', low, high), expected)
+
+
+def test_missing_values_are_excluded_from_bounds_and_ranges(df):
+    index = FilterIndex(df)
+    assert index.numeric_columns == ['age', 'score']
+    assert index.bounds('age') == (df['age'].min(), df['age'].max())
+    assert not np.isnan(df['age'].iloc[index.range_positions('age', 0, 100)]).any()
+
+
+def test_full_range_returns_the_shared_frame(df):
+    index = FilterIndex(df)
+    assert index.filter('age', *index.bounds('age')) is df
+
+
+def test_index_is_shared_per_dataset(df):
+    assert get_filter_index('filtres', df) is get_filter_index('filtres', df)
+
+
+def test_filtered_view_renders_and_caches_separately(df):
+    executor = SnippetExecutor(workers=0)
+    index = get_filter_index('filtres', df)
+    rows = index.range_positions('age', 10, 20)
+    code = "fig = {'data': [{'type': 'bar', 'y': [len(df)]}], 'layout': {}}"
+
+    figure_json = executor.render(code, df, 'filtres', rows=rows, view_key='age:10-20')
+    assert f'"y":[{len(rows)}]' in figure_json.replace(' ', '')
+    assert executor.render(code, df, 'filtres') != figure_json
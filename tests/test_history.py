@@ -0,0 +1,67 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from datavisapp import history
+
+FIGURE = '{"data": [{"type": "bar"}]}'
+
+
+@pytest.fixture(autouse=True)
+def ticking_clock(monkeypatch):
+    """Horloge strictement croissante : l'ordre des entrées ne dépend pas de la résolution de time.time."""
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(history, 'time', SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def test_same_request_is_stored_once_and_moved_to_top(history_store):
+    first = history_store.add('ds', 'viz', "ventes par ville", "fig = 1", figure_json=FIGURE)
+    history_store.add('ds', 'viz', "age moyen", "fig = 2")
+    again = history_store.add('ds', 'viz', "ventes par ville", "fig = 1", theme='sombre')
+
+    assert again == first
+    assert history_store.count('ds') == 2
+    latest = history_store.page('ds')[0]
+    assert (latest['id'], latest['theme']) == (first, 'sombre')
+    # Une nouvelle sauvegarde sans figure garde la figure enregistrée
+    assert history_store.figure(first) == FIGURE
+
+
+def test_different_code_or_dataset_is_a_new_entry(history_store):
+    ids = {
+        history_store.add('ds', 'viz', "ventes", "fig = 1"),
+        history_store.add('ds', 'viz', "ventes", "fig = 2"),
+        history_store.add('ds', 'suggestion', "ventes", "fig = 1"),
+        history_store.add('autre', 'viz', "ventes", "fig = 1"),
+    }
+    assert len(ids) == 4
+    assert history_store.count('ds') == 3
+
+
+def test_cap_keeps_the_most_recent_entries_per_dataset(history_store):
+    history_store.add('autre', 'viz', "conservée", "fig = 0")
+    for i in range(8):
+        history_store.add('ds', 'viz', f"question {i}", f"fig = {i}")
+
+    assert history_store.count('ds') == history_store.max_entries == 5
+    assert [e['query'] for e in history_store.page('ds', page_size=10)] == [f"question {i}" for i in range(7, 2, -1)]
+    assert history_store.count('autre') == 1
+
+
+def test_pages_are_disjoint_and_ordered(history_store):
+    for i in range(5):
+        history_store.add('ds', 'viz', f"question {i}", f"fig = {i}")
+
+    pages = [history_store.page('ds', page, page_size=2) for page in range(3)]
+    assert [len(p) for p in pages] == [2, 2, 1]
+    queries = [entry['query'] for page in pages for entry in page]
+    assert queries == [f"question {i}" for i in range(4, -1, -1)]
+    assert history_store.page('ds', 3, page_size=2) == []
+    assert 'figure' not in pages[0][0]
+
+
+def test_missing_figure_is_none(history_store):
+    entry = history_store.add('ds', 'viz', "sans figure", "fig = 1")
+    assert history_store.figure(entry) is None
+    assert history_store.figure(entry + 100) is None
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+from datavisapp.api import ClaudeClient
+from datavisapp.fakes import FakeAnthropic
+from datavisapp.llm_cache import ResponseCache, SingleFlight
+from datavisapp.prompts import Prompt
+from datavisapp.scheduler import BACKGROUND
+
+PROMPT = Prompt("Schéma du dataset", "Code de l'histogramme de age")
+
+
+def test_cached_response_is_not_requested_again(response_cache):
+    fake = FakeAnthropic(responder=lambda system, messages: "fig = 1")
+    client = ClaudeClient(client=fake, cache=response_cache)
+
+    assert client.generate_insights(PROMPT, data_summary={}) == "fig = 1"
+    assert client.generate_insights(PROMPT, data_summary={}) == "fig = 1"
+    assert fake.calls == 1
+    assert (response_cache.hits, response_cache.misses) == (1, 1)
+
+
+def test_cache_key_covers_system_prefix(response_cache):
+    fake = FakeAnthropic()
+    client = ClaudeClient(client=fake, cache=response_cache)
+
+    client.generate_insights(PROMPT, data_summary={})
+    client.generate_insights(Prompt("Autre schéma", PROMPT.user), data_summary={})
+    assert fake.calls == 2
+
+
+def test_empty_answer_is_not_cached(response_cache):
+    fake = FakeAnthropic(responder=lambda system, messages: "")
+    client = ClaudeClient(client=fake, cache=response_cache)
+
+    client.generate_insights(PROMPT, data_summary={})
+    client.generate_insights(PROMPT, data_summary={})
+    assert fake.calls == 2
+
+
+def test_injected_client_has_no_cache_by_default():
+    fake = FakeAnthropic()
+    client = ClaudeClient(client=fake)
+
+    assert client.cache is None
+    client.generate_insights(PROMPT, data_summary={})
+    client.generate_insights(PROMPT, data_summary={})
+    assert fake.calls == 2
+
+
+def test_expired_entries_are_ignored(tmp_path):
+    cache = ResponseCache(tmp_path / 'llm.sqlite', ttl=-1)
+    cache.put('key', 'réponse')
+    assert cache.get('key') is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(tmp_path / 'llm.sqlite', max_entries=2)
+    cache.put('a', '1')
+    cache.put('b', '2')
+    cache.get('a')
+    cache.put('c', '3')
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('1', '3')
+
+
+def test_connections_are_closed(response_cache):
+    response_cache.put('a', '1')
+    open_files = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+    for i in range(50):
+        response_cache.put(f'k{i}', 'v')
+        response_cache.get('a')
+    if open_files is not None:
+        assert len(os.listdir('/proc/self/fd')) == open_files
+
+
+def test_concurrent_identical_requests_share_one_call(response_cache):
+    fake = FakeAnthropic(responder=lambda system, messages: "fig = 1", latency=0.2)
+    client = ClaudeClient(client=fake, cache=response_cache)
+    results = []
+    barrier = threading.Barrier(5)
+
+    def ask():
+        barrier.wait()
+        results.append(client.generate_insights(PROMPT, data_summary={}))
+
+    threads = [threading.Thread(target=ask) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["fig = 1"] * 5
+    assert fake.calls == 1
+
+
+def test_single_flight_propagates_errors_to_waiters():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait()
+        raise RuntimeError("échec")
+
+    def call(fn):
+        try:
+            flight.do('key', fn)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call, args=(failing,))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call, args=(lambda: "jamais appelé",))
+    follower.start()
+    # Laisse le second appel rejoindre l'appel en cours avant son échec
+    time.sleep(0.1)
+    release.set()
+    leader.join()
+    follower.join()
+    assert errors == ["échec", "échec"]
+
+
+def test_interactive_request_does_not_wait_for_background_flight(response_cache):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(system, messages):
+        started.set()
+        release.wait(5)
+        return "fond"
+
+    background = ClaudeClient(client=FakeAnthropic(responder=slow), cache=response_cache, priority=BACKGROUND)
+    interactive_fake = FakeAnthropic(responder=lambda system, messages: "interactif")
+    interactive = ClaudeClient(client=interactive_fake, cache=response_cache)
+
+    thread = threading.Thread(target=background.generate_insights, args=(PROMPT, {}))
+    thread.start()
+    started.wait(5)
+    try:
+        start = time.perf_counter()
+        assert interactive.generate_insights(PROMPT, data_summary={}) == "interactif"
+        assert time.perf_counter() - start < 1
+        assert interactive_fake.calls == 1
+    finally:
+        release.set()
+        thread.join()
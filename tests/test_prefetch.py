@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+from datavisapp.api import ClaudeClient
+from datavisapp.config import settings
+from datavisapp.executor import SnippetExecutor
+from datavisapp.fakes import FakeAnthropic
+from datavisapp.prefetch import DEFAULT_VIZ_TYPE, Prefetcher, parse_suggestions
+from datavisapp.profiler import DatasetProfile
+
+FIGURE = "import plotly.express as px\nfig = px.histogram(df, x='age')"
+SUMMARY = """Le dataset contient des ventes.
+
+1. Une première liste, ignorée
+
+Suggestions :
+1. **Histogramme** de l'âge des clients
+2) Nuage de points du montant selon l'âge
+3. Histogramme de l'âge des clients
+4. Évolution des ventes : un récit mensuel
+"""
+SUGGESTIONS = [
+    {'query': "Raconte la saison des ventes", 'viz_type': DEFAULT_VIZ_TYPE},
+    {'query': "Décris le client typique", 'viz_type': DEFAULT_VIZ_TYPE},
+    {'query': "Compare les deux semestres en prose", 'viz_type': DEFAULT_VIZ_TYPE},
+]
+
+
+def test_suggestions_come_from_the_last_numbered_list():
+    suggestions = parse_suggestions(SUMMARY, limit=10)
+    assert suggestions == [
+        {'query': "Histogramme de l'âge des clients", 'viz_type': "Histogramme"},
+        {'query': "Nuage de points du montant selon l'âge", 'viz_type': "Scatter"},
+        {'query': "Évolution des ventes : un récit mensuel", 'viz_type': DEFAULT_VIZ_TYPE},
+    ]
+    assert len(parse_suggestions(SUMMARY, limit=2)) == 2
+    assert parse_suggestions(None) == []
+
+
+@pytest.fixture
+def dataset():
+    df = pd.DataFrame({'age': [21, 35, 35, 48, 60], 'montant': [10.0, 25.5, 8.0, 40.0, 12.5]})
+    return {'key': 'prefetch-test', 'df': df, 'tables': {}, 'source': None, 'profile': DatasetProfile(df)}
+
+
+@pytest.fixture
+def executor():
+    executor = SnippetExecutor(workers=1, timeout=5, cpu_seconds=0, memory_mb=0)
+    yield executor
+    executor.shutdown()
+
+
+def _prefetcher(dataset, executor, latency=0.0, **budget):
+    fake = FakeAnthropic(responder=lambda system, messages: FIGURE, latency=latency)
+    return Prefetcher(dataset, ClaudeClient(client=fake), executor, workers=1, **budget), fake
+
+
+def test_match_uses_the_similarity_threshold(dataset, executor, monkeypatch):
+    monkeypatch.setattr(settings, 'PREFETCH_MATCH_RATIO', 0.8)
+    prefetcher = Prefetcher(dataset, client=None, executor=executor)
+    prefetcher.items = [{'query': "Histogramme de l'âge"}, {'query': "Histogramme de l'âge des clients"}]
+
+    assert prefetcher.match("histogramme de l'age des clients !") is prefetcher.items[1]
+    assert prefetcher.match("HISTOGRAMME DE L'ÂGE") is prefetcher.items[0]
+    assert prefetcher.match("carte des ventes par région") is None
+
+
+def test_prefetched_result_is_reused(dataset, executor):
+    prefetcher, fake = _prefetcher(dataset, executor, budget_seconds=30, token_budget=0)
+    prefetcher.start(SUGGESTIONS[:1])
+
+    result = prefetcher.result(prefetcher.match(SUGGESTIONS[0]['query']), timeout=10)
+    assert '"histogram"' in result['figure_json']
+    assert fake.calls == 2
+    assert prefetcher.stats()['ready'] == 1
+
+
+def test_token_budget_stops_new_suggestions(dataset, executor):
+    prefetcher, fake = _prefetcher(dataset, executor, budget_seconds=30, token_budget=1)
+    prefetcher.start(SUGGESTIONS)
+    for item in prefetcher.items:
+        prefetcher.result(item, timeout=10)
+
+    stats = prefetcher.stats()
+    assert (stats['ready'], stats['skipped']) == (1, 2)
+    assert stats['input_tokens'] > 0 and fake.calls == 2
+
+
+def test_time_budget_stops_new_suggestions(dataset, executor):
+    prefetcher, _ = _prefetcher(dataset, executor, latency=0.3, budget_seconds=0.2, token_budget=0)
+    prefetcher.start(SUGGESTIONS)
+    for item in prefetcher.items:
+        prefetcher.result(item, timeout=10)
+    assert (prefetcher.stats()['ready'], prefetcher.stats()['skipped']) == (1, 2)
+
+
+def test_cancel_abandons_pending_suggestions(dataset, executor):
+    prefetcher, fake = _prefetcher(dataset, executor, latency=0.2, budget_seconds=30, token_budget=0)
+    prefetcher.start(SUGGESTIONS)
+    prefetcher.cancel()
+    for item in prefetcher.items:
+        assert prefetcher.result(item, timeout=10) is None
+    assert prefetcher.stats().get('ready', 0) == 0
+    assert fake.calls <= 2
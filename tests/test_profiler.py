@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datavisapp.profiler import ColumnProfile, DatasetProfile, HyperLogLog
+
+
+@pytest.mark.parametrize('n', [1, 10, 500, 3000, 10_000, 12_000, 200_000])
+def test_hyperloglog_estimate_is_close(n):
+    hll = HyperLogLog()
+    hll.update(pd.Series(np.arange(n)))
+    # Petites cardinalités : correction par comptage linéaire, quasi exacte
+    tolerance = 0.02 if n <= 3000 else 0.05
+    assert abs(hll.estimate() - n) <= max(1, tolerance * n)
+
+
+def test_hyperloglog_ignores_duplicates_and_merges_as_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update(pd.Series(np.arange(0, 6000)))
+    left.update(pd.Series(np.arange(0, 6000)))
+    right.update(pd.Series(np.arange(3000, 9000)))
+    whole = HyperLogLog()
+    whole.update(pd.Series(np.arange(0, 9000)))
+
+    left.merge(right)
+    assert np.array_equal(left.registers, whole.registers)
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    montant = rng.normal(100, 15, 5000)
+    montant[::17] = np.nan
+    return pd.DataFrame({
+        'montant': montant,
+        'ville': rng.choice(['Lyon', 'Paris', 'Nice', 'Lille'], 5000),
+        'date': pd.date_range('2024-01-01', periods=5000, freq='h'),
+    })
+
+
+def test_merged_chunk_profiles_match_the_full_profile(frame):
+    full = DatasetProfile(frame)
+    merged = DatasetProfile()
+    for start in range(0, len(frame), 1200):
+        part = DatasetProfile()
+        part.update(frame.iloc[start:start + 1200])
+        merged.merge(part)
+
+    for name in frame.columns:
+        expected, actual = full.column(name), merged.column(name)
+        assert (actual.count, actual.nulls, actual.cardinality) == (expected.count, expected.nulls, expected.cardinality)
+        assert actual.min == expected.min and actual.max == expected.max
+    assert merged.column('montant').mean == pytest.approx(frame['montant'].mean())
+    assert merged.column('montant').std == pytest.approx(frame['montant'].std())
+    assert merged.column('ville').top_k(4) == frame['ville'].value_counts().to_dict()
+    assert np.allclose(merged.correlation(), full.correlation(), equal_nan=True)
+
+
+def test_quantiles_and_histogram_come_from_the_sample(frame):
+    column = DatasetProfile(frame).column('montant')
+    quantiles = column.quantiles()
+    assert quantiles[0.5] == pytest.approx(frame['montant'].median(), abs=1.5)
+    edges, counts = column.histogram(bins=8)
+    assert len(edges) == 9 and abs(counts.sum() - column.non_null) <= 8
+
+
+def test_truncated_top_counter_falls_back_to_hyperloglog():
+    column = ColumnProfile('code', 'string', top_capacity=100)
+    column.update(pd.Series([f"c{i}" for i in range(5000)]))
+    assert column.counts_truncated
+    assert abs(column.cardinality - 5000) <= 0.05 * 5000
+
+
+def test_profile_is_lazy_and_digest_is_stable(frame):
+    profile = DatasetProfile(frame)
+    assert profile._columns == {}
+    digest = profile.digest()
+    assert set(profile._columns) == set(frame.columns)
+    assert DatasetProfile(frame).digest() == digest
+    assert digest.splitlines()[1].startswith("- ville (")
@@ -0,0 +1,103 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datavisapp import query_engine
+from datavisapp.config import settings
+from datavisapp.executor import SnippetError, _run_snippet
+from datavisapp.query_engine import _engines, get_query_engine, materialize_source
+
+
+@pytest.fixture(autouse=True)
+def source_dir(tmp_path, monkeypatch):
+    """Répertoire des sources isolé ; les moteurs ouverts pendant le test sont refermés."""
+    directory = tmp_path / 'sources'
+    monkeypatch.setattr(settings, 'ENGINE_SOURCE_DIR', directory)
+    yield directory
+    while _engines:
+        _, engine = _engines.popitem()
+        engine.close()
+
+
+@pytest.fixture
+def sales_csv(tmp_path):
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=2000, freq='6h'),
+        'ville': rng.choice(['Lyon', 'Paris', 'Nice'], 2000),
+        'montant': rng.integers(1, 500, 2000).astype(float),
+    })
+    path = tmp_path / 'ventes.csv'
+    df.to_csv(path, index=False)
+    return path, df
+
+
+def test_engine_aggregates_match_pandas(sales_csv):
+    pytest.importorskip('duckdb')
+    path, df = sales_csv
+    engine = get_query_engine(path)
+
+    assert engine.row_count() == len(df)
+    grouped = engine.group_aggregate('ville', 'montant', 'sum').set_index('ville')['montant']
+    assert grouped.to_dict() == pytest.approx(df.groupby('ville')['montant'].sum().to_dict())
+    assert engine.value_counts('ville').to_dict() == df['ville'].value_counts().to_dict()
+    _, _, counts = engine.histogram('montant', bins=7)
+    assert counts.sum() == len(df)
+    monthly = engine.resample('date', 'montant', 'M', 'mean')['montant']
+    expected = df.set_index('date')['montant'].resample('MS').mean()
+    assert np.allclose(monthly.to_numpy(), expected.to_numpy())
+    # Un seul moteur par fichier
+    assert get_query_engine(path) is engine
+
+
+def test_engine_is_skipped_without_duckdb(sales_csv, monkeypatch):
+    path, df = sales_csv
+    monkeypatch.setattr(query_engine, 'duckdb_available', lambda: False)
+    assert get_query_engine(path) is None
+
+    # Le snippet garde `df` ; seul `sql` signale l'absence du moteur
+    compiled = compile("fig = sql('SELECT 1')", '<snippet>', 'exec')
+    with pytest.raises(SnippetError, match="DuckDB"):
+        _run_snippet(compiled, df)
+
+
+def test_engine_is_skipped_when_disabled_or_unsupported(sales_csv, tmp_path, monkeypatch):
+    pytest.importorskip('duckdb')
+    assert get_query_engine(tmp_path / 'classeur.xlsx') is None
+    monkeypatch.setattr(settings, 'ENGINE_OUT_OF_CORE', False)
+    assert get_query_engine(sales_csv[0]) is None
+
+
+def test_uploaded_source_is_written_once(source_dir):
+    upload = io.BytesIO(b"a,b\n1,2\n")
+    upload.name = 'donnees.csv'
+    path = materialize_source(upload, 'abc')
+    assert path == source_dir / 'abc.csv' and path.read_bytes() == b"a,b\n1,2\n"
+    # Même empreinte : le fichier existant est réutilisé sans être réécrit
+    again = io.BytesIO(b"autre")
+    again.name = 'donnees.csv'
+    assert materialize_source(again, 'abc') == path and path.read_bytes() == b"a,b\n1,2\n"
+    upload.name = 'classeur.xlsx'
+    assert materialize_source(upload, 'def') is None
+
+
+def test_eviction_keeps_sources_of_open_engines(source_dir, monkeypatch):
+    pytest.importorskip('duckdb')
+    monkeypatch.setattr(settings, 'ENGINE_SOURCE_MAX_MB', 1)
+    source_dir.mkdir(parents=True)
+    payload = b"x\n" + b"1\n" * 200_000
+    for age, name in enumerate(['ouvert.csv', 'ancien.csv', 'recent.csv']):
+        path = source_dir / name
+        path.write_bytes(payload)
+        os.utime(path, (1_000_000 + age, 1_000_000 + age))
+    assert get_query_engine(source_dir / 'ouvert.csv') is not None
+
+    upload = io.BytesIO(payload)
+    upload.name = 'nouveau.csv'
+    kept = materialize_source(upload, 'nouveau')
+
+    remaining = {p.name for p in source_dir.iterdir() if p.is_file()}
+    assert remaining == {'ouvert.csv', kept.name}
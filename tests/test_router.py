@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from datavisapp.router import VisualizationRouter
+
+
+@pytest.fixture
+def router():
+    df = pd.DataFrame({
+        'age': [25, 32, 47, 51],
+        'salaire': [2100.0, 2800.0, 3500.0, 4100.0],
+        'ville': pd.Series(['Lyon', 'Paris', 'Lyon', 'Nantes'], dtype='category'),
+        'date': pd.to_datetime(['2024-01-01', '2024-02-01', '2024-03-01', '2024-04-01']),
+    })
+    return VisualizationRouter(df, min_confidence=0.75)
+
+
+@pytest.mark.parametrize('question', [
+    "Quelle est la moyenne de salaire par ville ?",
+    "Top 5 des ville selon salaire",
+    "combien de lignes ont age > 3",
+    "Compare age and salaire evolution",
+])
+def test_questions_without_chart_pattern_go_to_llm(router, question):
+    assert router.route(question, 'Histogramme') is None
+
+
+@pytest.mark.parametrize('question', [
+    # Colonne citée que l'histogramme ignorerait
+    "Distribution de salaire par ville",
+    # Filtre et agrégat que les templates ne savent pas rendre
+    "Distribution de age pour salaire > 3000",
+    "Comparer la moyenne de salaire par ville",
+    "Évolution des 3 premiers salaire",
+])
+def test_partially_understood_questions_go_to_llm(router, question):
+    assert router.route(question) is None
+
+
+def test_named_columns_route_locally(router):
+    route = router.route("Distribution de salaire")
+    assert (route['template'], route['params'], route['confidence']) == ('distribution', {'column': 'salaire'}, 1.0)
+
+    route = router.route("Relation entre age et salaire")
+    assert route['params'] == {'x': 'age', 'y': 'salaire'}
+
+
+def test_unique_date_column_is_inferred_with_lower_confidence(router):
+    route = router.route("Évolution de salaire")
+    assert route['params'] == {'date_column': 'date', 'value_column': 'salaire'}
+    assert 0.75 < route['confidence'] < 1.0
+
+
+def test_threshold_is_strict(router):
+    route = router.route("Évolution de salaire")
+    assert VisualizationRouter(router.df, min_confidence=route['confidence']).route("Évolution de salaire") is None
+
+
+def test_radar_only_changes_comparison_rendering(router):
+    route = router.route("Comparer salaire selon ville", "Toile d'araignée")
+    assert route['params'] == {'x': 'ville', 'y': 'salaire', 'type': 'radar'}
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from datavisapp import api
+from datavisapp.api import ClaudeClient
+from datavisapp.config import settings
+from datavisapp.fakes import MockAnthropicServer
+from datavisapp.prompts import Prompt
+from datavisapp.scheduler import BACKGROUND, INTERACTIVE, RequestScheduler, TokenBucket, get_scheduler
+
+PROMPT = Prompt("Schéma", "Code de l'histogramme de age")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_per_minute():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now = 30
+    assert bucket.wait_time(30) == 0
+    assert bucket.wait_time(31) == pytest.approx(1.0)
+
+
+def test_unused_tokens_are_given_back():
+    clock = FakeClock()
+    scheduler = RequestScheduler(requests_per_minute=0, tokens_per_minute=1000, clock=clock)
+    with scheduler.slot(800) as usage:
+        usage.tokens = 100
+    assert scheduler._tokens.wait_time(900) == 0
+    assert scheduler.stats()['granted'] == 1
+
+
+def test_interactive_requests_pass_before_background():
+    # 600 requêtes par minute : une requête toutes les 0,1 s une fois le seau vidé
+    scheduler = RequestScheduler(requests_per_minute=600, tokens_per_minute=0)
+    for _ in range(600):
+        scheduler.acquire(0)
+    order = []
+    lock = threading.Lock()
+
+    def request(priority, name):
+        scheduler.acquire(0, priority)
+        with lock:
+            order.append(name)
+
+    background = threading.Thread(target=request, args=(BACKGROUND, 'background'))
+    background.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=request, args=(INTERACTIVE, 'interactive'))
+    interactive.start()
+    background.join()
+    interactive.join()
+    assert order == ['interactive', 'background']
+    assert scheduler.stats()['max_queue_depth'] == 2
+
+
+def test_rate_limited_request_is_retried_after_pause():
+    anthropic = pytest.importorskip('anthropic')
+    scheduler = RequestScheduler(requests_per_minute=0, tokens_per_minute=0)
+    pauses = []
+    pause = scheduler.pause
+    scheduler.pause = lambda seconds: pauses.append(seconds) or pause(seconds)
+
+    with MockAnthropicServer(responder=lambda system, messages: "fig = 1", rate_limited=1, retry_after=0.2) as server:
+        sdk = anthropic.Anthropic(api_key='test', base_url=server.base_url, max_retries=0)
+        client = ClaudeClient(client=sdk, scheduler=scheduler, model='claude-test')
+        start = time.perf_counter()
+        assert client.generate_insights(PROMPT, data_summary={}) == "fig = 1"
+        elapsed = time.perf_counter() - start
+    assert server.requests == 2
+    # retry-after (0,2 s) respecté, et l'ordonnanceur suspendu pour toutes les requêtes
+    assert elapsed >= 0.2
+    assert pauses and pauses[0] >= 0.2
+    assert scheduler.stats()['granted'] == 2
+
+
+def test_retries_stop_after_max_retries(monkeypatch):
+    anthropic = pytest.importorskip('anthropic')
+    monkeypatch.setattr(settings, 'LLM_MAX_RETRIES', 2)
+
+    with MockAnthropicServer(rate_limited=10) as server:
+        sdk = anthropic.Anthropic(api_key='test', base_url=server.base_url, max_retries=0)
+        client = ClaudeClient(client=sdk, model='claude-test')
+        with pytest.raises(anthropic.RateLimitError):
+            client.generate_insights(PROMPT, data_summary={})
+    assert server.requests == 3
+
+
+def test_shared_client_reuses_connection_and_scheduler(monkeypatch, response_cache):
+    pytest.importorskip('anthropic')
+    with MockAnthropicServer(responder=lambda system, messages: messages[-1]['content']) as server:
+        monkeypatch.setattr(settings, 'LLM_BASE_URL', server.base_url)
+        monkeypatch.setattr(settings, 'CLAUDE_API_KEY', 'test')
+        monkeypatch.setattr(settings, 'CLAUDE_MODEL', 'claude-test')
+        monkeypatch.setattr(api, 'response_cache', response_cache)
+        api.shared_anthropic.cache_clear()
+        api.get_client.cache_clear()
+        try:
+            client = api.get_client()
+            assert api.get_client() is client
+            assert api.get_client(BACKGROUND).client is client.client
+            assert client.scheduler is get_scheduler()
+            assert client.cache is response_cache
+
+            client.generate_insights(Prompt("Schéma", "première question"), data_summary={})
+            client.generate_insights(Prompt("Schéma", "seconde question"), data_summary={})
+        finally:
+            api.shared_anthropic.cache_clear()
+            api.get_client.cache_clear()
+    assert server.requests == 2
+    # Connexion HTTP gardée ouverte entre les deux requêtes (keep-alive)
+    assert server.connections == 1
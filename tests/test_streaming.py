@@ -0,0 +1,66 @@
+import pytest
+
+from datavisapp.api import ClaudeClient
+from datavisapp.fakes import FakeAnthropic, MockAnthropicServer
+from datavisapp.prompts import Prompt
+
+ANSWER = "La distribution de age est asymétrique avec une longue traîne à droite."
+
+
+def test_stream_yields_fragments_as_they_arrive():
+    fake = FakeAnthropic(responder=lambda system, messages: ANSWER)
+    client = ClaudeClient(client=fake)
+
+    fragments = list(client.stream_insights(Prompt("Schéma", "Interprète l'histogramme de age")))
+    assert len(fragments) > 1
+    assert "".join(fragments) == ANSWER
+
+
+def test_complete_stream_is_cached(response_cache):
+    fake = FakeAnthropic(responder=lambda system, messages: ANSWER)
+    client = ClaudeClient(client=fake, cache=response_cache)
+    prompt = Prompt("Schéma", "Interprète l'histogramme de age")
+
+    assert "".join(client.stream_insights(prompt)) == ANSWER
+    # Réponse en cache : un seul fragment, sans nouvel appel
+    assert list(client.stream_insights(prompt)) == [ANSWER]
+    assert fake.calls == 1
+
+
+def test_interrupted_stream_is_not_cached(response_cache):
+    fake = FakeAnthropic(responder=lambda system, messages: ANSWER)
+    client = ClaudeClient(client=fake, cache=response_cache)
+    prompt = Prompt("Schéma", "Interprète l'histogramme de age")
+
+    stream = client.stream_insights(prompt)
+    next(stream)
+    stream.close()
+    assert "".join(client.stream_insights(prompt)) == ANSWER
+    assert fake.calls == 2
+
+
+def test_interpretation_streams_while_code_is_generated():
+    def responder(system, messages):
+        return "fig = px.histogram(df, x='age')" if "Code" in messages[-1]['content'] else ANSWER
+
+    client = ClaudeClient(client=FakeAnthropic(responder=responder, token_latency=0.01))
+    deltas, code_future, timings = client.stream_interpretation_and_code(
+        Prompt("Schéma", "Interprétation"), Prompt("Schéma", "Code")
+    )
+    assert "".join(deltas) == ANSWER
+    assert code_future.result(timeout=5) == "fig = px.histogram(df, x='age')"
+    assert timings['mode'] == 'streaming'
+    assert timings['first_token'] <= timings['interpretation']
+    assert 'code' in timings
+
+
+def test_sdk_stream_against_mock_server():
+    anthropic = pytest.importorskip('anthropic')
+
+    with MockAnthropicServer(responder=lambda system, messages: ANSWER) as server:
+        sdk = anthropic.Anthropic(api_key='test', base_url=server.base_url, max_retries=0)
+        client = ClaudeClient(client=sdk, model='claude-test')
+        fragments = list(client.stream_insights(Prompt("Schéma", "Interprète l'histogramme de age")))
+    assert len(fragments) > 1
+    assert "".join(fragments) == ANSWER
+    assert server.requests == 1
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datavisapp.timeseries import get_rollups, resample
+
+PANDAS_FREQS = {'D': 'D', 'W': 'W-MON', 'M': 'MS', 'Q': 'QS', 'Y': 'YS'}
+
+
+@pytest.fixture
+def sales():
+    """Lignes non triées, sur trois ans, avec des valeurs et des dates manquantes."""
+    rng = np.random.default_rng(7)
+    dates = pd.Series(pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365 * 24, 4000), unit='h'))
+    dates[rng.choice(4000, 40, replace=False)] = pd.NaT
+    montant = rng.normal(50, 20, 4000)
+    montant[rng.choice(4000, 200, replace=False)] = np.nan
+    return pd.DataFrame({'date': dates, 'montant': montant, 'ville': rng.choice(['Lyon', None], 4000)})
+
+
+def _expected(df, column, freq, agg):
+    rows = df.dropna(subset=['date']).set_index('date').sort_index()[column]
+    return rows.resample(PANDAS_FREQS[freq], label='left', closed='left').agg(agg)
+
+
+@pytest.mark.parametrize('freq', list(PANDAS_FREQS))
+@pytest.mark.parametrize('agg', ['sum', 'mean', 'count', 'min', 'max'])
+def test_rollups_match_pandas_resample(sales, freq, agg):
+    result = resample(sales, 'date', 'montant', freq, agg)['montant']
+    expected = _expected(sales, 'montant', freq, agg)
+    assert result.index.equals(expected.index)
+    assert np.allclose(result.to_numpy(), expected.to_numpy(dtype=float), equal_nan=True)
+
+
+def test_non_numeric_column_only_counts(sales):
+    counts = resample(sales, 'date', 'ville', 'M', 'count')['ville']
+    assert counts.tolist() == _expected(sales, 'ville', 'M', 'count').tolist()
+    with pytest.raises(ValueError, match="count"):
+        resample(sales, 'date', 'ville', 'M', 'mean')
+
+
+def test_finer_frequency_is_computed_directly(sales):
+    hourly = resample(sales, 'date', 'montant', 'h', 'sum')['montant']
+    assert hourly.sum() == pytest.approx(sales['montant'].where(sales['date'].notna()).sum())
+
+
+def test_shallow_copies_share_the_pyramid(sales):
+    pyramid = get_rollups(sales, 'date')
+    copy = sales.copy(deep=False)
+    assert get_rollups(copy, 'date') is pyramid
+    assert get_rollups(sales.copy(deep=True), 'date') is not pyramid
+
+    resample(sales, 'date', 'montant', 'M', 'sum')
+    assert pyramid.has('montant', copy['montant'])
+    # Une colonne remplacée dans la copie est réagrégée, pas servie depuis les anciens agrégats
+    copy['montant'] = copy['montant'] * 2
+    assert not pyramid.has('montant', copy['montant'])
+    doubled = resample(copy, 'date', 'montant', 'M', 'sum')['montant']
+    assert np.allclose(doubled.to_numpy(), 2 * _expected(sales, 'montant', 'M', 'sum').to_numpy())
+
+
+def test_timezone_aware_dates(sales):
+    local = sales.assign(date=sales['date'].dt.tz_localize('Europe/Paris', nonexistent='NaT', ambiguous='NaT'))
+    result = resample(local, 'date', 'montant', 'Y', 'count')['montant']
+    assert result.sum() == local.dropna(subset=['date'])['montant'].count()
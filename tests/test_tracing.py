@@ -0,0 +1,48 @@
+import json
+
+from datavisapp.tracing import JsonlExporter, Tracer
+
+
+def test_span_attributes_use_otlp_encoding(tmp_path):
+    tracer = Tracer(JsonlExporter(tmp_path / 'traces.jsonl'))
+    with tracer.span('load', rows=3, ratio=0.5, tables=['a', 'b']) as span:
+        span.set_attribute('cache.hit', False)
+        with tracer.span('clean'):
+            pass
+
+    child, root = [json.loads(line) for line in (tmp_path / 'traces.jsonl').read_text().splitlines()]
+    assert child['parentSpanId'] == root['spanId']
+    assert root['status'] == {'code': 1}
+    assert isinstance(root['startTimeUnixNano'], str)
+    assert root['attributes'] == [
+        {'key': 'rows', 'value': {'intValue': '3'}},
+        {'key': 'ratio', 'value': {'doubleValue': 0.5}},
+        {'key': 'tables', 'value': {'arrayValue': {'values': [{'stringValue': 'a'}, {'stringValue': 'b'}]}}},
+        {'key': 'cache.hit', 'value': {'boolValue': False}},
+    ]
+
+
+def test_error_status_and_message(tmp_path):
+    tracer = Tracer(JsonlExporter(tmp_path / 'traces.jsonl'))
+    try:
+        with tracer.span('render'):
+            raise ValueError("colonne inconnue")
+    except ValueError:
+        pass
+
+    span = json.loads((tmp_path / 'traces.jsonl').read_text())
+    assert span['status'] == {'code': 2}
+    assert span['attributes'] == [{'key': 'error', 'value': {'stringValue': "ValueError: colonne inconnue"}}]
+
+
+def test_exporter_rotates_past_max_bytes(tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    tracer = Tracer(JsonlExporter(path, max_bytes=1000))
+    for _ in range(10):
+        with tracer.span('question', query="x" * 100):
+            pass
+
+    rotated = path.with_name('traces.jsonl.1')
+    assert rotated.exists()
+    assert path.stat().st_size <= 1000 and rotated.stat().st_size <= 1000
+    assert all(json.loads(line)['name'] == 'question' for line in path.read_text().splitlines())
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datavisapp.config import settings
+from datavisapp.data_processor import DataProcessor
+from datavisapp.type_inference import TypeInferenceEngine, downcast_numeric
+
+
+@pytest.fixture
+def engine():
+    return TypeInferenceEngine(sample_size=10, parse_ratio=0.9, category_max_ratio=0.5, category_max_unique=50)
+
+
+def test_unparsable_values_outside_the_sample_keep_the_text(engine):
+    # Les 10 premières valeurs sont numériques : le sondage conclut à tort à une colonne numérique
+    codes = pd.Series([str(i) for i in range(50)] + ['A12', 'B7'], name='code')
+    converted, report = engine.convert_columns(codes.to_frame())
+
+    assert report['code']['coerced'] == 2
+    assert report['code']['type'] == 'string'
+    assert converted['code'].isna().sum() == 0
+    assert list(converted['code'].iloc[-2:]) == ['A12', 'B7']
+
+
+def test_dates_numbers_and_categories_are_detected(engine):
+    df = pd.DataFrame({
+        'date': [f"2024-01-{day % 28 + 1:02d}" for day in range(60)],
+        'montant': [f"{i}.5" for i in range(60)],
+        'ville': ['Lyon', 'Paris', 'Nice'] * 20,
+    })
+    converted, report = engine.convert_columns(df)
+
+    assert {col: report[col]['type'] for col in df} == {'date': 'datetime', 'montant': 'numeric', 'ville': 'category'}
+    assert str(converted['date'].dtype).startswith('datetime64')
+    assert converted['montant'].dtype == np.float32
+    assert all(report[col]['coerced'] == 0 for col in df)
+
+
+def test_float_downcast_is_lossless():
+    assert downcast_numeric(pd.Series([0.5, 1.25, np.nan])).dtype == np.float32
+    # 0.1 n'est pas représentable exactement en float32
+    assert downcast_numeric(pd.Series([0.1, 0.2])).dtype == np.float64
+    assert downcast_numeric(pd.Series([1.0, 3.0]), integral_floats=True).dtype == np.int8
+
+
+def test_cleaning_reports_the_final_dtype(monkeypatch):
+    monkeypatch.setattr(settings, 'COMPACT_FRAMES', True)
+    df = pd.DataFrame({'n': [1.0, 2.0, np.nan, 4.0], 'texte': ['a', None, 'a', 'b'], 'vide': [None] * 4})
+    processor = DataProcessor(df)
+
+    assert 'vide' not in processor.df
+    assert processor.df['n'].tolist() == [1, 2, 2, 4]
+    assert processor.type_report['n']['dtype'] == str(processor.df['n'].dtype) == 'int8'
+    assert processor.df['texte'].isna().sum() == 0